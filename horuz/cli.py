@@ -2,6 +2,7 @@ import os
 import sys
 
 import click
+from .utils.config import CONFIG_PATH, read_config
 from .utils.style import rconsole
 
 
@@ -47,18 +48,25 @@ class HoruzCLI(click.MultiCommand):
 
 
 @click.command(cls=HoruzCLI)
+@click.option('-H', '--host', multiple=True, help='ElasticSearch node for this command. Can be repeated.')
+@click.option('--sniff/--no-sniff', default=None, help='Discover the other nodes of the cluster.')
+@click.option('--maxsize', type=click.IntRange(1, 1000), help='Connections kept open per node.')
+@click.option('--timeout', type=float, help='Request timeout in seconds.')
+@click.option('--compress/--no-compress', default=None, help='Gzip the requests and responses.')
 @pass_environment
-def cli(ctx):
+def cli(ctx, host, sniff, maxsize, timeout, compress):
     """
     Horuz!. CLI to interact with ElasticSearch. Save and query your recon data on ElasticSearch.
+    The connection options override ~/.horuz/horuz.cfg for this command.
     """
-    filename = os.path.expanduser("~/.horuz/horuz.cfg")
-    es_address = "http://localhost:9200"
-    if os.path.exists(filename):
-        with open(filename) as cfg:
-            es_address = cfg.read()
+    options = read_config(CONFIG_PATH)
+    overrides = {"sniff": sniff, "maxsize": maxsize, "timeout": timeout, "compress": compress}
+    options.update({k: v for k, v in overrides.items() if v is not None})
+    if host:
+        options["hosts"] = list(host)
 
     ctx.config = {
-        'elasticsearch_address': es_address,
-        'config_file': filename
+        'elasticsearch_address': options["hosts"][0],
+        'elasticsearch': options,
+        'config_file': CONFIG_PATH
     }
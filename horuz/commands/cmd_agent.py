@@ -0,0 +1,77 @@
+import os
+import subprocess
+import sys
+import time
+
+import click
+
+from horuz.cli import pass_environment
+from horuz.utils.agent import HoruzAgent, LOG_PATH, SOCKET_PATH, agent_request, agent_running
+
+
+@click.group()
+def cli():
+    """
+    Manage the local agent that keeps the ES connections open
+    """
+
+
+@cli.command("start")
+@click.option("-v", "--verbose", is_flag=True, help="Enables verbose mode.")
+@click.option('-d', '--detach', is_flag=True, help="Run the agent in background, the output goes to ~/.horuz/agent.log")
+@pass_environment
+def agent_start(ctx, verbose, detach):
+    """
+    Start the agent. collect and search send their work to it while it runs.
+    """
+    ctx.verbose = verbose
+    if agent_running():
+        ctx.log("The agent is already running.")
+        return
+    if detach:
+        args = [sys.executable, "-c", "from horuz.cli import cli; cli()", "agent", "start"]
+        if verbose:
+            args.append("-v")
+        os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
+        with open(LOG_PATH, "a") as log:
+            subprocess.Popen(args, stdout=log, stderr=log, stdin=subprocess.DEVNULL, start_new_session=True)
+        # Wait until the socket answers
+        for _ in range(50):
+            if agent_running():
+                ctx.log("Agent started on {}".format(SOCKET_PATH))
+                return
+            time.sleep(0.1)
+        ctx.log("The agent did not start, check {}".format(LOG_PATH))
+        return
+    try:
+        HoruzAgent(ctx).serve()
+    except KeyboardInterrupt:
+        ctx.log("Agent stopped.")
+
+
+@cli.command("stop")
+@pass_environment
+def agent_stop(ctx):
+    """
+    Stop the agent, the coalesced records are sent before it exits
+    """
+    if not agent_running():
+        ctx.log("The agent is not running.")
+        return
+    agent_request({"op": "stop"})
+    ctx.log("Agent stopped.")
+
+
+@cli.command("status")
+@pass_environment
+def agent_status(ctx):
+    """
+    Show if the agent is running
+    """
+    if not agent_running():
+        ctx.log("The agent is not running.")
+        return
+    response = agent_request({"op": "ping"})
+    jobs = agent_request({"op": "jobs"})["jobs"]
+    pending = [j for j in jobs if j["status"] in ("queued", "running")]
+    ctx.log("Agent running on {} (pid {}), {} pending jobs.".format(SOCKET_PATH, response["pid"], len(pending)))
@@ -0,0 +1,48 @@
+import json
+
+import click
+
+from horuz.cli import pass_environment
+from horuz.utils.anomalies import LENGTH_BUCKET, top_anomalies
+from horuz.utils.cli import get_sessions
+from horuz.utils.es import HoruzES
+from horuz.utils.style import rtable
+
+
+@click.command("anomalies", short_help="Find the unusual responses of a ffuf session.")
+@click.option("-v", "--verbose", is_flag=True, help="Enables verbose mode.")
+@click.option('-p', '--project', required=True, help='Project name')
+@click.option('-s', '--session', required=True, help='Session name', autocompletion=get_sessions)
+@click.option('-n', '--top', default=20, type=click.IntRange(1, 10000), help='Number of documents. Default 20')
+@click.option('-b', '--bucket', default=LENGTH_BUCKET, type=click.IntRange(1), help='Width in bytes of the length buckets. Default {}'.format(LENGTH_BUCKET))
+@click.option('-oJ', is_flag=True, help="JSON Lines Output")
+@pass_environment
+def cli(ctx, verbose, project, session, top, bucket, oj):
+    """
+    Score the ffuf results of a session against the other results of their
+    host: z-scores of the length, words and lines, rare length buckets and
+    rare status and length combinations. The highest scores are printed.
+    """
+    ctx.verbose = verbose
+    hes = HoruzES(project, ctx)
+    try:
+        metrics = hes.response_metrics(session)
+    except NotImplementedError as e:
+        ctx.log(str(e))
+        return
+    if not len(metrics):
+        ctx.log("There are no ffuf results in {}.".format(session))
+        return
+    ctx.vlog("{} results of {} hosts read.".format(len(metrics), len(metrics.hosts)))
+    anomalies = top_anomalies(metrics, top, bucket)
+    if oj:
+        for anomaly in anomalies:
+            click.echo(json.dumps(anomaly))
+        return
+    for column in ("Score", "Host", "Status", "Length", "Words", "Lines", "Reasons", "_id"):
+        rtable.add_column(column, style="cyan")
+    for anomaly in anomalies:
+        rtable.add_row(
+            str(anomaly["score"]), anomaly["host"], str(anomaly["status"]), str(anomaly["length"]),
+            str(anomaly["words"]), str(anomaly["lines"]), ", ".join(anomaly["reasons"]), anomaly["_id"])
+    ctx.log(rtable)
@@ -1,14 +1,27 @@
 import getpass
+import json
 import os
 import time
 
 import click
 
 from horuz.cli import pass_environment
+from horuz.utils.agent import agent_request, agent_running, client_options
+from horuz.utils.checkpoint import find_checkpoint_session, ingested_session, is_ingested, mark_ingested
 from horuz.utils.cli import execute_command, log_session, get_sessions
-from horuz.utils.es import HoruzES
 from horuz.utils.files import collect
 from horuz.utils.generators import get_random_name
+from horuz.utils.watch import DirectoryWatcher
+
+
+def local_es(project, ctx, alerts=False):
+    # The ES client is only loaded when the agent does not do the work
+    from horuz.utils.es import HoruzES
+
+    hes = HoruzES(project, ctx)
+    if alerts:
+        hes.on_alert = lambda alert: click.echo(json.dumps(alert, default=str))
+    return hes
 
 
 @click.command("collect", short_help="Collect data from external sources")
@@ -16,15 +29,47 @@ from horuz.utils.generators import get_random_name
 @click.option('-p', '--project', required=True, help='Project name')
 @click.option('-s', '--session', required=False, help="Custom session name", autocompletion=get_sessions)
 @click.option('-c', '--cmd', required=False, help='Generate data from external command')
-@click.option('-f', '--filename', required=False, type=click.File('r'), help="JSON file")
+@click.option('-f', '--filename', required=False, type=click.File('r'), help="JSON file. Use - to read JSONL from stdin")
 @click.option('-fd', '--filter-dups', required=False, help="Filter by duplicates. Put the fields separated with commas that are constantly repeated, you will not keep repeated data")
 @click.option('-rfd', '--remove-filter-dups', required=False, help="Only available if -fd is specified. Remove the duplicate fields, save only the data you need, if the option is not specified, the duplicate tuple will be removed. Example usage -rfd html,resultfile")
+@click.option('-nd', '--near-dups', type=click.IntRange(0, 3), help="Keep one ffuf result per group of near duplicate responses. The value is the maximum simhash distance, 3 is a good default.")
+@click.option('-r', '--resume', is_flag=True, help="Continue an interrupted collect of the file from the last uploaded batch.")
+@click.option('-w', '--watch', type=click.Path(exists=True, file_okay=False), help="Keep collecting the new JSON files of the directory.")
+@click.option('--watch-suffix', default=".json", help="Suffix of the files collected by --watch. Default .json")
+@click.option('-bs', '--batch-size', default=500, type=click.IntRange(1, 5000), help="Initial number of records per bulk request, adapted to the cluster load. Default 500")
+@click.option('--max-docs-rate', type=float, help="Limit the upload to N documents per second.")
+@click.option('--max-bytes-rate', type=float, help="Limit the upload to N bytes per second.")
+@click.option('-l', '--lines', help="Read raw lines from stdin, each line is saved in this field. Example: --lines host")
+@click.option('--flush-interval', default=2.0, type=click.FloatRange(0.1), help="Seconds a record read from stdin waits before being sent. Default 2")
+@click.option('-e', '--enrich', is_flag=True, help="Extract title, content hash, URL parts, status class, headers and technologies to the enrich.* keyword fields.")
+@click.option('--enrich-workers', default=0, type=click.IntRange(0), help="Processes used by --enrich. Default one per CPU")
+@click.option('--alerts', is_flag=True, help="Print the documents that match the saved queries of hz watch as JSON lines.")
+@click.option('--agent/--no-agent', 'use_agent', default=True, help="Send the file to the agent when it is running. Default --agent")
+@click.option('-a', '--async', 'run_async', is_flag=True, help="Only with the agent. Return the job id without waiting for the upload.")
 @pass_environment
-def cli(ctx, verbose, project, session, cmd, filename, filter_dups, remove_filter_dups):
+def cli(ctx, verbose, project, session, cmd, filename, filter_dups, remove_filter_dups, near_dups, resume,
+        watch, watch_suffix, batch_size, max_docs_rate, max_bytes_rate, lines, flush_interval, enrich, enrich_workers,
+        alerts, use_agent, run_async):
     """
     Collect Data from external sources
     """
     ctx.verbose = verbose
+    enrich_workers = enrich_workers if enrich else None
+    ctx.config["ingest"] = {
+        "batch_size": batch_size,
+        "max_docs_rate": max_docs_rate,
+        "max_bytes_rate": max_bytes_rate}
+    stdin = None
+    # Opened files always have a name, the streams of stdin may not
+    if filename and getattr(filename, "name", "<stdin>") == "<stdin>":
+        stdin, filename = filename, None
+    elif lines:
+        stdin = click.get_text_stream("stdin")
+    if resume and filename and not session:
+        # Continue with the session of the interrupted collect
+        session = find_checkpoint_session(filename.name)
+        if not session:
+            ctx.log("There is nothing to resume for {}.".format(filename.name))
     session = session if session else get_random_name()
     log_session(session)
     if cmd and "ffuf" in cmd:
@@ -44,21 +89,82 @@ def cli(ctx, verbose, project, session, cmd, filename, filter_dups, remove_filte
             ctx.vlog("Getting the JSON Files.")
             ffuf_files = collect(path=tmp_path, prefix="ffuf_http")
             ctx.vlog("Uploading info to ElasticSeach.")
-            hes = HoruzES(project, ctx)
+            hes = local_es(project, ctx, alerts)
             hes.save_json(
                 files=ffuf_files,
                 session=session,
                 filter_dups=filter_dups,
-                remove_filter_dups=remove_filter_dups)
+                remove_filter_dups=remove_filter_dups,
+                near_dups=near_dups,
+                enrich_workers=enrich_workers)
             # Deleting remainign files
             os.popen("rm -rf {}".format(tmp_path))
         else:
             ctx.log("Command execution fail! :collision:")
-    if filename:
-        hes = HoruzES(project, ctx)
+    if filename and use_agent and not (resume or alerts) and agent_running():
+        response = agent_request({
+            "op": "collect",
+            "options": client_options(ctx),
+            "project": project,
+            "session": session,
+            "files": [os.path.abspath(filename.name)],
+            "filter_dups": filter_dups,
+            "remove_filter_dups": remove_filter_dups,
+            "near_dups": near_dups,
+            "enrich": enrich_workers})
+        job = response["job"]
+        ctx.log("Job {} sent to the agent.".format(job["id"]))
+        while not run_async and job["status"] in ("queued", "running"):
+            time.sleep(0.2)
+            job = agent_request({"op": "job", "id": job["id"]})["job"]
+        if not run_async:
+            ctx.log("Job {} {}.".format(job["id"], job["status"]))
+            if job["error"]:
+                ctx.log(job["error"])
+    elif filename:
+        hes = local_es(project, ctx, alerts)
         ctx.vlog("Uploading file info to ElasticSeach.")
         hes.save_json(
             files=[filename.name],
             session=session,
             filter_dups=filter_dups,
-            remove_filter_dups=remove_filter_dups)
+            remove_filter_dups=remove_filter_dups,
+            resume=resume,
+            near_dups=near_dups,
+            enrich_workers=enrich_workers)
+    if stdin:
+        hes = local_es(project, ctx, alerts)
+        ctx.vlog("Uploading stdin to ElasticSeach.")
+        hes.save_stream(
+            stdin, session, lines_field=lines, flush_interval=flush_interval, enrich_workers=enrich_workers)
+    if watch:
+        hes = local_es(project, ctx, alerts)
+        ctx.log("Watching {} for new files. Press Ctrl-C to stop.".format(watch))
+        watcher = DirectoryWatcher(watch, suffix=watch_suffix)
+        try:
+            for path in watcher:
+                if is_ingested(path):
+                    ctx.vlog("{} was already collected.".format(path))
+                    continue
+                # Changed or interrupted files keep their session, so their documents are overwritten
+                file_session = ingested_session(path) or find_checkpoint_session(path) or session
+                try:
+                    saved = hes.save_json(
+                        files=[path],
+                        session=file_session,
+                        filter_dups=filter_dups,
+                        remove_filter_dups=remove_filter_dups,
+                        resume=True,
+                        near_dups=near_dups,
+                        enrich_workers=enrich_workers)
+                except OSError as e:
+                    ctx.log("Could not collect {}: {}".format(path, e))
+                    saved = False
+                if saved:
+                    mark_ingested(path, file_session)
+                else:
+                    # Resumed from its last acknowledged batch
+                    ctx.log("{} will be collected again later.".format(path))
+                    watcher.retry(path)
+        except KeyboardInterrupt:
+            ctx.log("Watch stopped.")
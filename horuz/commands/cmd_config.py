@@ -1,8 +1,7 @@
-import os
-
 import click
 
 from horuz.cli import pass_environment
+from horuz.utils.config import write_config
 from horuz.utils.es import HoruzES
 
 
@@ -15,21 +14,26 @@ def cli():
 
 
 @cli.command("server:add")
-@click.option('-a', '--address', help='ElasticSearch Address http://localhost:9200.')
+@click.option('-a', '--address', multiple=True, help='ElasticSearch Address http://localhost:9200. Repeat it to add more nodes.')
+@click.option('--sniff/--no-sniff', default=None, help='Discover the other nodes of the cluster.')
+@click.option('--maxsize', type=click.IntRange(1, 1000), help='Connections kept open per node.')
+@click.option('--timeout', type=float, help='Request timeout in seconds.')
+@click.option('--compress/--no-compress', default=None, help='Gzip the requests and responses.')
 @pass_environment
-def config_server_add(ctx, address):
+def config_server_add(ctx, address, sniff, maxsize, timeout, compress):
     """
     Add your ElasticSearch server.
     """
-    config_file = os.path.expanduser('~/.horuz/horuz.cfg')
-    os.makedirs(os.path.dirname(config_file), exist_ok=True)
-    address = click.prompt(
-        "Please enter the address of your ElasticSearch",
-        default=address
-    )
-    with open(config_file, 'w') as cfg:
-        cfg.write(address)
-        ctx.log('ElasticSearch is connected now to {}'.format(address))
+    hosts = list(address)
+    if not hosts:
+        hosts = [click.prompt("Please enter the address of your ElasticSearch")]
+    write_config({
+        "hosts": hosts,
+        "sniff": sniff,
+        "maxsize": maxsize,
+        "timeout": timeout,
+        "compress": compress})
+    ctx.log('ElasticSearch is connected now to {}'.format(", ".join(hosts)))
 
 
 @cli.command("server:status")
@@ -0,0 +1,35 @@
+import click
+
+from horuz.cli import pass_environment
+from horuz.utils.cli import get_query_fields, run_task
+from horuz.utils.es import HoruzES
+
+
+@click.command("delete", short_help="Delete the documents matching a query.")
+@click.option("-v", "--verbose", is_flag=True, help="Enables verbose mode.")
+@click.option('-p', '--project', required=True, help='Project name')
+@click.option('-q', '--query', required=True, help='Query to ElasticSeach', autocompletion=get_query_fields)
+@click.option('-rps', '--requests-per-second', type=float, help='Throttle the delete. Unlimited by default.')
+@click.option('--wait/--no-wait', default=True, help='Follow the delete progress or leave it running in the server.')
+@pass_environment
+def cli(ctx, verbose, project, query, requests_per_second, wait):
+    """
+    Delete the documents matching the query in a server-side task.
+    """
+    ctx.verbose = verbose
+    hes = HoruzES(project, ctx)
+    total = hes.count(query)
+    if not total:
+        ctx.log("No documents match the query.")
+        return
+    click.confirm(
+        "Are you sure you want to delete {} documents of {}?".format(total, project),
+        abort=True,
+        default=True)
+    task_id = hes.delete_by_query(
+        {"query_string": {"query": query}},
+        requests_per_second=requests_per_second)
+    response = run_task(ctx, hes, task_id, wait, "Deleting...")
+    if response:
+        ctx.log("Deleted: {}".format(response.get("deleted", 0)))
+        hes.rebuild_hosts()
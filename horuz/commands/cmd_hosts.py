@@ -0,0 +1,51 @@
+import json
+
+import click
+
+from horuz.cli import pass_environment
+from horuz.utils.cli import get_sessions
+from horuz.utils.es import HoruzES
+from horuz.utils.style import rtable
+
+
+@click.command("hosts", short_help="Show the hosts inventory of a project.")
+@click.option("-v", "--verbose", is_flag=True, help="Enables verbose mode.")
+@click.option('-p', '--project', required=True, help='Project name')
+@click.option('--host', help='Only the hosts that match this pattern, e.g. *api*')
+@click.option('-s', '--session', help='Only the hosts seen in this session', autocompletion=get_sessions)
+@click.option('--sort', default="last_seen", type=click.Choice(["last_seen", "first_seen", "hits"]), help='Sort field, descending. Default last_seen')
+@click.option('-n', '--size', default=100, type=click.IntRange(1, 10000), help='Number of hosts. Default 100')
+@click.option('--rebuild', is_flag=True, help='Count the inventory again from the results first.')
+@click.option('-oJ', is_flag=True, help="JSON Lines Output")
+@pass_environment
+def cli(ctx, verbose, project, host, session, sort, size, rebuild, oj):
+    """
+    When every host was first and last seen, in which sessions, with which
+    status codes and how many results it has. The inventory is updated by
+    the collects, without reading the results. --rebuild counts it again
+    from the results, e.g. after a task left running with --no-wait.
+    """
+    ctx.verbose = verbose
+    hes = HoruzES(project, ctx)
+    try:
+        if rebuild:
+            hes.es.require("Hosts inventory")
+            hes.rebuild_hosts()
+        hosts = hes.hosts(host, session, size, sort)
+    except NotImplementedError as e:
+        ctx.log(str(e))
+        return
+    if oj:
+        for entry in hosts:
+            click.echo(json.dumps(entry))
+        return
+    if not hosts:
+        ctx.log("There are no hosts in {}.".format(project))
+        return
+    for column in ("Host", "First seen", "Last seen", "Hits", "Statuses", "Sessions"):
+        rtable.add_column(column, style="cyan")
+    for entry in hosts:
+        rtable.add_row(
+            entry["host"], str(entry.get("first_seen", "")), str(entry.get("last_seen", "")), str(entry.get("hits", 0)),
+            ", ".join(str(s) for s in sorted(entry.get("statuses", []))), ", ".join(entry.get("sessions", [])))
+    ctx.log(rtable)
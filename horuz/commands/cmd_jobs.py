@@ -0,0 +1,57 @@
+import datetime
+import json
+
+import click
+
+from horuz.cli import pass_environment
+from horuz.utils.agent import agent_request, agent_running
+from horuz.utils.style import rtable
+
+
+@click.group()
+def cli():
+    """
+    Manage the collects sent to the agent
+    """
+
+
+@cli.command("ls")
+@pass_environment
+def jobs_ls(ctx):
+    """
+    List the collect jobs of the agent
+    """
+    if not agent_running():
+        ctx.log("The agent is not running. Start it with hz agent start")
+        return
+    jobs = agent_request({"op": "jobs"})["jobs"]
+    if not jobs:
+        ctx.log("There are no jobs.")
+        return
+    rtable.add_column("Job", style="cyan", no_wrap=True)
+    rtable.add_column("Status", style="cyan")
+    rtable.add_column("Project", style="cyan")
+    rtable.add_column("Session", style="cyan")
+    rtable.add_column("Created", style="cyan")
+    rtable.add_column("Files", style="cyan")
+    for job in jobs:
+        created = datetime.datetime.fromtimestamp(job["created"]).strftime("%Y-%m-%d %H:%M:%S")
+        rtable.add_row(job["id"], job["status"], job["project"], job["session"], created, ", ".join(job["files"]))
+    ctx.log(rtable)
+
+
+@cli.command("status")
+@click.argument('job_id')
+@pass_environment
+def jobs_status(ctx, job_id):
+    """
+    Show the status of a job
+    """
+    if not agent_running():
+        ctx.log("The agent is not running. Start it with hz agent start")
+        return
+    response = agent_request({"op": "job", "id": job_id})
+    if not response["ok"]:
+        ctx.log(response["error"])
+        return
+    click.echo(json.dumps(response["job"], indent=4, sort_keys=True))
@@ -0,0 +1,56 @@
+import json
+import sys
+
+import click
+
+from horuz.cli import pass_environment
+from horuz.utils.cli import get_fields
+from horuz.utils.es import HoruzES, LOOKUP_CHUNK, LOOKUP_MAX_CHUNK, LOOKUP_WORKERS
+
+
+@click.command("lookup", short_help="Check which values are in a project.")
+@click.option("-v", "--verbose", is_flag=True, help="Enables verbose mode.")
+@click.option('-p', '--project', required=True, help='Project name')
+@click.option('--field', required=True, help='Field of the values, e.g. host', autocompletion=get_fields)
+@click.option('-i', '--input', 'input_file', type=click.File(), help='File with one value per line. stdin by default.')
+@click.option('--only', type=click.Choice(["found", "missing"]), help='Only show the found or the missing values.')
+@click.option('--chunk', default=LOOKUP_CHUNK, type=click.IntRange(1, LOOKUP_MAX_CHUNK), help='Values per request. Default {}'.format(LOOKUP_CHUNK))
+@click.option('-w', '--workers', default=LOOKUP_WORKERS, type=click.IntRange(1, 32), help='Concurrent requests. Default {}'.format(LOOKUP_WORKERS))
+@click.option('-oJ', is_flag=True, help="JSON Lines Output")
+@pass_environment
+def cli(ctx, verbose, project, field, input_file, only, chunk, workers, oj):
+    """
+    Look up a list of values, one per line, in a field of the project and
+    print if they were found, with their _ids and sessions, or missing.
+
+    hz lookup -p project --field host < hosts.txt
+    """
+    ctx.verbose = verbose
+    source = input_file or sys.stdin
+    # Repeated values are looked up once, in the order of the input
+    values = list(dict.fromkeys(v.strip() for v in source if v.strip()))
+    if not values:
+        ctx.log("There are no values to look up.")
+        return
+    hes = HoruzES(project, ctx)
+    found = 0
+    try:
+        for value, match in hes.lookup(field, values, chunk_size=chunk, workers=workers):
+            status = "found" if match else "missing"
+            found += bool(match)
+            if only and only != status:
+                continue
+            match = match or {}
+            if oj:
+                click.echo(json.dumps({
+                    "value": value, "status": status, "count": match.get("count", 0),
+                    "ids": match.get("ids", []), "sessions": match.get("sessions", [])}))
+            elif match:
+                click.echo("found\t{}\t{}\t{}\t{}".format(
+                    value, match["count"], ",".join(match["sessions"]), ",".join(match["ids"])))
+            else:
+                click.echo("missing\t{}".format(value))
+    except ValueError as e:
+        ctx.log(str(e))
+        return
+    ctx.vlog("{} found, {} missing.".format(found, len(values) - found))
@@ -2,7 +2,9 @@ import json
 import click
 
 from horuz.cli import pass_environment
-from horuz.utils.es import HoruzES
+from horuz.utils.cli import run_task
+from horuz.utils.es import BODY_INDEX_PROPERTIES, HoruzES
+from horuz.utils.partitions import PERIOD_FORMATS, parse_duration
 from horuz.utils.style import rtable
 
 
@@ -14,6 +16,107 @@ def cli():
     pass
 
 
+@cli.command("create")
+@click.option("-v", "--verbose", is_flag=True, help="Enables verbose mode.")
+@click.option('-p', '--project', required=True, help='Specify the project to create.')
+@click.option('-pt', '--partition', type=click.Choice(sorted(PERIOD_FORMATS)), help='Store the project in one index per period behind an alias.')
+@click.option('-bi', '--body-index', is_flag=True, help='Index the response bodies for fast *substring* searches. Uses more disk.')
+@click.option('-rps', '--requests-per-second', type=float, help='Throttle the indexing of the existing bodies. Unlimited by default.')
+@click.option('--wait/--no-wait', default=True, help='Follow the indexing of the existing bodies or leave it running in the server.')
+@pass_environment
+def projects_create(ctx, verbose, project, partition, body_index, requests_per_second, wait):
+    """
+    Create an ElasticSeach Project. Projects are also created on the first collect.
+    """
+    ctx.verbose = verbose
+    hes = HoruzES(project, ctx)
+    properties = BODY_INDEX_PROPERTIES if body_index else None
+    if project in (hes.indexes() or []):
+        if body_index:
+            task_id = hes.add_body_index(requests_per_second)
+            if task_id:
+                ctx.log("Body index added to {}, the existing documents are indexed again.".format(project))
+                ctx.log("Substring searches miss the old documents until it is done.")
+                response = run_task(ctx, hes, task_id, wait, "Indexing the bodies...")
+                if response:
+                    ctx.log("Indexed: {}".format(response.get("updated", 0)))
+            hes.project_mapping()
+            return
+        ctx.log("Project {} already exists.".format(project))
+        return
+    if partition:
+        created = hes.create_partitioned(partition, properties)
+    else:
+        created = hes.es.create_index(project, {"properties": properties} if properties else None)
+    if created:
+        hes.project_mapping()
+        ctx.log("Project {} was created.".format(project))
+
+
+@cli.command("prune")
+@click.option("-v", "--verbose", is_flag=True, help="Enables verbose mode.")
+@click.option('-p', '--project', required=True, help='Specify the partitioned project.')
+@click.option('-ot', '--older-than', required=True, help='Delete the partitions older than this. Example: 90d, 12w')
+@pass_environment
+def projects_prune(ctx, verbose, project, older_than):
+    """
+    Delete the old partitions of a partitioned project
+    """
+    ctx.verbose = verbose
+    try:
+        older_than = parse_duration(older_than)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    click.confirm(
+        "Are you sure you want to delete the data of {} older than {}?".format(project, older_than),
+        abort=True,
+        default=True)
+    hes = HoruzES(project, ctx)
+    for index in hes.prune(older_than):
+        ctx.log("Partition {} was deleted.".format(index))
+
+
+@cli.command("export")
+@click.option("-v", "--verbose", is_flag=True, help="Enables verbose mode.")
+@click.option('-p', '--project', required=True, help='Specify the project to export.')
+@click.option('-o', '--output', required=True, type=click.Path(file_okay=False), help='Output directory.')
+@click.option('-sl', '--slices', default=4, type=click.IntRange(1, 64), help='Parallel readers and output files. Default 4')
+@pass_environment
+def projects_export(ctx, verbose, project, output, slices):
+    """
+    Export a project to compressed NDJSON files
+    """
+    ctx.verbose = verbose
+    hes = HoruzES(project, ctx)
+    try:
+        exported = hes.export_project(output, slices)
+    except Exception as e:
+        ctx.log("Export failed! {}".format(e))
+        return
+    ctx.log("{} documents of {} exported to {}".format(exported, project, output))
+
+
+@cli.command("import")
+@click.option("-v", "--verbose", is_flag=True, help="Enables verbose mode.")
+@click.option('-p', '--project', required=True, help='Specify the project to import to.')
+@click.option('-i', '--input', 'input_dir', required=True, type=click.Path(exists=True, file_okay=False), help='Directory of an exported project.')
+@click.option('-w', '--workers', default=4, type=click.IntRange(1, 64), help='Parallel loaders. Default 4')
+@pass_environment
+def projects_import(ctx, verbose, project, input_dir, workers):
+    """
+    Import a project exported with hz projects export
+    """
+    ctx.verbose = verbose
+    hes = HoruzES(project, ctx)
+    try:
+        imported = hes.import_project(input_dir, workers)
+    except Exception as e:
+        ctx.log("Import failed! {}".format(e))
+        return
+    ctx.log("{} documents imported to {}".format(imported, project))
+    hes.rebuild_hosts()
+
+
 @cli.command("rm")
 @click.option("-v", "--verbose", is_flag=True, help="Enables verbose mode.")
 @click.option('-p', '--project', required=True, help='Specify the project to delete.')
@@ -69,8 +172,10 @@ def projects_describe(ctx, verbose, project):
     mapping = hes.project_mapping()
     if mapping:
         rtable.add_column("{} fields".format(project), style="cyan", no_wrap=True)
-        for i in mapping:
-            rtable.add_row(i)
+        rtable.add_column("Type", style="cyan")
+        rtable.add_column("Aggregatable", style="cyan")
+        for field, spec in mapping.items():
+            rtable.add_row(field, spec["type"], "yes" if spec["aggregatable"] else "")
         ctx.log(rtable)
     else:
         ctx.log("Project does not exist!")
@@ -4,35 +4,84 @@ import time
 import datetime
 
 from horuz.cli import pass_environment
+from horuz.utils.agent import agent_request, agent_running, client_options
+from horuz.utils.catalog import load_catalog, tag_query
+from horuz.utils.cli import get_fields, get_query_fields, parse_tags
 from horuz.utils.formatting import beautify_query
-from horuz.utils.es import HoruzES
-from horuz.utils.style import rtable
+from horuz.utils.partitions import parse_duration
+from horuz.utils.profile import Timings, instrument, print_profile
+from horuz.utils.style import rconsole, rconsole_err, rtable
 
 
 @click.command("search", short_help="Search data in ES.")
 @click.option("-v", "--verbose", is_flag=True, help="Enables verbose mode.")
 @click.option('-p', '--project', required=True, help='Project name')
-@click.option('-q', '--query', required=True, help='Query to ElasticSeach')
-@click.option('-f', '--fields', help='Specify the fields you want.')
+@click.option('-q', '--query', required=True, help='Query to ElasticSeach', autocompletion=get_query_fields)
+@click.option('-f', '--fields', help='Specify the fields you want.', autocompletion=get_fields)
 @click.option('-s', '--size', default=100, type=click.IntRange(1, 10000), help='Specify the output size. Range 1-10000')
 @click.option('-o', '--order', default="time:desc", help='Specify the sorting of the query. Default time:desc')
 @click.option('-oJ', is_flag=True, help="JSON Output")
 @click.option('-tl', '--tail', is_flag=True, help="Get the last live info from ElasticSearch. Based on your custom order flag.")
+@click.option('-F', '--full', is_flag=True, help="Include the heavy fields like result.html when no fields are specified.")
+@click.option('-sn', '--since', help="Only search the documents of the last period. Example: 24h, 7d")
+@click.option('--agent/--no-agent', 'use_agent', default=True, help="Send the query to the agent when it is running. Default --agent")
+@click.option('-t', '--tag', 'tags', multiple=True, callback=parse_tags, help="Only the documents with this tag, key=value or key. Can be repeated.")
+@click.option('--profile', is_flag=True, help="Print the server and client timings of the search to stderr. The table is printed without pager.")
 @pass_environment
-def cli(ctx, verbose, project, query, fields, size, order, oj, tail):
+def cli(ctx, verbose, project, query, fields, size, order, oj, tail, full, since, use_agent, tags, profile):
     """
     Get data from ElasticSeach.
     """
     ctx.verbose = verbose
-    hes = HoruzES(project, ctx)
     fields = fields.split(",") if fields else []
+    try:
+        since = parse_duration(since) if since else None
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    hes = None
+    # The client timings are only measured without the agent
+    if profile or not (use_agent and agent_running()):
+        # The ES client is only loaded when the agent does not do the work
+        from horuz.utils.es import HoruzES
+        hes = HoruzES(project, ctx)
+    if tags:
+        query = "({}) AND {}".format(query, tag_query(tags, load_catalog(project)))
+    # Measuring is cheap, the timings are only printed with --profile
+    timings = Timings()
+    step = timings.measure
+    profile = profile and not tail
+    if profile:
+        instrument(hes, timings)
+
+    def run_query(term, size, order, fields, full=False, since=None, docvalues=False):
+        if hes:
+            return hes.query(
+                term=term, size=size, order=order, fields=fields, full=full, since=since, profile=profile,
+                docvalues=docvalues)
+        response = agent_request({
+            "op": "search",
+            "options": client_options(ctx),
+            "project": project,
+            "term": term,
+            "size": size,
+            "order": order,
+            "fields": fields,
+            "full": full,
+            "docvalues": docvalues,
+            "since": since.total_seconds() if since else None})
+        if not response["ok"]:
+            ctx.log(response["error"])
+            return None
+        return response["response"]
+
     if oj:
         # JSON Output
-        data = beautify_query(
-            hes.query(term=query, size=size, order=order, fields=fields),
-            fields,
-            output="json")
-        click.echo(data)
+        with step("request"):
+            response = run_query(term=query, size=size, order=order, fields=fields, full=full, since=since)
+        with step("format"):
+            data = beautify_query(response, fields, output="json")
+        with step("render"):
+            click.echo(data)
     elif tail:
         # Get the last infor from elasticsearch
         if not fields:
@@ -40,7 +89,7 @@ def cli(ctx, verbose, project, query, fields, size, order, oj, tail):
         showed_ids = []
         while True:
             data = beautify_query(
-                hes.query(term=query, size=1, order=order, fields=fields),
+                run_query(term=query, size=1, order=order, fields=fields, since=since, docvalues=True),
                 fields,
                 output="interactive")
             if data and data[0]['_id'] not in showed_ids:
@@ -52,14 +101,20 @@ def cli(ctx, verbose, project, query, fields, size, order, oj, tail):
         # Default fields if nothing were introduced
         if not fields:
             fields = ["_id", "time", "session"]
-        data = beautify_query(
-            hes.query(term=query, size=size, order=order, fields=fields),
-            fields,
-            output="interactive")
+        with step("request"):
+            response = run_query(term=query, size=size, order=order, fields=fields, since=since, docvalues=True)
+        with step("format"):
+            data = beautify_query(response, fields, output="interactive")
         # Adding columns
         if data:
             for column in data[0].keys():
                 rtable.add_column(column, style="cyan")
             for i in data:
                 rtable.add_row(*i.values())
-            ctx.log(rtable, pager=True)
+            with step("render"):
+                if profile:
+                    rconsole.print(rtable)
+                else:
+                    ctx.log(rtable, pager=True)
+    if profile:
+        print_profile(rconsole_err, response, timings)
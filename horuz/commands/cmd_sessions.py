@@ -1,6 +1,10 @@
+import json
+
 import click
+from rich.progress import Progress
 
 from horuz.cli import pass_environment
+from horuz.utils.cli import get_sessions, parse_assignments, run_task
 from horuz.utils.es import HoruzES
 from horuz.utils.style import rtable
 
@@ -37,3 +41,166 @@ def sessions_ls(ctx, verbose, project):
     for i in data["aggregations"]["sessions"]["buckets"]:
         rtable.add_row(i['key'], str(i['doc_count']))
     ctx.log(rtable)
+
+
+@cli.command("rm")
+@click.option("-v", "--verbose", is_flag=True, help="Enables verbose mode.")
+@click.option('-p', '--project', required=True, help='Specify the project.')
+@click.option('-s', '--session', required=True, multiple=True, help='Session to delete. Can be repeated.', autocompletion=get_sessions)
+@click.option('-rps', '--requests-per-second', type=float, help='Throttle the delete. Unlimited by default.')
+@click.option('--wait/--no-wait', default=True, help='Follow the delete progress or leave it running in the server.')
+@pass_environment
+def sessions_rm(ctx, verbose, project, session, requests_per_second, wait):
+    """
+    Delete the documents of your sessions
+    """
+    ctx.verbose = verbose
+    hes = HoruzES(project, ctx)
+    click.confirm(
+        "Are you sure you want to delete the session(s) {} of {}?".format(", ".join(session), project),
+        abort=True,
+        default=True)
+    task_id = hes.delete_by_query(
+        hes.session_query(session),
+        requests_per_second=requests_per_second)
+    response = run_task(ctx, hes, task_id, wait, "Deleting sessions...")
+    if response:
+        ctx.log("Deleted: {}".format(response.get("deleted", 0)))
+        hes.rebuild_hosts()
+
+
+@cli.command("diff")
+@click.option("-v", "--verbose", is_flag=True, help="Enables verbose mode.")
+@click.option('-p', '--project', required=True, help='Specify the project.')
+@click.option('-k', '--key', required=True, help='Fields that identify a record, separated with commas. Example: host')
+@click.option('-c', '--compare', help='Fields compared for the keys of both sessions, separated with commas. Example: status,result.length')
+@click.option('-oJ', is_flag=True, help="JSON Lines Output")
+@click.argument('base', autocompletion=get_sessions)
+@click.argument('other', autocompletion=get_sessions)
+@pass_environment
+def sessions_diff(ctx, verbose, project, key, compare, oj, base, other):
+    """
+    Show the records added, removed and changed from the session BASE to OTHER
+    """
+    ctx.verbose = verbose
+    hes = HoruzES(project, ctx)
+    keys = key.split(",")
+    compare = compare.split(",") if compare else []
+    marks = {"added": ("+", "green"), "removed": ("-", "red"), "changed": ("~", "yellow")}
+    totals = {change: 0 for change in marks}
+    for change, values, detail in hes.session_diff(base, other, keys, compare):
+        totals[change] += 1
+        if oj:
+            click.echo(json.dumps(dict(detail, change=change, key=values)))
+            continue
+        mark, color = marks[change]
+        line = "{} {} {}".format(mark, " ".join("{}={}".format(k, v) for k, v in values.items()), detail["_id"])
+        for field, (old, new) in detail.get("changes", {}).items():
+            line += " {}: {} -> {}".format(field, ",".join(map(str, old)), ",".join(map(str, new)))
+        click.secho(line, fg=color)
+    ctx.log("Added: {added}, removed: {removed}, changed: {changed}".format(**totals))
+
+
+def _rewrites(to_session, rewrite):
+    rewrite = dict(rewrite)
+    if to_session:
+        rewrite["session"] = to_session
+    return rewrite
+
+
+@cli.command("cp")
+@click.option("-v", "--verbose", is_flag=True, help="Enables verbose mode.")
+@click.option('-p', '--project', required=True, help='Specify the project.')
+@click.option('-s', '--session', required=True, multiple=True, help='Session to copy. Can be repeated.', autocompletion=get_sessions)
+@click.option('-tp', '--to-project', help='Destination project. Default the same project.')
+@click.option('-ts', '--to-session', help='Session name of the copies. Required to copy in the same project.')
+@click.option('--rewrite', multiple=True, callback=parse_assignments, help='Field to change in the copies, field=value. Can be repeated.')
+@click.option('-rps', '--requests-per-second', type=float, help='Throttle the copy. Unlimited by default.')
+@click.option('--wait/--no-wait', default=True, help='Follow the copy progress or leave it running in the server.')
+@pass_environment
+def sessions_cp(ctx, verbose, project, session, to_project, to_session, rewrite, requests_per_second, wait):
+    """
+    Copy sessions to another project or session, inside the cluster
+    """
+    ctx.verbose = verbose
+    to_project = to_project or project
+    if to_project == project and not to_session:
+        raise click.UsageError("Use --to-session to copy in the same project.")
+    hes = HoruzES(project, ctx)
+    dest = HoruzES(to_project, ctx)
+    task_id = hes.copy_sessions(session, dest, _rewrites(to_session, rewrite), requests_per_second=requests_per_second)
+    response = run_task(ctx, hes, task_id, wait, "Copying sessions...")
+    if response:
+        ctx.log("Copied: {}".format(response.get("created", 0) + response.get("updated", 0)))
+        dest.rebuild_hosts()
+
+
+@cli.command("mv")
+@click.option("-v", "--verbose", is_flag=True, help="Enables verbose mode.")
+@click.option('-p', '--project', required=True, help='Specify the project.')
+@click.option('-s', '--session', required=True, multiple=True, help='Session to move. Can be repeated.', autocompletion=get_sessions)
+@click.option('-tp', '--to-project', help='Destination project. Default the same project.')
+@click.option('-ts', '--to-session', help='New session name.')
+@click.option('--rewrite', multiple=True, callback=parse_assignments, help='Field to change in the moved documents, field=value. Can be repeated.')
+@click.option('-rps', '--requests-per-second', type=float, help='Throttle the move. Unlimited by default.')
+@pass_environment
+def sessions_mv(ctx, verbose, project, session, to_project, to_session, rewrite, requests_per_second):
+    """
+    Move sessions to another project or rename them, inside the cluster.
+    The source documents are deleted in chunks, once each chunk was copied.
+    """
+    ctx.verbose = verbose
+    to_project = to_project or project
+    rewrite = _rewrites(to_session, rewrite)
+    hes = HoruzES(project, ctx)
+    if to_project == project:
+        if not rewrite:
+            raise click.UsageError("Use --to-session or --rewrite to move in the same project.")
+        # Renames are updated in place
+        task_id = hes.rewrite_sessions(session, rewrite, requests_per_second=requests_per_second)
+        response = run_task(ctx, hes, task_id, True, "Moving sessions...")
+        if response:
+            ctx.log("Moved: {}".format(response.get("updated", 0)))
+            hes.rebuild_hosts()
+        return
+    dest = HoruzES(to_project, ctx)
+    total = copied = deleted = 0
+    with Progress() as progress:
+        bar = progress.add_task("Moving sessions...", total=0)
+        for total, chunk_copied, chunk_deleted in hes.move_sessions(
+                session, dest, rewrite, requests_per_second=requests_per_second):
+            copied += chunk_copied
+            deleted += chunk_deleted
+            progress.update(bar, completed=copied, total=total)
+    ctx.log("Copied: {}".format(copied))
+    ctx.log("Deleted from {}: {}".format(project, deleted))
+    if copied < total:
+        ctx.log("The documents that were not moved were kept in {}.".format(project))
+    if copied:
+        hes.rebuild_hosts()
+        dest.rebuild_hosts()
+
+
+@cli.command("merge")
+@click.option("-v", "--verbose", is_flag=True, help="Enables verbose mode.")
+@click.option('-p', '--project', required=True, help='Specify the project.')
+@click.option('-s', '--session', required=True, multiple=True, help='Session to merge. Can be repeated.', autocompletion=get_sessions)
+@click.option('-i', '--into', required=True, help='Name of the merged session, it can be one of the merged sessions.')
+@click.option('-rps', '--requests-per-second', type=float, help='Throttle the merge. Unlimited by default.')
+@click.option('--wait/--no-wait', default=True, help='Follow the merge progress or leave it running in the server.')
+@pass_environment
+def sessions_merge(ctx, verbose, project, session, into, requests_per_second, wait):
+    """
+    Merge sessions of a project into one session
+    """
+    ctx.verbose = verbose
+    hes = HoruzES(project, ctx)
+    sessions = [s for s in session if s != into]
+    if not sessions:
+        ctx.log("There is nothing to merge.")
+        return
+    task_id = hes.rewrite_sessions(sessions, {"session": into}, requests_per_second=requests_per_second)
+    response = run_task(ctx, hes, task_id, wait, "Merging sessions...")
+    if response:
+        ctx.log("Merged into {}: {}".format(into, response.get("updated", 0)))
+        hes.rebuild_hosts()
@@ -0,0 +1,31 @@
+import json
+import sys
+
+import click
+
+from horuz.cli import pass_environment
+from horuz.utils.cli import get_fields
+from horuz.utils.es import HoruzES
+
+
+@click.command("show", short_help="Show full documents by id.")
+@click.option("-v", "--verbose", is_flag=True, help="Enables verbose mode.")
+@click.option('-p', '--project', required=True, help='Project name')
+@click.option('-f', '--fields', help='Specify the fields you want. All by default.', autocompletion=get_fields)
+@click.argument('ids', nargs=-1)
+@pass_environment
+def cli(ctx, verbose, project, fields, ids):
+    """
+    Get the full documents, bodies included, by _id.
+    The ids are read from stdin when none is given.
+    """
+    ctx.verbose = verbose
+    hes = HoruzES(project, ctx)
+    fields = fields.split(",") if fields else []
+    ids = list(ids) or [i.strip() for i in sys.stdin if i.strip()]
+    data = []
+    for doc in hes.get_documents(ids, fields):
+        d = doc.get("_source", {})
+        d["_id"] = doc["_id"]
+        data.append(d)
+    click.echo(json.dumps(data, indent=4, sort_keys=True))
@@ -0,0 +1,105 @@
+import json
+
+import click
+
+from horuz.cli import pass_environment
+from horuz.utils.catalog import docvalue_field
+from horuz.utils.cli import get_fields, get_query_fields
+from horuz.utils.es import HoruzES
+from horuz.utils.style import new_table
+
+
+@click.command("stats", short_help="Server-side analytics of your data.")
+@click.option("-v", "--verbose", is_flag=True, help="Enables verbose mode.")
+@click.option('-p', '--project', required=True, help='Project name')
+@click.option('-q', '--query', default="*", help='Query to ElasticSeach. All the documents by default', autocompletion=get_query_fields)
+@click.option('-t', '--terms', help='Top values of the field. Example: host', autocompletion=get_fields)
+@click.option('-c', '--cardinality', help='Approximate number of distinct values of the field.', autocompletion=get_fields)
+@click.option('-dh', '--histogram', help='Documents per interval of the date field. Example: time', autocompletion=get_fields)
+@click.option('-i', '--interval', default="day", help='Interval of the date histogram: minute, hour, day, week, month. Default day')
+@click.option('-pc', '--percentiles', help='Percentiles of the numeric field. Example: result.length', autocompletion=get_fields)
+@click.option('-s', '--size', default=10, type=click.IntRange(1, 10000), help='Number of top values. Range 1-10000')
+@click.option('-oJ', is_flag=True, help="JSON Output")
+@pass_environment
+def cli(ctx, verbose, project, query, terms, cardinality, histogram, interval, percentiles, size, oj):
+    """
+    Count and aggregate the documents in ElasticSearch, without downloading them.
+    Only the count is returned if no aggregation is specified.
+    """
+    ctx.verbose = verbose
+    hes = HoruzES(project, ctx)
+    if not any([terms, cardinality, histogram, percentiles]):
+        # Fast path, no aggregation at all
+        total = hes.count(query)
+        if total is None:
+            return
+        if oj:
+            click.echo(json.dumps({"count": total}))
+        else:
+            ctx.log("Count: {}".format(total))
+        return
+
+    catalog = hes.field_catalog()
+    aggs = {}
+    if terms:
+        aggs["terms"] = {"terms": {"field": docvalue_field(catalog, terms) or terms, "size": size}}
+    if cardinality:
+        aggs["cardinality"] = {"cardinality": {"field": docvalue_field(catalog, cardinality) or cardinality}}
+    if histogram:
+        aggs["histogram"] = {
+            "date_histogram": {
+                "field": docvalue_field(catalog, histogram) or histogram,
+                "calendar_interval": interval,
+                "min_doc_count": 1}}
+    if percentiles:
+        aggs["percentiles"] = {"percentiles": {"field": docvalue_field(catalog, percentiles) or percentiles}}
+    data = hes.aggregate(query, aggs)
+    if not data:
+        ctx.log("Stats query failed!")
+        return
+
+    result = {"count": data["hits"]["total"]["value"]}
+    aggregations = data["aggregations"]
+    if terms:
+        result["terms"] = [
+            {"key": b["key"], "count": b["doc_count"]}
+            for b in aggregations["terms"]["buckets"]]
+        result["terms_other"] = aggregations["terms"]["sum_other_doc_count"]
+    if cardinality:
+        result["cardinality"] = aggregations["cardinality"]["value"]
+    if histogram:
+        result["histogram"] = [
+            {"key": b["key_as_string"], "count": b["doc_count"]}
+            for b in aggregations["histogram"]["buckets"]]
+    if percentiles:
+        result["percentiles"] = aggregations["percentiles"]["values"]
+
+    if oj:
+        click.echo(json.dumps(result))
+        return
+    ctx.log("Count: {}".format(result["count"]))
+    if cardinality:
+        ctx.log("Distinct {}: {}".format(cardinality, result["cardinality"]))
+    if terms:
+        table = new_table()
+        table.add_column(terms, style="cyan")
+        table.add_column("Count", style="cyan")
+        for bucket in result["terms"]:
+            table.add_row(str(bucket["key"]), str(bucket["count"]))
+        if result["terms_other"]:
+            table.add_row("(other)", str(result["terms_other"]))
+        ctx.log(table)
+    if histogram:
+        table = new_table()
+        table.add_column(histogram, style="cyan")
+        table.add_column("Count", style="cyan")
+        for bucket in result["histogram"]:
+            table.add_row(bucket["key"], str(bucket["count"]))
+        ctx.log(table)
+    if percentiles:
+        table = new_table()
+        table.add_column("{} percentile".format(percentiles), style="cyan")
+        table.add_column("Value", style="cyan")
+        for percent, value in result["percentiles"].items():
+            table.add_row(percent, str(value))
+        ctx.log(table)
@@ -0,0 +1,38 @@
+import click
+
+from horuz.cli import pass_environment
+from horuz.utils.cli import get_query_fields, parse_tags, run_task
+from horuz.utils.es import HoruzES
+
+
+@click.command("tag", short_help="Tag the documents matching a query.")
+@click.option("-v", "--verbose", is_flag=True, help="Enables verbose mode.")
+@click.option('-p', '--project', required=True, help='Project name')
+@click.option('-q', '--query', required=True, help='Query to ElasticSeach', autocompletion=get_query_fields)
+@click.option('--set', 'set_tags', multiple=True, callback=parse_tags, help='Tag to set, key=value. Can be repeated.')
+@click.option('--unset', 'unset_tags', multiple=True, help='Tag to remove. Can be repeated.')
+@click.option('-rps', '--requests-per-second', type=float, help='Throttle the update. Unlimited by default.')
+@click.option('--wait/--no-wait', default=True, help='Follow the update progress or leave it running in the server.')
+@pass_environment
+def cli(ctx, verbose, project, query, set_tags, unset_tags, requests_per_second, wait):
+    """
+    Set or remove tags of the documents matching the query in a server-side task.
+    Search them with hz search --tag key=value.
+    """
+    ctx.verbose = verbose
+    if not set_tags and not unset_tags:
+        raise click.UsageError("Use --set key=value or --unset key.")
+    if any(value is None for value in set_tags.values()):
+        raise click.BadParameter("--set needs key=value.")
+    hes = HoruzES(project, ctx)
+    total = hes.count(query)
+    if not total:
+        ctx.log("No documents match the query.")
+        return
+    ctx.log("Tagging {} documents of {}.".format(total, project))
+    task_id = hes.tag(query, set_tags, unset_tags, requests_per_second=requests_per_second)
+    response = run_task(ctx, hes, task_id, wait, "Tagging...")
+    if response:
+        ctx.log("Updated: {}, unchanged: {}".format(response.get("updated", 0), response.get("noops", 0)))
+        # The new tags can be completed in the queries
+        hes.project_mapping()
@@ -0,0 +1,73 @@
+import json
+
+import click
+
+from horuz.cli import pass_environment
+from horuz.utils.cli import follow_task, task_progress
+from horuz.utils.es import HoruzES
+from horuz.utils.style import rtable
+
+
+@click.group()
+def cli():
+    """
+    Manage your server-side tasks
+    """
+
+
+@cli.command("ls")
+@click.option("-v", "--verbose", is_flag=True, help="Enables verbose mode.")
+@pass_environment
+def tasks_ls(ctx, verbose):
+    """
+    List the running delete, update and reindex tasks
+    """
+    ctx.verbose = verbose
+    hes = HoruzES("", ctx)
+    tasks = hes.tasks()
+    if not tasks:
+        ctx.log("There are no running tasks.")
+        return
+    rtable.add_column("Task", style="cyan", no_wrap=True)
+    rtable.add_column("Action", style="cyan")
+    rtable.add_column("Progress", style="cyan")
+    rtable.add_column("Description", style="cyan")
+    for task_id, task in tasks.items():
+        done, total = task_progress(task.get("status", {}))
+        rtable.add_row(task_id, task["action"], "{}/{}".format(done, total), task.get("description", ""))
+    ctx.log(rtable)
+
+
+@cli.command("status")
+@click.option("-v", "--verbose", is_flag=True, help="Enables verbose mode.")
+@click.option('-f', '--follow', is_flag=True, help="Follow the progress until the task finishes.")
+@click.argument('task_id')
+@pass_environment
+def tasks_status(ctx, verbose, follow, task_id):
+    """
+    Show the status of a task
+    """
+    ctx.verbose = verbose
+    hes = HoruzES("", ctx)
+    if follow:
+        response = follow_task(hes, task_id)
+        if response:
+            click.echo(json.dumps(response, indent=4, sort_keys=True))
+        return
+    task = hes.task(task_id)
+    if task:
+        click.echo(json.dumps(task, indent=4, sort_keys=True))
+
+
+@cli.command("cancel")
+@click.option("-v", "--verbose", is_flag=True, help="Enables verbose mode.")
+@click.argument('task_id')
+@pass_environment
+def tasks_cancel(ctx, verbose, task_id):
+    """
+    Cancel a running task
+    """
+    ctx.verbose = verbose
+    hes = HoruzES("", ctx)
+    if hes.cancel_task(task_id):
+        ctx.log("Task {} cancelled.".format(task_id))
@@ -0,0 +1,108 @@
+import json
+
+import click
+
+from horuz.cli import pass_environment
+from horuz.utils.cli import get_query_fields
+from horuz.utils.es import HoruzES
+from horuz.utils.style import rtable
+
+
+@click.group()
+def cli():
+    """
+    Manage your saved queries. The collected documents that match them are alerted.
+    """
+
+
+@cli.command("add")
+@click.option("-v", "--verbose", is_flag=True, help="Enables verbose mode.")
+@click.option('-p', '--project', required=True, help='Specify the project.')
+@click.option('-n', '--name', required=True, help='Watch name, adding an existing name replaces its query.')
+@click.option('-q', '--query', required=True, help='Query to match the new documents', autocompletion=get_query_fields)
+@pass_environment
+def watch_add(ctx, verbose, project, name, query):
+    """
+    Save a query, it is matched with every collected batch
+    """
+    ctx.verbose = verbose
+    hes = HoruzES(project, ctx)
+    if hes.add_watch(name, query):
+        ctx.log("Watch {} saved.".format(name))
+
+
+@cli.command("ls")
+@click.option("-v", "--verbose", is_flag=True, help="Enables verbose mode.")
+@click.option('-p', '--project', required=True, help='Specify the project.')
+@pass_environment
+def watch_ls(ctx, verbose, project):
+    """
+    List the saved queries
+    """
+    ctx.verbose = verbose
+    hes = HoruzES(project, ctx)
+    try:
+        watches = hes.watches()
+    except NotImplementedError as e:
+        ctx.log(str(e))
+        return
+    if not watches:
+        ctx.log("There are no watches in {}.".format(project))
+        return
+    rtable.add_column("Name", style="cyan", no_wrap=True)
+    rtable.add_column("Query", style="cyan")
+    rtable.add_column("Created", style="cyan")
+    for watch in sorted(watches, key=lambda w: w["name"]):
+        rtable.add_row(watch["name"], watch["term"], str(watch.get("created", "")))
+    ctx.log(rtable)
+
+
+@cli.command("rm")
+@click.option("-v", "--verbose", is_flag=True, help="Enables verbose mode.")
+@click.option('-p', '--project', required=True, help='Specify the project.')
+@click.argument('name')
+@pass_environment
+def watch_rm(ctx, verbose, project, name):
+    """
+    Delete a saved query
+    """
+    ctx.verbose = verbose
+    hes = HoruzES(project, ctx)
+    if hes.remove_watch(name):
+        ctx.log("Watch {} deleted.".format(name))
+    else:
+        ctx.log("Watch {} not found.".format(name))
+
+
+@cli.command("alerts")
+@click.option("-v", "--verbose", is_flag=True, help="Enables verbose mode.")
+@click.option('-p', '--project', required=True, help='Specify the project.')
+@click.option('-n', '--name', help='Only the alerts of this watch.')
+@click.option('-s', '--size', default=100, type=click.IntRange(1, 10000), help='Number of alerts. Default 100')
+@click.option('-oJ', is_flag=True, help="JSON Lines Output")
+@pass_environment
+def watch_alerts(ctx, verbose, project, name, size, oj):
+    """
+    Show the last documents that matched the saved queries
+    """
+    ctx.verbose = verbose
+    hes = HoruzES(project, ctx)
+    try:
+        alerts = hes.alerts(size, name)
+    except NotImplementedError as e:
+        ctx.log(str(e))
+        return
+    if oj:
+        for alert in alerts:
+            click.echo(json.dumps(alert))
+        return
+    if not alerts:
+        ctx.log("There are no alerts in {}.".format(project))
+        return
+    for column in ("Time", "Watch", "Host", "Session", "Document"):
+        rtable.add_column(column, style="cyan")
+    for alert in alerts:
+        rtable.add_row(
+            alert["time"], alert["watch"], str(alert.get("host") or ""), str(alert.get("session") or ""),
+            alert["doc_id"])
+    ctx.log(rtable)
@@ -0,0 +1,299 @@
+import copy
+import datetime
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+import uuid
+
+from horuz.utils.serializer import dumpb, loads
+
+
+SOCKET_PATH = os.path.expanduser("~/.horuz/agent.sock")
+LOG_PATH = os.path.expanduser("~/.horuz/agent.log")
+# Files with up to this number of records are coalesced in shared bulk requests
+COALESCE_LIMIT = 500
+# Seconds the coalesced records wait for more records before they are sent
+FLUSH_INTERVAL = 1.0
+# Seconds a project connection is reused before its aliases and mapping are read again
+PROJECT_TTL = 60
+# Seconds a finished job can still be asked with hz jobs
+JOB_TTL = 3600
+
+
+def agent_request(payload, path=SOCKET_PATH, timeout=None):
+    """
+    Send a request to the local agent.
+    Parameters
+    ----------
+    payload : Dict
+        The request, op is the operation
+    Returns
+    -------
+    Dict
+        The agent response
+    Raises
+    ------
+    OSError
+        When the agent is not running
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(path)
+        client.sendall(dumpb(payload) + b"\n")
+        with client.makefile("rb") as response:
+            return loads(response.readline())
+
+
+def client_options(ctx):
+    """
+    Connection and ingest options of the command, sent with the requests
+    so the agent works with them instead of its own
+    """
+    return {"elasticsearch": ctx.config.get("elasticsearch"), "ingest": ctx.config.get("ingest")}
+
+
+def agent_running(path=SOCKET_PATH):
+    """
+    Check if the agent answers in its socket
+    """
+    if not os.path.exists(path):
+        return False
+    try:
+        return agent_request({"op": "ping"}, path, timeout=2).get("ok", False)
+    except (OSError, ValueError):
+        return False
+
+
+class AgentHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        try:
+            request = loads(self.rfile.readline())
+            response = self.server.agent.dispatch(request)
+        except Exception as e:
+            response = {"ok": False, "error": str(e)}
+        self.wfile.write(dumpb(response) + b"\n")
+
+
+class AgentServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class HoruzAgent:
+    """
+    Long running process that keeps the connections to ES open and runs
+    the collects and searches of the hz clients. The records of small
+    collects are coalesced in shared bulk requests.
+    """
+
+    def __init__(self, ctx, path=SOCKET_PATH):
+        self.ctx = ctx
+        self.path = path
+        self.projects = {}
+        self.jobs = {}
+        self.buffers = {}
+        self.lock = threading.Lock()
+        self.server = None
+
+    def project(self, name, options=None):
+        """
+        HoruzES of the project for the options of the client, reused by the
+        requests of the next PROJECT_TTL seconds. It is created again after,
+        so the write alias, the layout and the mapping of the project are
+        read again.
+        Parameters
+        ----------
+        name : String
+            Project name
+        options : Dict
+            client_options of the command, the agent options when empty
+        """
+        from horuz.utils.es import HoruzES
+
+        key = self._project_key(name, options)
+        with self.lock:
+            entry = self.projects.get(key)
+            if entry and time.monotonic() - entry[1] < PROJECT_TTL:
+                return entry[0]
+        ctx = copy.copy(self.ctx)
+        ctx.config = dict(self.ctx.config)
+        options = options or {}
+        if options.get("elasticsearch"):
+            ctx.config["elasticsearch"] = options["elasticsearch"]
+            ctx.config["elasticsearch_address"] = options["elasticsearch"]["hosts"][0]
+        if options.get("ingest"):
+            ctx.config["ingest"] = options["ingest"]
+        hes = HoruzES(name, ctx)
+        if entry:
+            # Fields added by other clients since the last connection
+            hes.project_mapping()
+        with self.lock:
+            self.projects[key] = (hes, time.monotonic())
+        return hes
+
+    def _project_key(self, name, options=None):
+        return (name, json.dumps(options or {}, sort_keys=True))
+
+    def serve(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.server = AgentServer(self.path, AgentHandler)
+        self.server.agent = self
+        threading.Thread(target=self._flusher, daemon=True).start()
+        self.ctx.log("Horuz agent listening on {}".format(self.path))
+        try:
+            self.server.serve_forever()
+        finally:
+            self._flush()
+            self.server.server_close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def dispatch(self, request):
+        op = request.get("op")
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid()}
+        if op == "stop":
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return {"ok": True}
+        if op == "search":
+            return self._search(request)
+        if op == "collect":
+            return self._collect(request)
+        if op == "jobs":
+            with self.lock:
+                self._prune_jobs()
+                jobs = sorted(self.jobs.values(), key=lambda j: j["created"])
+            return {"ok": True, "jobs": jobs}
+        if op == "job":
+            job = self.jobs.get(request.get("id"))
+            if not job:
+                return {"ok": False, "error": "Job {} not found".format(request.get("id"))}
+            return {"ok": True, "job": job}
+        return {"ok": False, "error": "Unknown operation {}".format(op)}
+
+    def _search(self, request):
+        since = request.get("since")
+        response = self.project(request["project"], request.get("options")).query(
+            term=request["term"],
+            size=request.get("size", 100),
+            order=request.get("order", "time:desc"),
+            fields=request.get("fields", []),
+            full=request.get("full", False),
+            docvalues=request.get("docvalues", False),
+            since=datetime.timedelta(seconds=since) if since else None)
+        return {"ok": True, "response": response}
+
+    def _new_job(self, request):
+        job = {
+            "id": uuid.uuid4().hex[:12],
+            "project": request["project"],
+            "session": request["session"],
+            "files": request["files"],
+            "status": "queued",
+            "created": time.time(),
+            "finished": None,
+            "error": None
+        }
+        with self.lock:
+            self._prune_jobs()
+            self.jobs[job["id"]] = job
+        return job
+
+    def _prune_jobs(self):
+        """
+        Forget the jobs finished more than JOB_TTL seconds ago
+        """
+        now = time.time()
+        for job_id in [i for i, j in self.jobs.items() if j["finished"] and now - j["finished"] > JOB_TTL]:
+            del self.jobs[job_id]
+
+    def _finish(self, job, saved, error=None):
+        job["status"] = "done" if saved else "failed"
+        job["error"] = error
+        job["finished"] = time.time()
+
+    def _collect(self, request):
+        job = self._new_job(request)
+        records = self._small_records(request)
+        if records is not None:
+            with self.lock:
+                key = self._project_key(request["project"], request.get("options"))
+                self.buffers.setdefault(key, []).append((job, records))
+            self.ctx.vlog("Job {} coalesced, {} records".format(job["id"], len(records)))
+        else:
+            threading.Thread(target=self._run_collect, args=(job, request), daemon=True).start()
+        return {"ok": True, "job": job}
+
+    def _small_records(self, request):
+        """
+        Records of a collect that can be coalesced: one small general JSON
+        file without duplicates filters or enrichment. None for the other collects.
+        """
+        if len(request["files"]) != 1 or request.get("filter_dups") or request.get("near_dups") is not None \
+                or request.get("enrich") is not None:
+            return None
+        path = request["files"][0]
+        if os.path.getsize(path) > COALESCE_LIMIT * 1024:
+            return None
+        try:
+            with open(path, "rb") as f:
+                data = loads(f.read())
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, list) or len(data) > COALESCE_LIMIT or "ffuf" in str(data):
+            return None
+        now = datetime.datetime.now()
+        for record in data:
+            record.update({"time": now, "session": request["session"]})
+        return data
+
+    def _run_collect(self, job, request):
+        job["status"] = "running"
+        try:
+            saved = self.project(request["project"], request.get("options")).save_json(
+                files=request["files"],
+                session=request["session"],
+                filter_dups=request.get("filter_dups"),
+                remove_filter_dups=request.get("remove_filter_dups"),
+                near_dups=request.get("near_dups"),
+                enrich_workers=request.get("enrich"))
+            self._finish(job, saved)
+        except Exception as e:
+            self._finish(job, False, str(e))
+
+    def _flusher(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            self._flush()
+
+    def _flush(self):
+        """
+        Send the coalesced records of each project in shared bulk requests
+        """
+        with self.lock:
+            buffers, self.buffers = self.buffers, {}
+        for (project, options), entries in buffers.items():
+            hes = self.project(project, json.loads(options))
+            for job, _ in entries:
+                job["status"] = "running"
+            # Same ids as a direct collect of the files, sending them again overwrites them
+            actions = [
+                (hes._doc_id(job["session"], job["files"][0], position), record)
+                for job, records in entries for position, record in enumerate(records)]
+            saved = True
+            try:
+                for start in range(0, len(actions), hes.es.batch_size):
+                    saved = hes.save_actions(actions[start:start + hes.es.batch_size]) and saved
+            except Exception as e:
+                for job, _ in entries:
+                    self._finish(job, False, str(e))
+                continue
+            for job, _ in entries:
+                self._finish(job, saved)
+            # New fields could be added by the collects
+            hes.project_mapping()
@@ -0,0 +1,173 @@
+import heapq
+import math
+from array import array
+
+
+# Numeric ffuf result fields read from the doc values
+METRICS = ("length", "words", "lines")
+# Width in bytes of the length buckets
+LENGTH_BUCKET = 100
+# Buckets and combinations of less than this fraction of a host are rare
+RARE_FRACTION = 0.01
+# Minimum z-score shown as a reason
+Z_THRESHOLD = 3
+
+
+class ResponseMetrics:
+    """
+    Column arrays of the ffuf response metrics of a session, one position
+    per document. The hosts are stored once and referenced by position.
+    """
+
+    def __init__(self):
+        self.ids = []
+        self.hosts = []
+        self._host_codes = {}
+        self.host = array("l")
+        self.status = array("l")
+        self.columns = {metric: array("q") for metric in METRICS}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def append(self, doc_id, host, status, metrics):
+        """
+        Add the metrics of a document. The doc values can be floats or
+        strings depending on the mapping, documents with values that are
+        not numbers are skipped.
+        Returns
+        -------
+        Boolean
+            True if the document was added
+        """
+        try:
+            status = _integer(status)
+            values = [_integer(metrics.get(metric, 0)) for metric in METRICS]
+        except (TypeError, ValueError, OverflowError):
+            return False
+        code = self._host_codes.get(host)
+        if code is None:
+            code = self._host_codes[host] = len(self.hosts)
+            self.hosts.append(host)
+        self.ids.append(doc_id)
+        self.host.append(code)
+        self.status.append(status)
+        for metric, value in zip(METRICS, values):
+            self.columns[metric].append(value)
+        return True
+
+
+def _integer(value):
+    """
+    Integer of a doc value, "404" and 1234.0 included
+    """
+    if isinstance(value, str):
+        value = float(value)
+    return int(value)
+
+
+def _groups(codes):
+    """
+    Positions of every value of a column
+    """
+    groups = {}
+    for position, code in enumerate(codes):
+        groups.setdefault(code, []).append(position)
+    return groups
+
+
+def _zscores(values):
+    """
+    Absolute z-scores of the values, zero when they are all the same
+    """
+    n = len(values)
+    mean = sum(values) / n
+    std = math.sqrt(sum((v - mean) ** 2 for v in values) / n)
+    if not std:
+        return [0.0] * n
+    return [abs(v - mean) / std for v in values]
+
+
+def _surprise(counts, keys, n):
+    """
+    Bits of surprise of every key, log2(n / count): 0 for the keys of all
+    the documents and log2(n) for a key seen once
+    """
+    return [math.log2(n / counts[key]) for key in keys]
+
+
+def _count(keys):
+    counts = {}
+    for key in keys:
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def score(metrics, bucket=LENGTH_BUCKET):
+    """
+    Score how anomalous every response is compared to the other responses
+    of its host. The score adds the largest z-score of the length, words and
+    lines, and the surprise of its length bucket and of its status and
+    length bucket combination.
+    Parameters
+    ----------
+    metrics : ResponseMetrics
+        Metrics of the session
+    bucket : int
+        Width in bytes of the length buckets
+    Returns
+    -------
+    List
+        (score, position, reasons) tuples, one per document
+    """
+    scores = []
+    lengths = metrics.columns["length"]
+    for positions in _groups(metrics.host).values():
+        n = len(positions)
+        if n < 2:
+            continue
+        zscores = {m: _zscores([metrics.columns[m][p] for p in positions]) for m in METRICS}
+        buckets = [lengths[p] // bucket for p in positions]
+        combos = list(zip((metrics.status[p] for p in positions), buckets))
+        bucket_counts = _count(buckets)
+        combo_counts = _count(combos)
+        bucket_bits = _surprise(bucket_counts, buckets, n)
+        combo_bits = _surprise(combo_counts, combos, n)
+        rare = max(1, n * RARE_FRACTION)
+        for i, position in enumerate(positions):
+            metric = max(METRICS, key=lambda m: zscores[m][i])
+            z = zscores[metric][i]
+            reasons = []
+            if z >= Z_THRESHOLD:
+                reasons.append("{} z={:.1f}".format(metric, z))
+            if bucket_counts[buckets[i]] <= rare:
+                reasons.append("length {}-{} {}/{}".format(
+                    buckets[i] * bucket, (buckets[i] + 1) * bucket - 1, bucket_counts[buckets[i]], n))
+            elif combo_counts[combos[i]] <= rare:
+                # Usual length with an unusual status
+                reasons.append("status {} at this length {}/{}".format(combos[i][0], combo_counts[combos[i]], n))
+            scores.append((z + bucket_bits[i] + combo_bits[i], position, reasons))
+    return scores
+
+
+def top_anomalies(metrics, top=20, bucket=LENGTH_BUCKET):
+    """
+    The most anomalous documents of the session, highest score first
+    Returns
+    -------
+    List
+        Dicts with the _id, host, status, metrics, score and reasons
+    """
+    ranked = heapq.nlargest(top, score(metrics, bucket), key=lambda s: s[0])
+    anomalies = []
+    for value, position, reasons in ranked:
+        anomaly = {
+            "_id": metrics.ids[position],
+            "host": metrics.hosts[metrics.host[position]],
+            "status": metrics.status[position],
+            "score": round(value, 2),
+            "reasons": reasons}
+        for metric in METRICS:
+            anomaly[metric] = metrics.columns[metric][position]
+        anomalies.append(anomaly)
+    return anomalies
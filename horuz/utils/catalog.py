@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import re
+import time
+
+
+CATALOG_PATH = os.path.expanduser("~/.horuz/catalog")
+
+# Name and type of the opt-in subfield used for substring searches
+INFIX_SUBFIELD = "infix"
+INFIX_TYPE = "wildcard"
+# field:*value terms of a Lucene query, the leading wildcard scans every term
+LEADING_WILDCARD = re.compile(r'(?<![\w.\\])([\w.]+):(\*[^\s()"]*)')
+
+# Field types with doc values, they can be sorted, aggregated and
+# fetched with docvalue_fields.
+AGGREGATABLE_TYPES = (
+    "keyword", "constant_keyword", "long", "integer", "short", "byte",
+    "double", "float", "half_float", "scaled_float", "unsigned_long",
+    "date", "date_nanos", "boolean", "ip")
+
+
+def _catalog_path(project):
+    return os.path.join(CATALOG_PATH, "{}.json".format(project))
+
+
+def _mapping_hash(mapping):
+    return hashlib.sha1(json.dumps(mapping, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def walk_properties(properties, prefix=""):
+    """
+    Walk the mapping properties recursively.
+    Parameters
+    ----------
+    properties : Dict
+        The properties of an index mapping
+    prefix : String
+        Path of the parent object
+    Returns
+    -------
+    Dict
+        Field path -> {"type", "aggregatable", "docvalue"}. docvalue is the
+        aggregatable field that holds the values of the field, a text field
+        points to its keyword subfield.
+    """
+    fields = {}
+    for name, spec in sorted(properties.items()):
+        path = "{}{}".format(prefix, name)
+        if "properties" in spec:
+            fields.update(walk_properties(spec["properties"], "{}.".format(path)))
+            continue
+        field_type = spec.get("type", "object")
+        aggregatable = field_type in AGGREGATABLE_TYPES or bool(spec.get("fielddata"))
+        fields[path] = {
+            "type": field_type,
+            "aggregatable": aggregatable,
+            "docvalue": path if aggregatable else None}
+        for subname, subspec in sorted(spec.get("fields", {}).items()):
+            subpath = "{}.{}".format(path, subname)
+            sub_type = subspec.get("type", "object")
+            sub_aggregatable = sub_type in AGGREGATABLE_TYPES
+            fields[subpath] = {
+                "type": sub_type,
+                "aggregatable": sub_aggregatable,
+                "docvalue": subpath if sub_aggregatable else None}
+            if sub_aggregatable and not fields[path]["docvalue"]:
+                fields[path]["docvalue"] = subpath
+    return fields
+
+
+def catalog_from_mapping(mapping):
+    """
+    Build the field catalog of every index of a get_mapping response.
+    The infix subfields are only kept when every index has them, the
+    searches rewritten to them would miss the documents of the others.
+    """
+    fields = {}
+    infix = None
+    for index in sorted(mapping):
+        properties = mapping[index].get("mappings", {}).get("properties", {})
+        index_fields = walk_properties(properties)
+        fields.update(index_fields)
+        found = {path for path, field in index_fields.items() if field["type"] == INFIX_TYPE}
+        infix = found if infix is None else infix & found
+    for path, field in list(fields.items()):
+        if field["type"] == INFIX_TYPE and path not in infix:
+            del fields[path]
+    return fields
+
+
+def load_catalog(project):
+    """
+    Get the cached catalog of the project without asking ES.
+    Returns
+    -------
+    Dict
+        The catalog fields, empty if the project was never cached.
+    """
+    try:
+        with open(_catalog_path(project)) as f:
+            return json.load(f).get("fields", {})
+    except (FileNotFoundError, json.decoder.JSONDecodeError):
+        return {}
+
+
+def update_catalog(project, mapping):
+    """
+    Refresh the cached catalog, the file is only written when the mapping
+    changed since the last refresh.
+    Parameters
+    ----------
+    project : String
+        Project name
+    mapping : Dict
+        get_mapping response of the project
+    Returns
+    -------
+    Dict
+        The catalog fields
+    """
+    mapping_hash = _mapping_hash(mapping)
+    path = _catalog_path(project)
+    try:
+        with open(path) as f:
+            cached = json.load(f)
+        if cached.get("hash") == mapping_hash:
+            return cached["fields"]
+    except (FileNotFoundError, json.decoder.JSONDecodeError, KeyError):
+        pass
+    fields = catalog_from_mapping(mapping)
+    os.makedirs(CATALOG_PATH, exist_ok=True)
+    tmp_path = "{}.tmp".format(path)
+    with open(tmp_path, "w") as f:
+        json.dump({"hash": mapping_hash, "updated": time.time(), "fields": fields}, f)
+    os.replace(tmp_path, path)
+    return fields
+
+
+def docvalue_field(catalog, field):
+    """
+    Get the aggregatable field to use for the given field, None if the
+    field has no doc values or it is unknown.
+    """
+    return catalog.get(field, {}).get("docvalue")
+
+
+def infix_term(term, catalog):
+    """
+    Send the leading wildcard terms of a Lucene query to the infix subfield
+    of their field, when the project has it.
+    Parameters
+    ----------
+    term : String
+        Lucene query
+    catalog : Dict
+        Field catalog of the project
+    Returns
+    -------
+    String
+        The query with field:*value replaced by field.infix:*value
+    """
+    def route(match):
+        field, value = match.groups()
+        infix = "{}.{}".format(field, INFIX_SUBFIELD)
+        if catalog.get(infix, {}).get("type") == INFIX_TYPE:
+            return "{}:{}".format(infix, value)
+        return match.group(0)
+
+    return LEADING_WILDCARD.sub(route, term)
+
+
+def tag_query(tags, catalog):
+    """
+    Lucene query that matches the documents with all the tags of hz tag
+    Parameters
+    ----------
+    tags : Dict
+        Tag name -> value, None matches any value
+    catalog : Dict
+        Field catalog of the project
+    """
+    terms = []
+    for name, value in sorted(tags.items()):
+        field = "tags.{}".format(name)
+        if value is None:
+            terms.append("_exists_:{}".format(field))
+        else:
+            terms.append('{}:"{}"'.format(
+                docvalue_field(catalog, field) or "{}.keyword".format(field),
+                value.replace("\\", "\\\\").replace('"', '\\"')))
+    return " AND ".join(terms)
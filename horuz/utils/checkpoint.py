@@ -0,0 +1,149 @@
+import json
+import os
+import time
+
+
+CHECKPOINT_PATH = os.path.expanduser("~/.horuz/checkpoints.json")
+WATCH_PATH = os.path.expanduser("~/.horuz/watch.json")
+
+
+def _load_store(path=CHECKPOINT_PATH):
+    """
+    Load a JSON state file from ~/.horuz/, empty if it does not exist.
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.decoder.JSONDecodeError):
+        return {}
+
+
+def _save_store(store, path=CHECKPOINT_PATH):
+    """
+    Write a JSON state file atomically, so an interrupted write
+    never leaves a truncated checkpoint behind.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = "{}.tmp".format(path)
+    with open(tmp_path, "w") as f:
+        json.dump(store, f)
+    os.replace(tmp_path, path)
+
+
+def _key(filepath, session):
+    return "{}:{}".format(session, os.path.abspath(filepath))
+
+
+def _file_signature(filepath):
+    stat = os.stat(filepath)
+    return {"size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+
+def load_checkpoint(filepath, session):
+    """
+    Get the committed offset of a file for the given session.
+    Parameters
+    ----------
+    filepath : String
+        Input file path
+    session : String
+        Session name
+    Returns
+    -------
+    int
+        Number of records already acknowledged by ES, 0 if the file
+        has no checkpoint or it changed since the checkpoint was taken.
+    """
+    entry = _load_store().get(_key(filepath, session))
+    if not entry:
+        return 0
+    try:
+        signature = _file_signature(filepath)
+    except OSError:
+        return 0
+    if entry.get("size") != signature["size"] or entry.get("mtime") != signature["mtime"]:
+        return 0
+    return entry.get("offset", 0)
+
+
+def save_checkpoint(filepath, session, offset):
+    """
+    Record the offset of the last acknowledged batch.
+    Parameters
+    ----------
+    filepath : String
+        Input file path
+    session : String
+        Session name
+    offset : int
+        Number of records acknowledged by ES
+    """
+    store = _load_store()
+    entry = {
+        "file": os.path.abspath(filepath),
+        "session": session,
+        "offset": offset,
+        "updated": time.time()}
+    entry.update(_file_signature(filepath))
+    store[_key(filepath, session)] = entry
+    _save_store(store)
+
+
+def clear_checkpoint(filepath, session):
+    """
+    Remove the checkpoint once the file is fully uploaded.
+    """
+    store = _load_store()
+    if store.pop(_key(filepath, session), None) is not None:
+        _save_store(store)
+
+
+def find_checkpoint_session(filepath):
+    """
+    Get the session of the most recent checkpoint of a file.
+    Used by --resume when no session was given.
+    """
+    filepath = os.path.abspath(filepath)
+    entries = [e for e in _load_store().values() if e.get("file") == filepath]
+    if not entries:
+        return None
+    return max(entries, key=lambda e: e.get("updated", 0))["session"]
+
+
+def is_ingested(filepath):
+    """
+    Check if the watch mode already ingested this version of the file.
+    Returns
+    -------
+    String
+        None if the file is new or it changed, otherwise its session
+    """
+    entry = _load_store(WATCH_PATH).get(os.path.abspath(filepath))
+    if not entry:
+        return None
+    try:
+        signature = _file_signature(filepath)
+    except OSError:
+        return None
+    if entry.get("size") == signature["size"] and entry.get("mtime") == signature["mtime"]:
+        return entry["session"]
+    return None
+
+
+def ingested_session(filepath):
+    """
+    Get the session a file was ingested with, even if it changed since
+    """
+    entry = _load_store(WATCH_PATH).get(os.path.abspath(filepath))
+    return entry["session"] if entry else None
+
+
+def mark_ingested(filepath, session):
+    """
+    Record that the watch mode ingested this version of the file
+    """
+    store = _load_store(WATCH_PATH)
+    entry = {"session": session, "updated": time.time()}
+    entry.update(_file_signature(filepath))
+    store[os.path.abspath(filepath)] = entry
+    _save_store(store, WATCH_PATH)
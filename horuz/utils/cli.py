@@ -1,8 +1,13 @@
 import os
+import re
 import subprocess
 import sys
 import time
 
+import click
+from rich.progress import Progress
+
+from horuz.utils.catalog import load_catalog
 from horuz.utils.style import rconsole
 
 
@@ -60,3 +65,125 @@ def get_sessions(ctx, args, incomplete):
         return []
 
     return [k.strip() for k in lines if k and incomplete in k]
+
+
+def get_project_arg(args):
+    """
+    Get the project name from the words already typed in the command line
+    """
+    for idx, arg in enumerate(args):
+        if arg in ("-p", "--project") and idx + 1 < len(args):
+            return args[idx + 1]
+        if arg.startswith("--project="):
+            return arg.split("=", 1)[1]
+    return None
+
+
+def get_fields(ctx, args, incomplete):
+    """
+    Used to autocomplete the comma separated field names of -f
+    from the cached field catalog
+    """
+    project = get_project_arg(args)
+    if not project:
+        return []
+    head, _, last = incomplete.rpartition(",")
+    head = "{},".format(head) if head else ""
+    return ["{}{}".format(head, f) for f in load_catalog(project) if f.startswith(last)]
+
+
+def get_query_fields(ctx, args, incomplete):
+    """
+    Used to autocomplete the field names of the -q Lucene query
+    from the cached field catalog
+    """
+    project = get_project_arg(args)
+    if not project:
+        return []
+    match = re.match(r"^(.*[\s(+-]|)([\w.]*)$", incomplete)
+    if not match:
+        return []
+    head, last = match.groups()
+    return ["{}{}:".format(head, f) for f in load_catalog(project) if f.startswith(last)]
+
+
+def parse_tags(ctx, param, values):
+    """
+    Click callback that turns the repeated key=value options in a dict.
+    A key without value is None.
+    """
+    tags = {}
+    for value in values:
+        key, sep, tag = value.partition("=")
+        if not re.match(r"^\w+$", key):
+            raise click.BadParameter("{} is not a valid tag, use key=value".format(value))
+        tags[key] = tag if sep else None
+    return tags
+
+
+def parse_assignments(ctx, param, values):
+    """
+    Click callback that turns the repeated field=value options in a dict
+    """
+    assignments = {}
+    for value in values:
+        field, sep, new = value.partition("=")
+        if not sep or not re.match(r"^\w+(\.\w+)*$", field):
+            raise click.BadParameter("{} is not valid, use field=value".format(value))
+        assignments[field] = new
+    return assignments
+
+
+def task_progress(status):
+    """
+    Get the (done, total) documents of a by query or reindex task status
+    """
+    done = sum(status.get(k, 0) for k in ("created", "updated", "deleted", "noops", "version_conflicts"))
+    return done, status.get("total", 0)
+
+
+def follow_task(hes, task_id, description="Running task..."):
+    """
+    Show the progress of a server-side task until it finishes.
+    Ctrl-C asks to cancel the task, otherwise it keeps running in the server.
+    Returns
+    -------
+    Dict
+        The task response, None if it did not finish
+    """
+    try:
+        with Progress() as progress:
+            bar = progress.add_task(description, total=0)
+            while True:
+                task = hes.task(task_id)
+                if not task:
+                    return None
+                done, total = task_progress(task["task"].get("status", {}))
+                progress.update(bar, completed=done, total=total)
+                if task.get("completed"):
+                    return task.get("response", {})
+                time.sleep(1)
+    except KeyboardInterrupt:
+        if click.confirm("Cancel the task {}?".format(task_id), default=False):
+            if hes.cancel_task(task_id):
+                rconsole.print("Task {} cancelled.".format(task_id))
+        else:
+            rconsole.print("Task {} keeps running. Follow it with hz tasks status {}".format(task_id, task_id))
+    return None
+
+
+def run_task(ctx, hes, task_id, wait, description):
+    """
+    Follow the task or print its id when the user does not want to wait
+    """
+    if not task_id:
+        return None
+    if not wait:
+        ctx.log("Task started: {}".format(task_id))
+        ctx.log("Follow it with hz tasks status {}".format(task_id))
+        return None
+    response = follow_task(hes, task_id, description)
+    if response:
+        for failure in response.get("failures", []):
+            ctx.log("Failure: {}".format(failure))
+    return response
@@ -0,0 +1,57 @@
+import configparser
+import os
+
+
+CONFIG_PATH = os.path.expanduser("~/.horuz/horuz.cfg")
+DEFAULT_ADDRESS = "http://localhost:9200"
+SECTION = "elasticsearch"
+
+
+def read_config(filename=CONFIG_PATH):
+    """
+    Read the connection configuration.
+    The file is an INI file with an [elasticsearch] section, old
+    configurations with only the address are still supported.
+    Returns
+    -------
+    Dict
+        hosts, sniff, maxsize, timeout and compress
+    """
+    options = {"hosts": [DEFAULT_ADDRESS]}
+    if not os.path.exists(filename):
+        return options
+    with open(filename) as cfg:
+        content = cfg.read().strip()
+    if not content.startswith("["):
+        options["hosts"] = [content] if content else options["hosts"]
+        return options
+    parser = configparser.ConfigParser()
+    parser.read_string(content)
+    if not parser.has_section(SECTION):
+        return options
+    section = parser[SECTION]
+    hosts = [h.strip() for h in section.get("hosts", "").split(",") if h.strip()]
+    options["hosts"] = hosts or options["hosts"]
+    if "sniff" in section:
+        options["sniff"] = section.getboolean("sniff")
+    if "maxsize" in section:
+        options["maxsize"] = section.getint("maxsize")
+    if "timeout" in section:
+        options["timeout"] = section.getfloat("timeout")
+    if "compress" in section:
+        options["compress"] = section.getboolean("compress")
+    return options
+
+
+def write_config(options, filename=CONFIG_PATH):
+    """
+    Save the connection configuration
+    """
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    parser = configparser.ConfigParser()
+    parser[SECTION] = {"hosts": ", ".join(options["hosts"])}
+    for key in ("sniff", "maxsize", "timeout", "compress"):
+        if options.get(key) is not None:
+            parser[SECTION][key] = str(options[key]).lower()
+    with open(filename, "w") as cfg:
+        parser.write(cfg)
@@ -0,0 +1,194 @@
+import hashlib
+import html
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+
+
+# Response headers saved in enrich.headers, the names use _ instead of -
+NOTABLE_HEADERS = (
+    "server", "content-type", "x-powered-by", "x-generator", "x-aspnet-version",
+    "location", "via", "www-authenticate", "access-control-allow-origin")
+# Name -> patterns searched in the headers or in the body
+TECHNOLOGIES = {
+    "Amazon S3": [("headers", r"^server: amazons3")],
+    "Angular": [("body", r"ng-version=")],
+    "Apache": [("headers", r"^server: apache")],
+    "ASP.NET": [("headers", r"^x-aspnet-version:|^x-powered-by: asp\.net|asp\.net_sessionid")],
+    "Cloudflare": [("headers", r"^server: cloudflare|^cf-ray:")],
+    "Drupal": [("headers", r"^x-generator: drupal"), ("body", r"Drupal\.settings|/sites/default/files/")],
+    "Express": [("headers", r"^x-powered-by: express")],
+    "GitLab": [("body", r"<meta content=\"GitLab\"|gon\.gitlab_url")],
+    "Grafana": [("body", r"grafana-app|window\.grafanaBootData")],
+    "IIS": [("headers", r"^server: microsoft-iis")],
+    "Jenkins": [("headers", r"^x-jenkins:")],
+    "Joomla": [("body", r"/media/jui/|content=\"Joomla!")],
+    "jQuery": [("body", r"jquery[.-]?[\d.]*(\.min)?\.js")],
+    "Kibana": [("headers", r"^kbn-name:")],
+    "Next.js": [("headers", r"^x-powered-by: next\.js"), ("body", r"__NEXT_DATA__")],
+    "nginx": [("headers", r"^server: nginx")],
+    "PHP": [("headers", r"^x-powered-by: php|phpsessid")],
+    "React": [("body", r"data-reactroot|react-dom(\.production)?(\.min)?\.js")],
+    "Spring": [("body", r"Whitelabel Error Page")],
+    "Tomcat": [("body", r"Apache Tomcat/")],
+    "WordPress": [("body", r"/wp-content/|/wp-includes/")],
+}
+SIGNATURES = [
+    (name, where, re.compile(pattern, re.IGNORECASE | re.MULTILINE))
+    for name, patterns in TECHNOLOGIES.items() for where, pattern in patterns]
+DEFAULT_PORTS = {"http": 80, "https": 443}
+STATUS_LINE = re.compile(r"^HTTP/\d(?:\.\d)? (\d{3})[^\r\n]*\r?\n", re.MULTILINE)
+TITLE = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+
+
+def _keyword():
+    return {"type": "keyword", "ignore_above": 1024}
+
+
+# Explicit mapping, the enrichment fields are searched with exact terms
+ENRICH_PROPERTIES = {
+    "enrich": {
+        "properties": {
+            "title": _keyword(),
+            "content_hash": {"type": "keyword"},
+            "scheme": {"type": "keyword"},
+            "host": {"type": "keyword"},
+            "port": {"type": "integer"},
+            "path": _keyword(),
+            "status_class": {"type": "keyword"},
+            "technologies": {"type": "keyword"},
+            "headers": {
+                "properties": {h.replace("-", "_"): _keyword() for h in NOTABLE_HEADERS}
+            }
+        }
+    }
+}
+
+
+def split_response(raw):
+    """
+    Split a raw HTTP response, like the ffuf output files, in status,
+    headers and body. The text without status line is all body.
+    Returns
+    -------
+    Tuple
+        (status, headers, body), headers are the raw header lines
+    """
+    matches = list(STATUS_LINE.finditer(raw))
+    if not matches:
+        return None, "", raw
+    # The ffuf files have the request before the response
+    status_line = matches[-1]
+    # The newline in front finds the end of the headers when there are none
+    headers, body = (re.split(r"\r?\n\r?\n", "\n" + raw[status_line.end():], maxsplit=1) + [""])[:2]
+    return int(status_line.group(1)), headers, body
+
+
+def parse_url(url):
+    """
+    Normalized scheme, host, port and path of an URL or host name, empty
+    when the URL is malformed
+    """
+    if "://" not in url:
+        url = "//{}".format(url)
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        # e.g. an unclosed IPv6 bracket
+        return {}
+    scheme = parts.scheme.lower() or None
+    try:
+        port = parts.port or DEFAULT_PORTS.get(scheme)
+    except ValueError:
+        port = None
+    return {
+        "scheme": scheme,
+        "host": (parts.hostname or "").lower() or None,
+        "port": port,
+        "path": parts.path or "/"}
+
+
+def _response_fields(record):
+    """
+    URL, status and raw response of a ffuf or general record
+    """
+    result = record.get("result")
+    if record.get("type") == "ffuf" and isinstance(result, dict):
+        return result.get("url") or record.get("host"), result.get("status"), result.get("html") or ""
+    url = record.get("url") or record.get("host")
+    status = record.get("status") or record.get("status_code")
+    raw = record.get("html") or record.get("body") or record.get("response") or ""
+    return url, status, raw
+
+
+def enrich_record(record):
+    """
+    Extract the structured fields of a record.
+    Parameters
+    ----------
+    record : Dict
+        ffuf or general record
+    Returns
+    -------
+    Dict
+        Fields saved in the enrich field of the record
+    """
+    url, status, raw = _response_fields(record)
+    fields = {}
+    if isinstance(url, str) and url:
+        fields.update(parse_url(url))
+    raw = raw if isinstance(raw, str) else ""
+    raw_status, headers, body = split_response(raw)
+    status = status or raw_status
+    if str(status).isdigit():
+        fields["status_class"] = "{}xx".format(str(status)[0])
+    if body:
+        fields["content_hash"] = hashlib.sha1(body.encode("utf-8", "ignore")).hexdigest()
+        title = TITLE.search(body)
+        if title:
+            fields["title"] = " ".join(html.unescape(title.group(1)).split())[:1024]
+    found = {}
+    for line in headers.splitlines():
+        name, _, value = line.partition(":")
+        name = name.strip().lower()
+        if name in NOTABLE_HEADERS:
+            found[name.replace("-", "_")] = value.strip()
+    if found:
+        fields["headers"] = found
+    technologies = sorted({
+        name for name, where, pattern in SIGNATURES
+        if pattern.search(headers if where == "headers" else body)})
+    if technologies:
+        fields["technologies"] = technologies
+    return fields
+
+
+class Enricher:
+    """
+    Pool of processes that extract the enrich fields of the records
+    """
+
+    def __init__(self, workers=0):
+        """
+        Parameters
+        ----------
+        workers : int
+            Number of processes, 0 uses one per CPU
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+
+    def enrich(self, records):
+        """
+        Add the enrich field to the records
+        """
+        if not records:
+            return
+        chunksize = max(1, len(records) // (self.workers * 4))
+        for record, fields in zip(records, self.pool.map(enrich_record, records, chunksize=chunksize)):
+            if fields:
+                record["enrich"] = fields
+
+    def shutdown(self):
+        self.pool.shutdown()
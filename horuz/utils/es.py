@@ -1,47 +1,229 @@
 from collections import abc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import datetime
+import glob
+import gzip
+import hashlib
 import json
+import os
+import queue
+import threading
+import time
+import uuid
 
 import click
-from elasticsearch import Elasticsearch, RequestsHttpConnection
-from elasticsearch.exceptions import RequestError, ConnectionError, ConnectionTimeout
-from rich.progress import track
+from elasticsearch import Elasticsearch, RequestsHttpConnection, Urllib3HttpConnection
+from elasticsearch.exceptions import RequestError, ConnectionError, ConnectionTimeout, NotFoundError
+from rich.progress import Progress
 
-from horuz.utils.generators import get_random_name, get_duplications
+from horuz.utils.anomalies import METRICS, ResponseMetrics
+from horuz.utils.catalog import (
+    INFIX_SUBFIELD, INFIX_TYPE, docvalue_field, infix_term, load_catalog, update_catalog)
+from horuz.utils.checkpoint import load_checkpoint, save_checkpoint, clear_checkpoint
+from horuz.utils.enrich import ENRICH_PROPERTIES, Enricher
+from horuz.utils.formatting import get_path
+from horuz.utils.generators import get_random_name, get_duplications, get_near_duplications
+from horuz.utils.partitions import (
+    WRITE_SUFFIX, document_time, partition_end, partition_name, write_alias)
+from horuz.utils.serializer import ClientSerializer, bulk_upsert_body, dumps, loads
+from horuz.utils.sqlite import SQLiteAPI
+from horuz.utils.storage import StorageAPI
+from horuz.utils.transport import BulkTransport
 
 
-class ElasticSearchAPI:
+# Heavy fields that are not returned unless they are explicitly asked
+DEFAULT_EXCLUDES = ["result.html", "html"]
+
+def _body_properties(fields):
+    """
+    Mapping of the heavy fields with the infix subfield, the rest of the
+    mapping is the same as the dynamic one.
+    """
+    properties = {}
+    for field in fields:
+        *parents, name = field.split(".")
+        target = properties
+        for parent in parents:
+            target = target.setdefault(parent, {"properties": {}})["properties"]
+        target[name] = {
+            "type": "text",
+            "fields": {
+                "keyword": {"type": "keyword", "ignore_above": 256},
+                INFIX_SUBFIELD: {"type": INFIX_TYPE}
+            }
+        }
+    return properties
+
+
+# Opt-in mapping for fast substring searches over the response bodies
+BODY_INDEX_PROPERTIES = _body_properties(DEFAULT_EXCLUDES)
+# Indexes kept for each project, e.g. .horuz-hosts-example.com. Projects
+# are never dot indexes, the names can not collide with a project
+COMPANION_PREFIX = ".horuz-"
+# Saved queries and their matches, and the hosts inventory
+COMPANION_KINDS = ("watches", "alerts", "hosts")
+# Fields of the saved queries, the rest is the mapping of the project
+PERCOLATOR_PROPERTIES = {
+    "query": {"type": "percolator"},
+    "name": {"type": "keyword"},
+    "term": {"type": "keyword", "ignore_above": 8191},
+    "created": {"type": "date"}
+}
+ALERTS_PROPERTIES = {
+    "watch": {"type": "keyword"},
+    "term": {"type": "keyword", "ignore_above": 8191},
+    "doc_id": {"type": "keyword"},
+    "session": {"type": "keyword"},
+    "host": {"type": "keyword"},
+    "type": {"type": "keyword"},
+    "time": {"type": "date"}
+}
+HOSTS_PROPERTIES = {
+    "host": {"type": "keyword", "ignore_above": 8191},
+    "first_seen": {"type": "date"},
+    "last_seen": {"type": "date"},
+    "sessions": {"type": "keyword"},
+    "statuses": {"type": "integer"},
+    "hits": {"type": "long"},
+    "updated": {"type": "date"}
+}
+# Painless script of the hosts inventory, the params are the summary of
+# the host in a batch. Only the new documents are counted in the hits, the
+# documents saved again replace the old ones.
+HOSTS_SCRIPT = """
+if (ctx.op == 'create') {
+    ctx._source.host = params.host;
+    ctx._source.first_seen = params.time;
+    ctx._source.sessions = new ArrayList();
+    ctx._source.statuses = new ArrayList();
+    ctx._source.hits = 0;
+}
+ctx._source.last_seen = params.time;
+ctx._source.updated = params.time;
+for (session in params.sessions) {
+    if (!ctx._source.sessions.contains(session)) { ctx._source.sessions.add(session); }
+}
+for (status in params.statuses) {
+    if (!ctx._source.statuses.contains(status)) { ctx._source.statuses.add(status); }
+}
+ctx._source.hits += params.hits;
+"""
+# Hosts of each request of an inventory rebuild, sessions and statuses per host
+HOSTS_PAGE = 500
+HOSTS_TERMS = 100
+# Seconds the saved queries are cached by the collects
+WATCHES_TTL = 30
+# Painless script of hz tag, documents without changes are not written
+TAG_SCRIPT = """
+if (ctx._source.tags == null) { ctx._source.tags = new HashMap(); }
+boolean changed = false;
+for (entry in params.set.entrySet()) {
+    if (ctx._source.tags[entry.getKey()] != entry.getValue()) {
+        ctx._source.tags[entry.getKey()] = entry.getValue();
+        changed = true;
+    }
+}
+for (key in params.unset) {
+    if (ctx._source.tags.containsKey(key)) {
+        ctx._source.tags.remove(key);
+        changed = true;
+    }
+}
+if (!changed) { ctx.op = 'noop'; }
+"""
+# Painless script of the session moves, copies and merges. The rewrite
+# keys are field paths, the id prefix keeps copies in the same project apart
+REWRITE_SCRIPT = """
+for (entry in params.rewrite.entrySet()) {
+    def target = ctx._source;
+    String[] path = entry.getKey().splitOnToken('.');
+    for (int i = 0; i < path.length - 1; i++) {
+        if (target[path[i]] == null) { target[path[i]] = new HashMap(); }
+        target = target[path[i]];
+    }
+    target[path[path.length - 1]] = entry.getValue();
+}
+if (params.id_prefix != null) { ctx._id = params.id_prefix + ':' + ctx._id; }
+"""
+# Number of documents asked in each multi get request
+MGET_SIZE = 500
+# Addresses with this scheme use the embedded SQLite storage
+SQLITE_SCHEME = "sqlite://"
+# Page size and keep alive of the point in time reads
+SCAN_SIZE = 1000
+PIT_KEEP_ALIVE = "5m"
+# Values and concurrent requests of each lookup, ids returned per value
+LOOKUP_CHUNK = 1000
+LOOKUP_WORKERS = 4
+LOOKUP_IDS = 10
+LOOKUP_SESSIONS = 10
+# Default search.max_buckets, each value of a lookup chunk is a bucket
+# with its session buckets
+MAX_BUCKETS = 65535
+LOOKUP_MAX_CHUNK = MAX_BUCKETS // (LOOKUP_SESSIONS + 1)
+# Phrase matches of a value too long for the keyword field compared with it
+LOOKUP_LONG_HITS = 100
+# Keys compared in each request of a session diff
+DIFF_PAGE_SIZE = 1000
+# Documents copied and deleted together by sessions mv
+MOVE_CHUNK = 5000
+
+
+class ElasticSearchAPI(StorageAPI):
     """
     Interaction with our Elasticsearch server
     """
 
+    name = "elasticsearch"
+    features = frozenset({"Watches", "Hosts inventory"})
+    keyword_limit = 256
+
     def __init__(self, address, ctx):
         """
         Interact with ES.
         Parameters
         ----------
         address : string
-            ElasticSearch Address
+            ElasticSearch Address, used when ctx.config has no hosts
         ctx : Environment Class
             cli env class
         """
+        self.ctx = ctx
+        self.transport = None
+        options = ctx.config.get("elasticsearch", {})
+        connection = {"connection_class": RequestsHttpConnection}
+        if options.get("maxsize"):
+            # Only the urllib3 connection has a configurable pool
+            connection = {"connection_class": Urllib3HttpConnection, "maxsize": options["maxsize"]}
+        if options.get("timeout"):
+            connection["timeout"] = options["timeout"]
+        if options.get("sniff"):
+            connection.update({
+                "sniff_on_start": True,
+                "sniff_on_connection_fail": True,
+                "sniffer_timeout": 60})
+        if options.get("compress"):
+            connection["http_compress"] = True
         try:
             self.es = Elasticsearch(
-                address, connection_class=RequestsHttpConnection)
+                options.get("hosts") or address, serializer=ClientSerializer(), **connection)
+            self.transport = BulkTransport(self.es, ctx, **ctx.config.get("ingest", {}))
         except (ConnectionError, ConnectionTimeout):
             self.ctx.log("Error init connection ES")
         except Exception as e:
             self.ctx.log("Error init ES {}".format(e))
             self.es = None
-        self.ctx = ctx
 
-    def create_index(self, name):
+    def create_index(self, name, mappings=None):
         """
         Create the index in our ES Server.
         Parameters
         ----------
         name : String
             Index Name
+        mappings : Dict
+            Explicit mappings of the index, dynamic if None
         Returns
         -------
         boolean
@@ -50,7 +232,8 @@ class ElasticSearchAPI:
         created = False
         try:
             if not self.es.indices.exists(name):
-                self.es.indices.create(index=name, ignore=400)
+                body = {"mappings": mappings} if mappings else None
+                self.es.indices.create(index=name, body=body, ignore=400)
             created = True
         except (ConnectionError, ConnectionTimeout):
             self.ctx.log("Create index connection error")
@@ -59,6 +242,42 @@ class ElasticSearchAPI:
         finally:
             return created
 
+    def refresh(self, index):
+        """
+        Make the last changes of the index searchable. The errors are
+        raised, the callers can not go on with stale data.
+        Parameters
+        ----------
+        index : String
+            Index Name
+        """
+        self.es.indices.refresh(index=index)
+
+    def put_mapping(self, index, properties):
+        """
+        Add fields to the mapping of an index, created if it does not exist.
+        Parameters
+        ----------
+        index : String
+            Index or alias name
+        properties : Dict
+            Mapping of the new fields
+        Returns
+        -------
+        boolean
+            updated or not
+        """
+        updated = False
+        try:
+            if not self.es.indices.exists(index):
+                return self.create_index(index, {"properties": properties})
+            self.es.indices.put_mapping(index=index, body={"properties": properties})
+            updated = True
+        except Exception as e:
+            self.ctx.log("Put mapping error {}".format(e))
+        finally:
+            return updated
+
     def delete_index(self, index):
         """
         Delete the index
@@ -98,7 +317,9 @@ class ElasticSearchAPI:
         self.create_index(index)
         saved = False
         try:
-            saved = self.es.index(index=index, body=record)
+            # With the id chosen here a retried request replaces the
+            # document instead of saving it twice
+            saved = self.transport.call(self.es.index, index=index, id=uuid.uuid4().hex, body=record)
         except (ConnectionError, ConnectionTimeout):
             self.ctx.log("Save index connection error")
         except Exception as e:
@@ -106,6 +327,133 @@ class ElasticSearchAPI:
         finally:
             return saved
 
+    @property
+    def batch_size(self):
+        """
+        Records per bulk request, adapted to the cluster load.
+        """
+        return self.transport.batch_size
+
+    def save_bulk(self, index, actions, created=None):
+        """
+        Save many documents in a single bulk request, retrying the
+        documents rejected by an overloaded cluster.
+        Parameters
+        ----------
+        index : String
+            Index Name
+        actions : List
+            List of (id, record) tuples
+        created : List
+            The ids of the new documents are added to it
+        Returns
+        -------
+        boolean
+            True only if every document was acknowledged
+        """
+        self.create_index(index)
+        saved = False
+        try:
+            saved = self.transport.bulk(index, actions, created)
+        except (ConnectionError, ConnectionTimeout):
+            self.ctx.log("Save bulk connection error")
+        except Exception as e:
+            self.ctx.log("Save bulk error {}".format(e))
+        finally:
+            return saved
+
+    def delete_document(self, index, doc_id):
+        """
+        Delete a document by id
+        Returns
+        -------
+        boolean
+            True if the document existed
+        """
+        try:
+            self.transport.call(self.es.delete, index=index, id=doc_id, refresh=True)
+            return True
+        except NotFoundError:
+            return False
+
+    def search(self, index, body):
+        """
+        Search with the query DSL without creating the index
+        Returns
+        -------
+        Dict
+            The response, None if the index does not exist
+        """
+        try:
+            return self.es.search(index=index, body=body)
+        except NotFoundError:
+            return None
+
+    def msearch(self, index, bodies):
+        """
+        Send several searches in one request
+        Returns
+        -------
+        List
+            The response of each body, None for the failed searches
+        """
+        lines = []
+        for body in bodies:
+            lines.extend([{"index": index}, body])
+        response = self.transport.call(self.es.msearch, body=lines)
+        return [None if "error" in r else r for r in response["responses"]]
+
+    def create_percolator(self, index, properties, meta=None):
+        """
+        Create or update an index of saved queries. The properties are the
+        fields the queries can use, the query is saved in the query field.
+        meta is saved in the _meta of the new index.
+        """
+        properties = dict(properties, **PERCOLATOR_PROPERTIES)
+        if not self.es.indices.exists(index):
+            mappings = {"properties": properties}
+            if meta:
+                mappings["_meta"] = meta
+            return self.create_index(index, mappings)
+        return self.put_mapping(index, properties)
+
+    def percolate(self, index, documents, size=1000):
+        """
+        Get the saved queries of the index matched by the documents.
+        Returns
+        -------
+        List
+            Hits of the matched queries, _percolator_document_slot in the
+            fields has the positions of the documents that match each query
+        """
+        response = self.search(index, {
+            "size": size,
+            "_source": ["name", "term"],
+            "query": {"percolate": {"field": "query", "documents": documents}}})
+        return response["hits"]["hits"] if response else []
+
+    def upsert_bulk(self, index, updates):
+        """
+        Update or create documents with scripts in a single bulk request
+        Parameters
+        ----------
+        index : String
+            Index Name
+        updates : List
+            List of (id, script) tuples
+        Returns
+        -------
+        boolean
+            True only if every document was updated
+        """
+        response = self.transport.call(self.es.bulk, body=bulk_upsert_body(index, updates))
+        if not response.get("errors"):
+            return True
+        for item in response["items"]:
+            if "error" in item["update"]:
+                self.ctx.log("Document {} was not updated: {}".format(item["update"]["_id"], item["update"]["error"]))
+        return False
+
     def get_all_indexes(self):
         """
         Get all Indexes in ElasticSeach
@@ -128,7 +476,8 @@ class ElasticSearchAPI:
         except Exception as e:
             self.ctx.vlog("Mapping error {}".format(e))
 
-    def query(self, index, term, size=100, order="time:desc", raw=False, fields=[]):
+    def query(self, index, term, size=100, order="time:desc", raw=False, fields=[],
+              excludes=[], docvalue_fields=[], profile=False):
         """
         Search in Elasticsearch server
         Parameters
@@ -142,22 +491,41 @@ class ElasticSearchAPI:
         order : String
             Sort by
         fields : List
-            A list of fields of the source
+            A list of fields of the source, False to skip the source
+        excludes : List
+            Fields of the source that are not returned when no fields are given
+        docvalue_fields : List
+            Fields returned from the doc values instead of the source
+        profile : boolean
+            Add the profile API breakdown to the response
         """
         self.create_index(index)
         if raw is False:
             self.ctx.vlog("ElasticSeach Lucene: {}".format(term))
             if term:
+                search_args = {}
+                if fields is False:
+                    search_args["_source"] = False
+                elif fields:
+                    search_args["_source_includes"] = fields
+                elif excludes:
+                    search_args["_source_excludes"] = excludes
+                if docvalue_fields:
+                    search_args["docvalue_fields"] = docvalue_fields
+                if profile:
+                    search_args["body"] = {"profile": True}
                 try:
                     return self.es.search(
                         index=index,
                         q=term,
                         sort=[order],
                         size=size,
-                        _source=fields)
+                        **search_args)
                 except (RequestError, ConnectionError, ConnectionTimeout) as e:
                     self.ctx.vlog("Query Error {}".format(e))
         else:
+            if profile:
+                term = dict(loads(term) if isinstance(term, str) else term, profile=True)
             search_args = {"index": index, "body": term}
             self.ctx.vlog("ElasticSeach Query Raw: {}".format(search_args))
             try:
@@ -165,252 +533,1943 @@ class ElasticSearchAPI:
             except (RequestError, ConnectionError, ConnectionTimeout) as e:
                 self.ctx.vlog("Query Error {}".format(e))
 
-    def connected(self):
+    def delete_by_query(self, index, query, slices="auto", requests_per_second=None):
+        """
+        Start a delete by query task in the ES server.
+        Parameters
+        ----------
+        index : String
+            Index Name
+        query : Dict
+            ElasticSearch query DSL
+        slices : int or String
+            Number of parallel slices, auto is one per shard
+        requests_per_second : float
+            Throttle of the task, unlimited if None
+        Returns
+        -------
+        String
+            The task id
+        """
         try:
-            self.es.cluster.health()
-            return True
-        except Exception:
-            return False
+            response = self.es.delete_by_query(
+                index=index,
+                body={"query": query},
+                slices=slices,
+                conflicts="proceed",
+                requests_per_second=requests_per_second or -1,
+                wait_for_completion=False)
+            return response["task"]
+        except (RequestError, ConnectionError, ConnectionTimeout) as e:
+            self.ctx.log("Delete by query error {}".format(e))
 
+    def update_by_query(self, index, query, script, slices="auto", requests_per_second=None):
+        """
+        Start an update by query task in the ES server.
+        Parameters
+        ----------
+        index : String
+            Index Name
+        query : Dict
+            ElasticSearch query DSL
+        script : Dict
+            Painless script applied to each document, None reindexes the
+            documents in place with the current mapping
+        slices : int or String
+            Number of parallel slices, auto is one per shard
+        requests_per_second : float
+            Throttle of the task, unlimited if None
+        Returns
+        -------
+        String
+            The task id
+        """
+        body = {"query": query}
+        if script:
+            body["script"] = script
+        try:
+            response = self.es.update_by_query(
+                index=index,
+                body=body,
+                slices=slices,
+                conflicts="proceed",
+                requests_per_second=requests_per_second or -1,
+                wait_for_completion=False)
+            return response["task"]
+        except (RequestError, ConnectionError, ConnectionTimeout) as e:
+            self.ctx.log("Update by query error {}".format(e))
 
-class HoruzES:
-    """
-    Horuz ElasticSearch connection
-    """
-    def __init__(self, domain, ctx=None):
-        self.es = ElasticSearchAPI(ctx.config.get("elasticsearch_address"), ctx)
-        self.domain = domain
-        self.ctx = ctx
-
-    def save_ffuf_data(self, data, session, filter_dups=None, remove_filter_dups=None):
+    def reindex(self, source, dest, query, script=None, slices="auto", requests_per_second=None):
         """
-        Save ffuf data to ES
+        Start a reindex task in the ES server, the documents are copied
+        without leaving the cluster.
         Parameters
         ----------
-        data : Dict
-            Json data
-        session : String
-            Session name
-        filter_dups: String
-            field name which is going to be filtered
+        source : String
+            Source index
+        dest : String
+            Destination index or write alias
+        query : Dict
+            ElasticSearch query DSL of the copied documents
+        script : Dict
+            Painless script applied to each document, None reindexes the
+            documents in place with the current mapping
+        slices : int or String
+            Number of parallel slices, auto is one per shard
+        requests_per_second : float
+            Throttle of the task, unlimited if None
+        Returns
+        -------
+        String
+            The task id
         """
-        session = session if session else get_random_name()
-        config_url = data["config"]["url"].replace("FUZZ", "")
-        # If data is saved, we do not save it again
-        record_exists = self.es.query(
-            index=self.domain,
-            term='''
-                host: "*{}" AND time: {} AND type: ffuf
-            '''.format(
-                config_url.replace("/", '').replace("http:", ''),
-                data["time"]))
-        if record_exists and record_exists['hits']['hits']:
-            self.ctx.vlog("Record {} {} exists: ", config_url, data["time"], record_exists)
-            return
-        # Save the new data
-        all_es_data = []
-        es_data = {
-            "host": config_url,
-            "time": data.get("time"),
-            "type": "ffuf",
-            "session": session,
-            "cmd": data.get("commandline"),
-            "result": []
-        }
-        # Save the new data
-        len_results = len(data.get("results"))
-        if data.get("results"):
-            for result in track(data["results"], description="Collecting HTML for the session {}...".format(session)):
-                es_data["result"] = result
-                # Get request/response data
-                es_data["result"]["html"] = ""
-                if "outputdirectory" in data["config"] and data["config"]["outputdirectory"]:
-                    try:
-                        with open("{}/{}".format(data["config"]["outputdirectory"], result["resultfile"]), encoding="utf-8", errors="ignore") as f:
-                            es_data["result"]["html"] = f.read()
-                    except FileNotFoundError:
-                        self.ctx.vlog("Could not open file")
-                self.ctx.vlog(es_data)
-                if filter_dups:
-                    all_es_data.append(es_data["result"])
-                else:
-                    self.es.save_in_index(self.domain, es_data)
-            if filter_dups:
-                all_es_data = get_duplications(
-                    data=all_es_data,
-                    filter_dups=filter_dups,
-                    remove_filter_dups=remove_filter_dups)
-                for result in track(all_es_data, description="Collecting data for the session {}...".format(session)):
-                    data_dup = {
-                        "host": config_url,
-                        "time": data.get("time"),
-                        "session": session,
-                        "type": "ffuf",
-                        "cmd": data.get("commandline"),
-                        "result": []
-                    }
-                    for result in results:
-                        # Remove duplicates before to save in ES
-                        dups = {}
-                        if result.get("dups"):
-                            dups = result["dups"]
-                            del result["dups"]
-                            # Saving to ES
-                            data_dup["result"] = result
-                            object_es = self.es.save_in_index(self.domain, data_dup)
-                            data_dup["duplicate_reference_id"] = object_es["_id"]
-                            # Save the reference of the duplicates
-                            for dup in dups:
-                                data_dup["result"] = dup
-                                self.es.save_in_index(self.domain, data_dup)
-                            del data_dup["duplicate_reference_id"]
-                        else:
-                            # Saving to ES
-                            data_dup["result"] = result
-                            object_es = self.es.save_in_index(self.domain, data_dup)
-                        data_dup["result"] = []
+        body = {"source": {"index": source, "query": query}, "dest": {"index": dest}}
+        if script:
+            body["script"] = script
+        try:
+            response = self.es.reindex(
+                body=body,
+                slices=slices,
+                requests_per_second=requests_per_second or -1,
+                wait_for_completion=False)
+            return response["task"]
+        except (RequestError, ConnectionError, ConnectionTimeout) as e:
+            self.ctx.log("Reindex error {}".format(e))
 
-        else:
-            self.ctx.vlog(es_data)
-            self.es.save_in_index(self.domain, es_data)
-        self.ctx.log("Project name: [bold deep_pink2]{}[/bold deep_pink2]".format(self.domain))
-        self.ctx.log("Session name: [bold deep_pink2]{}[/bold deep_pink2]".format(session))
-        self.ctx.log("Results: {}".format(len_results))
-        return
+    def get_task(self, task_id):
+        """
+        Get the status of a task
+        """
+        return self.es.tasks.get(task_id=task_id)
 
-    def save_general_data(self, data, session, filter_dups=None, remove_filter_dups=None):
+    def cancel_task(self, task_id):
         """
-        Save General JSON data
+        Cancel a running task
+        """
+        return self.es.tasks.cancel(task_id=task_id)
+
+    def list_tasks(self, actions="*byquery,*reindex"):
+        """
+        List the running tasks of the given actions
+        """
+        response = self.es.tasks.list(actions=actions, detailed=True, group_by="parents")
+        return response.get("tasks", {})
+
+    def count(self, index, term):
+        """
+        Count the documents matching the query
         Parameters
         ----------
-        data : Dict
-            Json data
-        session : String
-            Session name
-        filter_dups: String
-            field name which is going to be filtered
+        index : String
+            Index Name
+        term : String
+            Lucene query
+        Returns
+        -------
+        int
         """
-        session = session if session else get_random_name()
-        # Filter the duplicate data that is in the JSON
-        if filter_dups:
-            data = get_duplications(
-                data=data,
-                filter_dups=filter_dups,
-                remove_filter_dups=remove_filter_dups)
-        for result in track(data, description="Uploading..."):
-            # Adding time and session
-            result.update({
-                "time": datetime.datetime.now(),
-                "session": session})
-            # Remove duplicates before to save in ES
-            dups = {}
-            if "dups" in result:
-                dups = result["dups"]
-                del result["dups"]
-            self.ctx.vlog(result)
-            object_es = self.es.save_in_index(self.domain, result)
-            # Save the reference of the duplicates
-            for dup in dups:
-                dup.update({
-                    "time": datetime.datetime.now(),
-                    "session": session,
-                    "{}_duplicate_reference_id".format(
-                        filter_dups.replace(".", "_")): object_es["_id"]})
-                self.es.save_in_index(self.domain, dup)
-        self.ctx.log("Project name: [bold deep_pink2]{}[/bold deep_pink2]".format(self.domain))
-        self.ctx.log("Session name: [bold deep_pink2]{}[/bold deep_pink2]".format(session))
-        self.ctx.log("Results: {}".format(len(data)))
+        try:
+            return self.es.count(index=index, q=term)["count"]
+        except (RequestError, ConnectionError, ConnectionTimeout) as e:
+            self.ctx.vlog("Count Error {}".format(e))
 
-    def save_json(self, files, session, filter_dups=None, remove_filter_dups=None):
+    def get_documents(self, index, ids, fields=[], multi_index=False):
         """
-        Save JSON Data to ES.
+        Get documents by id with multi get requests
         Parameters
         ----------
-        files : List
-            List of files
-        session : String
-            Session's name
-        filter_dups : String
-            Filter duplicates by X field
+        index : String
+            Index Name
+        ids : List
+            Documents ids
+        fields : List
+            A list of fields of the source, all the source if empty
+        multi_index : boolean
+            The index is an alias of many indexes, multi get can not be
+            used and the documents are searched by id
+        Returns
+        -------
+        List
+            The found documents
         """
-        if self.es.connected() is False:
-            self.ctx.log("ElasticSearch connection error")
-            return
-
-        for filepath in files:
-            with open(filepath, "r") as fp:
-                data = {}
-                try:
-                    data = json.load(fp)
-                except json.decoder.JSONDecodeError:
-                    self.ctx.vlog("Error decoding the JSON Data")
+        docs = []
+        for start in range(0, len(ids), MGET_SIZE):
+            chunk = ids[start:start + MGET_SIZE]
+            try:
+                if multi_index:
+                    response = self.es.search(
+                        index=index,
+                        body={"query": {"ids": {"values": chunk}}, "size": len(chunk)},
+                        _source_includes=fields or None)
+                    docs.extend(response["hits"]["hits"])
                     continue
-                # Put the data in ES
-                if "ffuf" in str(data):
-                    self.save_ffuf_data(
-                        data, session, filter_dups, remove_filter_dups)
-                else:
-                    self.save_general_data(
-                        data, session, filter_dups, remove_filter_dups)
-        return
+                response = self.es.mget(
+                    index=index,
+                    body={"ids": chunk},
+                    _source_includes=fields or None)
+            except (RequestError, ConnectionError, ConnectionTimeout) as e:
+                self.ctx.log("Get documents error {}".format(e))
+                break
+            docs.extend(d for d in response["docs"] if d.get("found"))
+        return docs
 
-    def query(self, term, size=100, order="time:desc", raw=False, fields=[]):
+    def open_pit(self, index, keep_alive=PIT_KEEP_ALIVE):
         """
-        Send Queries to ES
+        Open a point in time, a consistent view of the index for reads
+        """
+        return self.es.open_point_in_time(index=index, keep_alive=keep_alive)["id"]
+
+    def close_pit(self, pit_id):
+        """
+        Release the resources of a point in time
         """
-        q = None
-        self.ctx.vlog("Sending the query '{}' to ElasticSeach.".format(term))
         try:
-            q = self.es.query(self.domain, term, size, order, raw, fields)
+            self.es.close_point_in_time(body={"id": pit_id})
         except Exception as e:
-            self.ctx.log("Query connection failed: {}!".format(e))
-            self.ctx.vlog("{}!".format(e))
+            self.ctx.vlog("Close point in time error {}".format(e))
 
-        return q
+    def scan(self, pit_id, query=None, slice_id=None, slices=None, size=SCAN_SIZE,
+             source=True, docvalue_fields=None):
+        """
+        Read all the documents of a point in time, page by page.
+        Parameters
+        ----------
+        pit_id : String
+            Point in time id
+        query : Dict
+            ElasticSearch query DSL, all the documents if None
+        slice_id, slices : int
+            Only read one slice of the documents, for parallel reads
+        source : boolean or List
+            Source fields to return
+        docvalue_fields : List
+            Fields returned from the doc values
+        Yields
+        ------
+        Dict
+            The hits
+        """
+        body = {
+            "size": size,
+            "query": query or {"match_all": {}},
+            "pit": {"id": pit_id, "keep_alive": PIT_KEEP_ALIVE},
+            "sort": ["_shard_doc"],
+            "_source": source,
+            "track_total_hits": False
+        }
+        if slices and slices > 1:
+            body["slice"] = {"id": slice_id, "max": slices}
+        if docvalue_fields:
+            body["docvalue_fields"] = docvalue_fields
+        while True:
+            response = self.transport.call(self.es.search, body=body)
+            hits = response["hits"]["hits"]
+            if not hits:
+                return
+            yield from hits
+            body["pit"]["id"] = response.get("pit_id", body["pit"]["id"])
+            body["search_after"] = hits[-1]["sort"]
 
-    def delete(self):
+    def get_alias_indexes(self, alias):
         """
-        Delete and Index from ES
+        Get the indexes of an alias, empty if the alias does not exist
         """
-        d = None
         try:
-            d = self.es.delete_index(self.domain)
-        except Exception:
-            self.ctx.log("Query connection failed!")
-        return d
+            return sorted(self.es.indices.get_alias(name=alias).keys())
+        except NotFoundError:
+            return []
 
-    def indexes(self):
+    def get_index_meta(self, index):
         """
-        Get all Indexes from ES.
+        Get the _meta of the index mapping
         """
-        s = None
-        try:
-            s = sorted(self.es.get_all_indexes().keys())
-        except Exception:
-            self.ctx.log("Query connection failed!")
-        return s
+        mapping = self.es.indices.get_mapping(index=index)
+        return mapping[index]["mappings"].get("_meta", {})
 
-    def project_mapping(self):
+    def create_partition(self, index, project, period, properties=None):
         """
-        Get the mapping indexes
+        Create a partition index of a project. The partition is added
+        to the read alias of the project.
+        Parameters
+        ----------
+        index : String
+            Partition index name
+        project : String
+            Project name, used as read alias
+        period : String
+            day, week or month
+        properties : Dict
+            Explicit mappings of the partition, dynamic if None
         """
-        mapping = []
+        created = False
         try:
-            props = self.es.get_index_mapping(self.domain)
-            if props:
-                for p in props[self.domain]["mappings"]["properties"].keys():
-                    if "properties" in props[self.domain]["mappings"]["properties"][p].keys():
-                        for pin in props[self.domain]["mappings"]["properties"][p]["properties"].keys():
-                            if "properties" in props[self.domain]["mappings"]["properties"][p]["properties"][pin].keys():
-                                for pin2 in props[self.domain]["mappings"]["properties"][p]["properties"][pin]['properties'].keys():
-                                    mapping.append("{}.{}.{}".format(p, pin ,pin2))
-                            else:
-                                mapping.append("{}.{}".format(p, pin))
-                    else:
-                        mapping.append(p)
+            mappings = {"_meta": {"horuz": {"project": project, "partition": period}}}
+            if properties:
+                mappings["properties"] = properties
+            self.es.indices.create(
+                index=index,
+                body={
+                    "mappings": mappings,
+                    "aliases": {project: {}}
+                },
+                ignore=400)
+            created = True
+        except (ConnectionError, ConnectionTimeout):
+            self.ctx.log("Create partition connection error")
         except Exception as e:
-            self.ctx.log("Mapping connection failed! {}".format(e))
-        return mapping
+            self.ctx.log("Create partition error {}".format(e))
+        finally:
+            return created
+
+    def move_alias(self, alias, index):
+        """
+        Point the alias only to the given index, atomically
+        """
+        actions = [{"remove": {"index": i, "alias": alias}} for i in self.get_alias_indexes(alias) if i != index]
+        actions.append({"add": {"index": index, "alias": alias}})
+        self.es.indices.update_aliases(body={"actions": actions})
+
+    def connected(self):
+        try:
+            self.es.cluster.health()
+            return True
+        except Exception:
+            return False
+
+
+def companion_index(project, kind):
+    """
+    Name of an index kept for the project, kind is one of COMPANION_KINDS
+    """
+    return "{}{}-{}".format(COMPANION_PREFIX, kind, project)
+
+
+def companion_meta(project, kind):
+    """
+    _meta of a companion index, tags it with its project
+    """
+    return {"horuz": {"companion": kind, "project": project}}
+
+
+def companion_mappings(project, kind, properties):
+    return {"_meta": companion_meta(project, kind), "properties": properties}
+
+
+def merge_mappings(target, mappings):
+    """
+    Add the fields of a mapping to another one, the fields already in
+    the target keep their type.
+    """
+    for key, value in mappings.items():
+        if key in ("properties", "fields") and isinstance(target.get(key), dict):
+            for field, spec in value.items():
+                if field in target[key]:
+                    merge_mappings(target[key][field], spec)
+                else:
+                    target[key][field] = spec
+        else:
+            target.setdefault(key, value)
+    return target
+
+
+def storage_backend(address, ctx):
+    """
+    Get the storage of the configured address. sqlite:///path/to/file.db
+    uses the embedded SQLite storage, any other address is ElasticSearch.
+    """
+    if address.startswith(SQLITE_SCHEME):
+        return SQLiteAPI(address[len(SQLITE_SCHEME):], ctx)
+    return ElasticSearchAPI(address, ctx)
+
+
+class HoruzES:
+    """
+    Horuz ElasticSearch connection
+    """
+    def __init__(self, domain, ctx=None):
+        self.es = storage_backend(ctx.config.get("elasticsearch_address"), ctx)
+        self.domain = domain
+        self.ctx = ctx
+        self._layout = None
+        self._write_index = None
+        self._watches = None
+        self._watches_loaded = 0
+        # True once the hosts inventory index exists
+        self._hosts_ready = False
+        # Called with each alert of the saved queries
+        self.on_alert = None
+
+    def layout(self):
+        """
+        Get how the project is stored. Partitioned projects are a read alias
+        named after the project over one index per period.
+        Returns
+        -------
+        Dict
+            {"partition": day/week/month or None, "indexes": partition indexes}
+        """
+        if self._layout is None:
+            self._layout = {"partition": None, "indexes": []}
+            indexes = self.es.get_alias_indexes(self.domain)
+            if indexes:
+                meta = self.es.get_index_meta(indexes[-1]).get("horuz", {})
+                self._layout = {"partition": meta.get("partition"), "indexes": indexes}
+        return self._layout
+
+    def create_partitioned(self, period, properties=None):
+        """
+        Create a project backed by one index per period
+        Parameters
+        ----------
+        period : String
+            day, week or month
+        properties : Dict
+            Explicit mappings of the partitions
+        """
+        index = partition_name(self.domain, period)
+        if not self.es.create_partition(index, self.domain, period, properties):
+            return False
+        self.es.move_alias(write_alias(self.domain), index)
+        self._layout = None
+        return True
+
+    @property
+    def write_index(self):
+        """
+        Index or alias that receives the new documents. The partition of
+        the current period is created the first time it is needed.
+        """
+        if self._write_index:
+            return self._write_index
+        self._write_index = self.domain
+        period = self.layout()["partition"]
+        if period:
+            index = partition_name(self.domain, period)
+            alias = write_alias(self.domain)
+            if index not in self.layout()["indexes"]:
+                # New partitions keep the body index of the project
+                properties = BODY_INDEX_PROPERTIES if self.body_indexed() else None
+                self.es.create_partition(index, self.domain, period, properties)
+            if self.es.get_alias_indexes(alias) != [index]:
+                self.es.move_alias(alias, index)
+            self._write_index = alias
+        return self._write_index
+
+    def body_indexed(self):
+        """
+        Check if the heavy fields of the project have the infix subfield
+        """
+        return any(f["type"] == INFIX_TYPE for f in self.field_catalog().values())
+
+    def add_body_index(self, requests_per_second=None):
+        """
+        Add the infix subfield to every index of the project and index the
+        existing bodies in a server-side task. The leading wildcard
+        searches only match all the documents once the task is done.
+        Returns
+        -------
+        String
+            The task id, None if the mapping could not be updated
+        """
+        # The read alias of a partitioned project updates all its partitions
+        if not self.es.put_mapping(self.domain, BODY_INDEX_PROPERTIES):
+            return None
+        query = {"bool": {"should": [{"exists": {"field": field}} for field in DEFAULT_EXCLUDES]}}
+        return self.update_by_query(query, None, requests_per_second=requests_per_second)
+
+    def search_index(self, since=None):
+        """
+        Indexes to search. When the project is partitioned and the search
+        only covers the last `since` period, only the partitions of that
+        window are searched.
+        Parameters
+        ----------
+        since : timedelta
+        """
+        if not since:
+            return self.domain
+        layout = self.layout()
+        if not layout["partition"]:
+            return self.domain
+        start = datetime.datetime.now() - since
+        indexes = [
+            i for i in layout["indexes"]
+            if (partition_end(self.domain, layout["partition"], i) or start) > start]
+        return ",".join(indexes) or self.domain
+
+    def export_project(self, directory, slices=4):
+        """
+        Export the project to gzipped NDJSON files, one per slice, read
+        in parallel from a point in time.
+        Parameters
+        ----------
+        directory : String
+            Output directory
+        slices : int
+            Number of parallel readers and output files
+        Returns
+        -------
+        int
+            Number of exported documents
+        """
+        os.makedirs(directory, exist_ok=True)
+        layout = self.layout()
+        # The partitions can have different fields, the export has all of them
+        mappings = {}
+        for index in (self.es.get_index_mapping(self.domain) or {}).values():
+            merge_mappings(mappings, index["mappings"])
+        mappings.pop("_meta", None)
+        pit_id = self.es.open_pit(self.domain)
+
+        def export_slice(slice_id, progress, task):
+            path = os.path.join(directory, "{}-{:03d}.ndjson.gz".format(self.domain, slice_id))
+            exported = 0
+            with gzip.open(path, "wt", encoding="utf-8") as f:
+                for hit in self.es.scan(pit_id, slice_id=slice_id, slices=slices):
+                    f.write(dumps({"_id": hit["_id"], "_source": hit["_source"]}))
+                    f.write("\n")
+                    exported += 1
+                    if exported % SCAN_SIZE == 0:
+                        progress.advance(task, SCAN_SIZE)
+            progress.advance(task, exported % SCAN_SIZE)
+            return exported
+
+        try:
+            with Progress() as progress:
+                task = progress.add_task("Exporting {}...".format(self.domain), total=self.count("*") or 0)
+                with ThreadPoolExecutor(max_workers=slices) as executor:
+                    futures = [executor.submit(export_slice, i, progress, task) for i in range(slices)]
+                    exported = sum(f.result() for f in futures)
+        finally:
+            self.es.close_pit(pit_id)
+        # Written last, an export without it is incomplete
+        with open(os.path.join(directory, "{}.mapping.json".format(self.domain)), "w") as f:
+            json.dump({
+                "project": self.domain,
+                "partition": layout["partition"],
+                "count": exported,
+                "mappings": mappings}, f)
+        return exported
+
+    def _import_router(self, mappings):
+        """
+        Get the function that gives the index of each imported document.
+        The documents of a partitioned project go to the partition of their
+        time, created with the exported mappings when it does not exist.
+        """
+        period = self.layout()["partition"]
+        if not period:
+            self.es.create_index(self.domain, mappings)
+            index = self.write_index
+            return lambda source: index
+        current = self.write_index
+        partitions = set(self.layout()["indexes"])
+        lock = threading.Lock()
+
+        def route(source):
+            when = document_time(source.get("time"))
+            if when is None:
+                return current
+            index = partition_name(self.domain, period, when)
+            with lock:
+                if index not in partitions:
+                    self.es.create_partition(index, self.domain, period, mappings.get("properties"))
+                    partitions.add(index)
+            return index
+        return route
+
+    def import_project(self, directory, workers=4):
+        """
+        Load a project exported with export_project, keeping the _ids
+        and the mappings. The files are loaded in parallel.
+        Parameters
+        ----------
+        directory : String
+            Directory with the exported files
+        workers : int
+            Number of parallel loaders
+        Returns
+        -------
+        int
+            Number of imported documents
+        """
+        mapping_files = glob.glob(os.path.join(directory, "*.mapping.json"))
+        if len(mapping_files) != 1:
+            self.ctx.log("Expected one .mapping.json file in {}".format(directory))
+            return 0
+        with open(mapping_files[0]) as f:
+            exported = json.load(f)
+        files = sorted(glob.glob(os.path.join(directory, "{}-*.ndjson.gz".format(exported["project"]))))
+        route = self._import_router(exported["mappings"])
+        total = exported.get("count")
+        if total is None:
+            # Exports of older versions do not have the count
+            total = 0
+            for path in files:
+                with gzip.open(path, "rt", encoding="utf-8") as f:
+                    total += sum(1 for _ in f)
+
+        def save(index, actions, path, imported):
+            if not self.es.save_bulk(index, actions):
+                raise RuntimeError("Import of {} stopped at line {}".format(path, imported))
+
+        def import_file(path, progress, task):
+            imported = 0
+            batches = {}
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    doc = loads(line)
+                    index = route(doc["_source"])
+                    actions = batches.setdefault(index, [])
+                    actions.append((doc["_id"], doc["_source"]))
+                    if len(actions) >= self.es.batch_size:
+                        save(index, actions, path, imported)
+                        imported += len(actions)
+                        progress.advance(task, len(actions))
+                        del batches[index]
+            for index, actions in batches.items():
+                save(index, actions, path, imported)
+                imported += len(actions)
+                progress.advance(task, len(actions))
+            return imported
+
+        imported = 0
+        with Progress() as progress:
+            task = progress.add_task("Importing {}...".format(self.domain), total=total)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(import_file, path, progress, task) for path in files]
+                for future in futures:
+                    try:
+                        imported += future.result()
+                    except RuntimeError as e:
+                        self.ctx.log(str(e))
+        self._layout = None
+        return imported
+
+    def prune(self, older_than):
+        """
+        Delete the whole partitions older than the given time
+        Parameters
+        ----------
+        older_than : timedelta
+        Returns
+        -------
+        List
+            The deleted indexes
+        """
+        layout = self.layout()
+        if not layout["partition"]:
+            self.ctx.log("Project {} is not partitioned.".format(self.domain))
+            return []
+        limit = datetime.datetime.now() - older_than
+        current = partition_name(self.domain, layout["partition"])
+        old = [
+            i for i in layout["indexes"]
+            if i != current and (partition_end(self.domain, layout["partition"], i) or limit) < limit]
+        if old and self.es.delete_index(",".join(old)):
+            self._layout = None
+            return old
+        return []
+
+    def _doc_id(self, session, source, position, dup=None):
+        """
+        Build the document id. Ids of file uploads are derived from the
+        file position, so re-sending a batch after a failure overwrites
+        the documents instead of duplicating them.
+        """
+        if not source:
+            return uuid.uuid4().hex
+        key = "{}:{}:{}".format(session, os.path.abspath(source), position)
+        if dup is not None:
+            key = "{}:{}".format(key, dup)
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def _save_items(self, items, session, source=None, resume=False, prepare=None, description="Uploading...",
+                    enricher=None):
+        """
+        Upload the items to ES in batches, recording a checkpoint after
+        each acknowledged batch.
+        Parameters
+        ----------
+        items : List
+            List of (record, dups, reference_key) tuples
+        session : String
+            Session name
+        source : String
+            Input file path, used for the checkpoints
+        resume : boolean
+            Continue from the last acknowledged batch of the source
+        prepare : Function
+            Called with each record right before it is sent
+        enricher : Enricher
+            Extract the enrich fields of the records
+        Returns
+        -------
+        int
+            Number of items acknowledged by ES
+        """
+        offset = 0
+        if source and resume:
+            offset = load_checkpoint(source, session)
+            if offset:
+                self.ctx.log("Resuming {} from record {}".format(source, offset))
+        with Progress() as progress:
+            task = progress.add_task(description, total=len(items), completed=offset)
+            start = offset
+            while start < len(items):
+                batch = items[start:start + self.es.batch_size]
+                if not self._save_batch(batch, start, session, source, prepare, enricher):
+                    self.ctx.log("Upload stopped at record {}.".format(start))
+                    if source:
+                        self.ctx.log("Run the collect again with --resume -s {} to continue.".format(session))
+                    return start
+                start += len(batch)
+                if source:
+                    save_checkpoint(source, session, start)
+                progress.update(task, completed=start)
+        if source:
+            clear_checkpoint(source, session)
+        return len(items)
+
+    def _save_batch(self, batch, start, session, source=None, prepare=None, enricher=None):
+        """
+        Send a batch of items with their duplicates in one bulk request.
+        """
+        actions = []
+        for position, (record, dups, reference_key) in enumerate(batch, start):
+            record_id = self._doc_id(session, source, position)
+            if prepare:
+                prepare(record)
+            self.ctx.vlog(record)
+            actions.append((record_id, record))
+            # Save the reference of the duplicates
+            for n, dup in enumerate(dups):
+                if prepare:
+                    prepare(dup)
+                dup[reference_key] = record_id
+                actions.append((self._doc_id(session, source, position, n), dup))
+        return self.save_actions(actions, enricher)
+
+    def save_actions(self, actions, enricher=None):
+        """
+        Save documents of the project in a bulk request. They are enriched
+        before and matched with the saved queries after.
+        Parameters
+        ----------
+        actions : List
+            List of (id, record) tuples
+        enricher : Enricher
+            Pool of the enrichment block of the collect, None to not enrich
+        Returns
+        -------
+        boolean
+            True only if every document was acknowledged
+        """
+        if enricher:
+            enricher.enrich([record for _, record in actions])
+        created = []
+        saved = self.es.save_bulk(self.write_index, actions, created)
+        if saved:
+            self._percolate(actions)
+            self._update_hosts(actions, set(created))
+        return saved
+
+    @contextmanager
+    def enrichment(self, workers=None):
+        """
+        Pool of processes that extract the enrich fields of the records
+        saved inside the block. The pool is given to the saves, so the
+        collects sharing this object do not use each other's pool.
+        Parameters
+        ----------
+        workers : int
+            Number of processes, 0 uses one per CPU. None yields no pool
+        """
+        if workers is None:
+            yield None
+            return
+        self.es.put_mapping(self.write_index, ENRICH_PROPERTIES)
+        enricher = Enricher(workers)
+        try:
+            yield enricher
+        finally:
+            enricher.shutdown()
+
+    def save_ffuf_data(self, data, session, filter_dups=None, remove_filter_dups=None, source=None, resume=False,
+                       near_dups=None, enricher=None):
+        """
+        Save ffuf data to ES
+        Parameters
+        ----------
+        data : Dict
+            Json data
+        session : String
+            Session name
+        filter_dups: String
+            field name which is going to be filtered
+        source : String
+            Input file path, used for the checkpoints
+        resume : boolean
+            Continue from the last acknowledged batch of the source
+        near_dups : int
+            Keep one result per group of near duplicate responses, the
+            value is the maximum simhash distance of the group
+        enricher : Enricher
+            Extract the enrich fields of the results
+        """
+        session = session if session else get_random_name()
+        config_url = data["config"]["url"].replace("FUZZ", "")
+        output_directory = data["config"].get("outputdirectory")
+        resuming = bool(source and resume and load_checkpoint(source, session))
+        # If data is saved, we do not save it again
+        record_exists = None
+        if not resuming:
+            record_exists = self.es.query(
+                index=self.domain,
+                term='''
+                    host: "*{}" AND time: {} AND type: ffuf
+                '''.format(
+                    config_url.replace("/", '').replace("http:", ''),
+                    data["time"]))
+        if record_exists and record_exists['hits']['hits']:
+            self.ctx.vlog("Record {} {} exists: ", config_url, data["time"], record_exists)
+            return True
+
+        def ffuf_record(result):
+            return {
+                "host": config_url,
+                "time": data.get("time"),
+                "type": "ffuf",
+                "session": session,
+                "cmd": data.get("commandline"),
+                "result": result
+            }
+
+        def load_html(record):
+            # Get request/response data
+            result = record["result"]
+            result["html"] = ""
+            if output_directory:
+                try:
+                    with open("{}/{}".format(output_directory, result["resultfile"]), encoding="utf-8", errors="ignore") as f:
+                        result["html"] = f.read()
+                except FileNotFoundError:
+                    self.ctx.vlog("Could not open file")
+
+        # Save the new data
+        results = data.get("results") or []
+        len_results = len(results)
+        preload = bool(filter_dups or near_dups is not None)
+        if results:
+            if preload:
+                # The duplicates can be filtered by the html, load it first
+                for result in results:
+                    load_html({"result": result})
+            if near_dups is not None:
+                results = get_near_duplications(results, distance=near_dups)
+                self.ctx.log("Near duplicates: {} results grouped in {}".format(len_results, len(results)))
+            if filter_dups:
+                results = get_duplications(
+                    data=results,
+                    filter_dups=filter_dups,
+                    remove_filter_dups=remove_filter_dups)
+            items = []
+            for result in results:
+                # Remove duplicates before to save in ES
+                dups = result.pop("dups", [])
+                items.append((
+                    ffuf_record(result),
+                    [ffuf_record(dup) for dup in dups],
+                    "duplicate_reference_id"))
+            saved = self._save_items(
+                items, session, source, resume,
+                prepare=None if preload else load_html,
+                description="Collecting HTML for the session {}...".format(session),
+                enricher=enricher) == len(items)
+        else:
+            # Saved like the results, so it is also percolated and added to the hosts inventory
+            saved = self._save_items(
+                [(ffuf_record([]), [], None)], session, source, resume, enricher=enricher) == 1
+        self.ctx.log("Project name: [bold deep_pink2]{}[/bold deep_pink2]".format(self.domain))
+        self.ctx.log("Session name: [bold deep_pink2]{}[/bold deep_pink2]".format(session))
+        self.ctx.log("Results: {}".format(len_results))
+        return saved
+
+    def save_general_data(self, data, session, filter_dups=None, remove_filter_dups=None, source=None, resume=False,
+                          enricher=None):
+        """
+        Save General JSON data
+        Parameters
+        ----------
+        data : Dict
+            Json data
+        session : String
+            Session name
+        filter_dups: String
+            field name which is going to be filtered
+        source : String
+            Input file path, used for the checkpoints
+        resume : boolean
+            Continue from the last acknowledged batch of the source
+        enricher : Enricher
+            Extract the enrich fields of the records
+        """
+        session = session if session else get_random_name()
+        # Filter the duplicate data that is in the JSON
+        if filter_dups:
+            data = get_duplications(
+                data=data,
+                filter_dups=filter_dups,
+                remove_filter_dups=remove_filter_dups)
+        reference_key = None
+        if filter_dups:
+            reference_key = "{}_duplicate_reference_id".format(filter_dups.replace(".", "_"))
+
+        def add_time_session(record):
+            # Adding time and session
+            record.update({
+                "time": datetime.datetime.now(),
+                "session": session})
+
+        items = []
+        for result in data:
+            # Remove duplicates before to save in ES
+            dups = result.pop("dups", [])
+            items.append((result, dups, reference_key))
+        saved = self._save_items(
+            items, session, source, resume, prepare=add_time_session, enricher=enricher) == len(items)
+        self.ctx.log("Project name: [bold deep_pink2]{}[/bold deep_pink2]".format(self.domain))
+        self.ctx.log("Session name: [bold deep_pink2]{}[/bold deep_pink2]".format(session))
+        self.ctx.log("Results: {}".format(len(data)))
+        return saved
+
+    def save_json(self, files, session, filter_dups=None, remove_filter_dups=None, resume=False, near_dups=None,
+                  enrich_workers=None):
+        """
+        Save JSON Data to ES.
+        Parameters
+        ----------
+        files : List
+            List of files
+        session : String
+            Session's name
+        filter_dups : String
+            Filter duplicates by X field
+        resume : boolean
+            Continue each file from its last acknowledged batch
+        near_dups : int
+            Group the near duplicate ffuf responses
+        enrich_workers : int
+            Extract the enrich fields with this number of processes
+        Returns
+        -------
+        boolean
+            True if all the files were fully saved
+        """
+        if self.es.connected() is False:
+            self.ctx.log("ElasticSearch connection error")
+            return False
+
+        saved = True
+        with self.enrichment(enrich_workers) as enricher:
+            for filepath in files:
+                with open(filepath, "rb") as fp:
+                    data = {}
+                    try:
+                        data = loads(fp.read())
+                    except json.decoder.JSONDecodeError:
+                        self.ctx.vlog("Error decoding the JSON Data")
+                        saved = False
+                        continue
+                    # Put the data in ES
+                    if "ffuf" in str(data):
+                        saved = self.save_ffuf_data(
+                            data, session, filter_dups, remove_filter_dups,
+                            source=filepath, resume=resume, near_dups=near_dups, enricher=enricher) and saved
+                    else:
+                        saved = self.save_general_data(
+                            data, session, filter_dups, remove_filter_dups,
+                            source=filepath, resume=resume, enricher=enricher) and saved
+        # New fields could be added by the collect
+        self.project_mapping()
+        return saved
+
+    def _read_stream(self, stream, records, lines_field=None):
+        """
+        Parse the lines of the stream in a thread and put the records in
+        the queue, None marks the end of the stream.
+        """
+        try:
+            for line in stream:
+                line = line.strip()
+                if not line:
+                    continue
+                if lines_field:
+                    records.put({lines_field: line})
+                    continue
+                try:
+                    record = loads(line)
+                except json.decoder.JSONDecodeError:
+                    self.ctx.vlog("Skipping a line that is not JSON: {}".format(line[:100]))
+                    continue
+                if isinstance(record, dict):
+                    records.put(record)
+        finally:
+            records.put(None)
+
+    def save_stream(self, stream, session, lines_field=None, flush_interval=2.0, enrich_workers=None):
+        """
+        Save the records of a stream as they arrive. A batch is sent when it
+        is full or flush_interval seconds after its first record, so slow
+        pipelines are indexed continuously and memory stays bounded.
+        Parameters
+        ----------
+        stream : File
+            JSONL stream, one record per line
+        session : String
+            Session's name
+        lines_field : String
+            Read raw lines, each line is saved in this field
+        flush_interval : float
+            Maximum seconds a record waits before being sent
+        enrich_workers : int
+            Extract the enrich fields with this number of processes
+        Returns
+        -------
+        boolean
+            True if all the records were saved
+        """
+        if self.es.connected() is False:
+            self.ctx.log("ElasticSearch connection error")
+            return False
+        # The reader waits when the uploads are slower than the input
+        records = queue.Queue(maxsize=self.es.batch_size * 4)
+        threading.Thread(target=self._read_stream, args=(stream, records, lines_field), daemon=True).start()
+        saved = True
+        total = 0
+        done = False
+        with self.enrichment(enrich_workers) as enricher:
+            while not done:
+                batch = []
+                deadline = None
+                while len(batch) < self.es.batch_size:
+                    timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+                    try:
+                        record = records.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                    if record is None:
+                        done = True
+                        break
+                    record.update({"time": datetime.datetime.now(), "session": session})
+                    batch.append((uuid.uuid4().hex, record))
+                    if deadline is None:
+                        deadline = time.monotonic() + flush_interval
+                if batch:
+                    saved = self.save_actions(batch, enricher) and saved
+                    total += len(batch)
+                    self.ctx.vlog("{} records sent".format(total))
+        self.ctx.log("Project name: [bold deep_pink2]{}[/bold deep_pink2]".format(self.domain))
+        self.ctx.log("Session name: [bold deep_pink2]{}[/bold deep_pink2]".format(session))
+        self.ctx.log("Results: {}".format(total))
+        # New fields could be added by the collect
+        self.project_mapping()
+        return saved
+
+    def query(self, term, size=100, order="time:desc", raw=False, fields=[], full=False, since=None, profile=False,
+              docvalues=False):
+        """
+        Send Queries to ES
+        Parameters
+        ----------
+        term : String
+            Search Query
+        fields : List
+            Fields to return
+        docvalues : boolean
+            Read the keyword, numeric and date fields from the doc values.
+            Only for the tables, the doc values lose the microseconds of
+            the dates and the single element arrays.
+        full : boolean
+            Return the heavy fields (DEFAULT_EXCLUDES) when no fields are given
+        since : timedelta
+            Only search the documents of the last period of time
+        profile : boolean
+            Add the profile API breakdown to the response
+        """
+        q = None
+        self.ctx.vlog("Sending the query '{}' to ElasticSeach.".format(term))
+        source = [f for f in fields if f != "_id"]
+        docvalue_fields = []
+        if source and not raw:
+            if docvalues:
+                catalog = self.field_catalog()
+                docvalue_fields = [f for f in source if catalog.get(f, {}).get("aggregatable")]
+                source = [f for f in source if f not in docvalue_fields]
+            if not source:
+                # Everything comes from the doc values
+                source = False
+        elif fields:
+            # Only the _id was asked
+            source = False
+        excludes = [] if full else DEFAULT_EXCLUDES
+        index = self.domain
+        if term and not raw:
+            # Substring searches use the infix subfield of the body index
+            term = infix_term(term, self.field_catalog())
+        if since and not raw:
+            index = self.search_index(since)
+            term = "({}) AND time:>=\"{}\"".format(
+                term, (datetime.datetime.now() - since).isoformat())
+        try:
+            q = self.es.query(
+                index, term, size, order, raw, source,
+                excludes=excludes,
+                docvalue_fields=docvalue_fields,
+                profile=profile)
+        except Exception as e:
+            self.ctx.log("Query connection failed: {}!".format(e))
+            self.ctx.vlog("{}!".format(e))
+
+        return q
+
+    def delete(self):
+        """
+        Delete and Index from ES, with its watches, alerts and hosts
+        """
+        d = None
+        try:
+            indexes = self.layout()["indexes"] or [self.domain]
+            d = self.es.delete_index(",".join(indexes))
+            if d:
+                # One by one, a missing index fails the whole request
+                for kind in COMPANION_KINDS:
+                    self.es.delete_index(companion_index(self.domain, kind))
+                self._hosts_ready = False
+                self._watches = None
+        except Exception:
+            self.ctx.log("Query connection failed!")
+        return d
+
+    def count(self, term):
+        """
+        Count the documents matching the query
+        """
+        c = None
+        try:
+            c = self.es.count(self.domain, term)
+        except Exception as e:
+            self.ctx.log("Query connection failed: {}!".format(e))
+        return c
+
+    def aggregate(self, term, aggs):
+        """
+        Run aggregations over the documents matching the query,
+        no document is returned.
+        Parameters
+        ----------
+        term : String
+            Lucene query
+        aggs : Dict
+            ElasticSearch aggregations
+        """
+        body = {
+            "size": 0,
+            "track_total_hits": True,
+            "query": {"query_string": {"query": term}},
+            "aggs": aggs
+        }
+        return self.query(term=body, raw=True)
+
+    def delete_by_query(self, query, slices="auto", requests_per_second=None):
+        """
+        Delete the documents matching the query in a server-side task
+        Parameters
+        ----------
+        query : Dict
+            ElasticSearch query DSL
+        Returns
+        -------
+        String
+            The task id
+        """
+        t = None
+        try:
+            t = self.es.delete_by_query(self.domain, query, slices, requests_per_second)
+        except NotImplementedError as e:
+            self.ctx.log(str(e))
+        except Exception as e:
+            self.ctx.log("Query connection failed: {}!".format(e))
+        return t
+
+    def update_by_query(self, query, script, slices="auto", requests_per_second=None):
+        """
+        Update the documents matching the query in a server-side task
+        Parameters
+        ----------
+        query : Dict
+            ElasticSearch query DSL
+        script : Dict
+            Painless script applied to each document
+        Returns
+        -------
+        String
+            The task id
+        """
+        t = None
+        try:
+            t = self.es.update_by_query(self.domain, query, script, slices, requests_per_second)
+        except NotImplementedError as e:
+            self.ctx.log(str(e))
+        except Exception as e:
+            self.ctx.log("Query connection failed: {}!".format(e))
+        return t
+
+    def tag(self, term, set_tags={}, unset_tags=[], requests_per_second=None):
+        """
+        Set and remove tags of the documents matching the query. The
+        documents that already have the tags are not written again.
+        Parameters
+        ----------
+        term : String
+            Lucene query
+        set_tags : Dict
+            Tag name -> value
+        unset_tags : List
+            Tag names to remove
+        Returns
+        -------
+        String
+            The task id
+        """
+        script = {"lang": "painless", "source": TAG_SCRIPT, "params": {"set": set_tags, "unset": list(unset_tags)}}
+        return self.update_by_query({"query_string": {"query": term}}, script, requests_per_second=requests_per_second)
+
+    def _rewrite_script(self, rewrite, id_prefix=None):
+        return {"lang": "painless", "source": REWRITE_SCRIPT, "params": {"rewrite": rewrite, "id_prefix": id_prefix}}
+
+    def rewrite_sessions(self, sessions, rewrite, requests_per_second=None):
+        """
+        Change fields of the documents of the sessions in place, like the
+        session name to rename or merge sessions.
+        Parameters
+        ----------
+        sessions : List
+            Session names
+        rewrite : Dict
+            Field path -> new value
+        Returns
+        -------
+        String
+            The task id
+        """
+        return self.update_by_query(
+            self.session_query(sessions), self._rewrite_script(rewrite), requests_per_second=requests_per_second)
+
+    def _prepare_copy(self, dest):
+        """
+        Create the destination of a copy with the field types of the source
+        """
+        props = {}
+        for index in (self.es.get_index_mapping(self.domain) or {}).values():
+            props.update(index.get("mappings", {}).get("properties", {}))
+        dest.es.create_index(dest.write_index)
+        if props:
+            dest.es.put_mapping(dest.write_index, props)
+
+    def copy_sessions(self, sessions, dest, rewrite={}, requests_per_second=None):
+        """
+        Copy the documents of the sessions to another project in a
+        server-side reindex.
+        Parameters
+        ----------
+        sessions : List
+            Session names
+        dest : HoruzES
+            Destination project, it can be this project
+        rewrite : Dict
+            Field path -> new value
+        Returns
+        -------
+        String
+            The task id
+        """
+        t = None
+        try:
+            self._prepare_copy(dest)
+            # Copies in the same project need new ids to keep the originals
+            id_prefix = rewrite.get("session") if dest.domain == self.domain else None
+            t = self.es.reindex(
+                self.domain, dest.write_index, self.session_query(sessions),
+                script=self._rewrite_script(rewrite, id_prefix) if rewrite else None,
+                requests_per_second=requests_per_second)
+        except NotImplementedError as e:
+            self.ctx.log(str(e))
+        except Exception as e:
+            self.ctx.log("Query connection failed: {}!".format(e))
+        return t
+
+    def move_sessions(self, sessions, dest, rewrite={}, requests_per_second=None, chunk_size=MOVE_CHUNK):
+        """
+        Move the documents of the sessions to another project. Their ids are
+        read first from a point in time, then every chunk is copied and it
+        is only deleted when all its documents were copied. The documents
+        collected meanwhile are not moved and not deleted.
+        Parameters
+        ----------
+        sessions : List
+            Session names
+        dest : HoruzES
+            Destination project, it must not be this project
+        rewrite : Dict
+            Field path -> new value
+        Yields
+        ------
+        Tuple
+            (documents to move, copied, deleted) of each chunk. It stops at
+            the first chunk that was not fully copied, its documents are kept.
+        """
+        query = self.session_query(sessions)
+        try:
+            pit_id = self.es.open_pit(self.domain)
+            try:
+                ids = [hit["_id"] for hit in self.es.scan(pit_id, query=query, source=False)]
+            finally:
+                self.es.close_pit(pit_id)
+            self._prepare_copy(dest)
+        except NotImplementedError as e:
+            self.ctx.log(str(e))
+            return
+        except Exception as e:
+            self.ctx.log("Query connection failed: {}!".format(e))
+            return
+        script = self._rewrite_script(rewrite) if rewrite else None
+        for start in range(0, len(ids), chunk_size):
+            chunk = {"bool": {"filter": [query, {"ids": {"values": ids[start:start + chunk_size]}}]}}
+            response = self.wait_task(self.es.reindex(
+                self.domain, dest.write_index, chunk, script=script, requests_per_second=requests_per_second))
+            copied = response.get("created", 0) + response.get("updated", 0) if response else 0
+            if not response or response.get("failures") or response.get("canceled") \
+                    or copied != response.get("total"):
+                self.ctx.log("The copy of the documents {} to {} did not finish.".format(
+                    start, start + chunk_size))
+                return
+            response = self.wait_task(self.es.delete_by_query(
+                self.domain, chunk, requests_per_second=requests_per_second))
+            if not response or response.get("failures") or response.get("canceled"):
+                self.ctx.log("The copied documents {} to {} were not deleted.".format(start, start + chunk_size))
+                return
+            yield len(ids), copied, response.get("deleted", 0)
+
+    def task(self, task_id):
+        """
+        Get the status of a task
+        """
+        t = None
+        try:
+            t = self.es.get_task(task_id)
+        except Exception as e:
+            self.ctx.log("Task {} not found: {}".format(task_id, e))
+        return t
+
+    def wait_task(self, task_id, interval=0.5):
+        """
+        Wait until a task finishes
+        Returns
+        -------
+        Dict
+            The task response, None if the task was not found
+        """
+        while task_id:
+            task = self.task(task_id)
+            if not task:
+                return None
+            if task.get("completed"):
+                return task.get("response", {})
+            time.sleep(interval)
+        return None
+
+    def cancel_task(self, task_id):
+        """
+        Cancel a running task
+        """
+        cancelled = False
+        try:
+            self.es.cancel_task(task_id)
+            cancelled = True
+        except Exception as e:
+            self.ctx.log("Task {} could not be cancelled: {}".format(task_id, e))
+        return cancelled
+
+    def tasks(self):
+        """
+        Get the running delete, update and reindex tasks
+        """
+        t = {}
+        try:
+            t = self.es.list_tasks()
+        except Exception as e:
+            self.ctx.log("Query connection failed: {}!".format(e))
+        return t
+
+    def session_query(self, sessions):
+        """
+        Query DSL that matches the documents of the given sessions
+        """
+        field = docvalue_field(self.field_catalog(), "session") or "session.keyword"
+        return {"terms": {field: list(sessions)}}
+
+    def session_diff(self, base, other, keys, compare=[], page_size=DIFF_PAGE_SIZE):
+        """
+        Compare two sessions by key. The keys are paged with a composite
+        aggregation and each key bucket carries, per session, the values of
+        the compared fields and one document id, so no document is read.
+        Parameters
+        ----------
+        base : String
+            Old session
+        other : String
+            New session
+        keys : List
+            Fields that identify a record, like host
+        compare : List
+            Fields whose values are compared for the keys of both sessions
+        Yields
+        ------
+        Tuple
+            (change, key, detail), change is added, removed or changed
+        """
+        catalog = self.field_catalog()
+
+        def agg_field(field):
+            return docvalue_field(catalog, field) or "{}.keyword".format(field)
+
+        session_aggs = {"doc": {"top_hits": {"size": 1, "_source": False}}}
+        for field in compare:
+            session_aggs[field] = {"terms": {"field": agg_field(field), "size": 10}}
+        composite = {
+            "size": page_size,
+            "sources": [{key: {"terms": {"field": agg_field(key)}}} for key in keys]}
+        body = {
+            "size": 0,
+            "query": {"bool": {"filter": [self.session_query([base, other])]}},
+            "aggs": {
+                "keys": {
+                    "composite": composite,
+                    "aggs": {"sessions": {"terms": {"field": agg_field("session"), "size": 2}, "aggs": session_aggs}}
+                }
+            }
+        }
+        while True:
+            response = self.query(term=body, raw=True)
+            if not response:
+                self.ctx.log("The diff query failed.")
+                return
+            page = response["aggregations"]["keys"]
+            for bucket in page["buckets"]:
+                sessions = {b["key"]: b for b in bucket["sessions"]["buckets"]}
+                if base not in sessions:
+                    yield "added", bucket["key"], {"_id": sessions[other]["doc"]["hits"]["hits"][0]["_id"]}
+                elif other not in sessions:
+                    yield "removed", bucket["key"], {"_id": sessions[base]["doc"]["hits"]["hits"][0]["_id"]}
+                else:
+                    changes = {}
+                    for field in compare:
+                        old, new = [
+                            sorted(b.get("key_as_string", b["key"]) for b in sessions[s][field]["buckets"])
+                            for s in (base, other)]
+                        if old != new:
+                            changes[field] = [old, new]
+                    if changes:
+                        yield "changed", bucket["key"], {
+                            "_id": sessions[other]["doc"]["hits"]["hits"][0]["_id"],
+                            "changes": changes}
+            if not page["buckets"] or not page.get("after_key"):
+                return
+            composite["after"] = page["after_key"]
+
+    @property
+    def watches_index(self):
+        return companion_index(self.domain, "watches")
+
+    @property
+    def alerts_index(self):
+        return companion_index(self.domain, "alerts")
+
+    def add_watch(self, name, term):
+        """
+        Save a query, the new documents that match it are alerted.
+        Parameters
+        ----------
+        name : String
+            Watch name
+        term : String
+            Lucene query
+        Returns
+        -------
+        boolean
+            saved or not
+        """
+        saved = False
+        try:
+            # The saved queries can use every field of the project
+            properties = {}
+            for index in (self.es.get_index_mapping(self.domain) or {}).values():
+                properties.update(index.get("mappings", {}).get("properties", {}))
+            meta = companion_meta(self.domain, "watches")
+            if self.es.create_percolator(self.watches_index, properties, meta):
+                saved = self.es.save_bulk(self.watches_index, [(name, {
+                    "name": name,
+                    "term": term,
+                    "created": datetime.datetime.now(),
+                    "query": {"query_string": {"query": term}}})])
+        except NotImplementedError as e:
+            self.ctx.log(str(e))
+        except Exception as e:
+            self.ctx.log("Watch error: {}!".format(e))
+        return saved
+
+    def remove_watch(self, name):
+        """
+        Delete a saved query
+        """
+        removed = False
+        try:
+            removed = self.es.delete_document(self.watches_index, name)
+        except Exception as e:
+            self.ctx.log("Watch error: {}!".format(e))
+        return removed
+
+    def watches(self, cached=False):
+        """
+        Get the saved queries of the project
+        Parameters
+        ----------
+        cached : boolean
+            Reuse the queries loaded less than WATCHES_TTL seconds ago
+        Returns
+        -------
+        List
+            {"name", "term", "created"} of each query
+        """
+        self.es.require("Watches")
+        if cached and self._watches is not None and time.monotonic() - self._watches_loaded < WATCHES_TTL:
+            return self._watches
+        watches = []
+        try:
+            response = self.es.search(self.watches_index, {
+                "size": 1000,
+                "_source": ["name", "term", "created"],
+                "query": {"match_all": {}}})
+            if response:
+                watches = [hit["_source"] for hit in response["hits"]["hits"]]
+        except Exception as e:
+            self.ctx.vlog("Watches error {}".format(e))
+        self._watches, self._watches_loaded = watches, time.monotonic()
+        return watches
+
+    def _percolate(self, actions):
+        """
+        Match the saved documents with the saved queries, the matches are
+        saved in the alerts index and sent to on_alert.
+        """
+        if "Watches" not in self.es.features or not self.watches(cached=True):
+            return
+        try:
+            hits = self.es.percolate(self.watches_index, [record for _, record in actions])
+        except Exception as e:
+            self.ctx.log("Percolate error: {}!".format(e))
+            return
+        alerts = []
+        now = datetime.datetime.now()
+        for hit in hits:
+            for slot in hit.get("fields", {}).get("_percolator_document_slot", []):
+                doc_id, record = actions[slot]
+                alert = {
+                    "watch": hit["_source"]["name"],
+                    "term": hit["_source"]["term"],
+                    "doc_id": doc_id,
+                    "session": record.get("session"),
+                    "host": record.get("host"),
+                    "type": record.get("type"),
+                    "time": now}
+                alert_id = hashlib.sha1("{}:{}".format(alert["watch"], doc_id).encode("utf-8")).hexdigest()
+                alerts.append((alert_id, alert))
+                if self.on_alert:
+                    self.on_alert(alert)
+        if alerts and self.es.create_index(
+                self.alerts_index, companion_mappings(self.domain, "alerts", ALERTS_PROPERTIES)):
+            self.es.save_bulk(self.alerts_index, alerts)
+
+    def alerts(self, size=100, watch=None):
+        """
+        Get the last alerts of the saved queries
+        """
+        self.es.require("Watches")
+        query = {"term": {"watch": watch}} if watch else {"match_all": {}}
+        response = None
+        try:
+            response = self.es.search(self.alerts_index, {
+                "size": size,
+                "sort": [{"time": "desc"}],
+                "query": query})
+        except Exception as e:
+            self.ctx.log("Alerts error: {}!".format(e))
+        return [hit["_source"] for hit in response["hits"]["hits"]] if response else []
+
+    @property
+    def hosts_index(self):
+        return companion_index(self.domain, "hosts")
+
+    def _update_hosts(self, actions, created=()):
+        """
+        Add the saved documents to the hosts inventory, one scripted upsert
+        per host of the batch. Only the created documents are counted, the
+        re-sent ones replaced a document that was counted already.
+        """
+        if "Hosts inventory" not in self.es.features:
+            return
+        summary = {}
+        for _id, record in actions:
+            host = record.get("host")
+            if not isinstance(host, str) or not host:
+                continue
+            entry = summary.setdefault(host, {"sessions": set(), "statuses": set(), "hits": 0})
+            entry["hits"] += _id in created
+            if record.get("session"):
+                entry["sessions"].add(record["session"])
+            result = record.get("result")
+            status = result.get("status") if isinstance(result, dict) else record.get("status") or record.get("status_code")
+            if str(status).isdigit():
+                entry["statuses"].add(int(status))
+        if not summary:
+            return
+        now = datetime.datetime.now()
+        updates = []
+        for host, entry in summary.items():
+            updates.append((self._host_id(host), {
+                "source": HOSTS_SCRIPT,
+                "lang": "painless",
+                "params": {
+                    "host": host,
+                    "time": now,
+                    "sessions": sorted(entry["sessions"]),
+                    "statuses": sorted(entry["statuses"]),
+                    "hits": entry["hits"]}}))
+        try:
+            if self._hosts_index_ready():
+                self.es.upsert_bulk(self.hosts_index, updates)
+        except Exception as e:
+            self.ctx.log("Hosts inventory error: {}!".format(e))
+
+    def _host_id(self, host):
+        return hashlib.sha1(host.encode("utf-8")).hexdigest()
+
+    def _hosts_index_ready(self):
+        if not self._hosts_ready:
+            self._hosts_ready = self.es.create_index(
+                self.hosts_index, companion_mappings(self.domain, "hosts", HOSTS_PROPERTIES))
+        return self._hosts_ready
+
+    def rebuild_hosts(self):
+        """
+        Count again the hosts inventory from the documents of the project,
+        after the documents were moved, merged, deleted or imported. The
+        hosts without documents are removed.
+        Returns
+        -------
+        int
+            Number of hosts, None when it could not be rebuilt
+        """
+        if "Hosts inventory" not in self.es.features:
+            return None
+        catalog = self.field_catalog()
+        started = datetime.datetime.now()
+        aggs = {"sessions": {"terms": {"field": docvalue_field(catalog, "session") or "session.keyword",
+                                       "size": HOSTS_TERMS}}}
+        for field in ("result.status", "status", "status_code"):
+            if catalog.get(field, {}).get("type") in ("long", "integer", "short", "byte"):
+                aggs[field] = {"terms": {"field": field, "size": HOSTS_TERMS}}
+        if docvalue_field(catalog, "time") == "time":
+            aggs["first_seen"] = {"min": {"field": "time"}}
+            aggs["last_seen"] = {"max": {"field": "time"}}
+        composite = {"size": HOSTS_PAGE, "sources": [
+            {"host": {"terms": {"field": docvalue_field(catalog, "host") or "host.keyword"}}}]}
+        body = {"size": 0, "aggs": {"hosts": {"composite": composite, "aggs": aggs}}}
+        total = 0
+        try:
+            self.es.refresh(self.domain)
+            if not self._hosts_index_ready():
+                return None
+            while True:
+                response = self.query(term=body, raw=True)
+                if not response:
+                    self.ctx.log("The hosts query failed.")
+                    return None
+                page = response["aggregations"]["hosts"]
+                actions = []
+                for bucket in page["buckets"]:
+                    host = bucket["key"]["host"]
+                    entry = {
+                        "host": host,
+                        "sessions": sorted(b["key"] for b in bucket["sessions"]["buckets"]),
+                        "statuses": sorted({
+                            int(b["key"]) for field in ("result.status", "status", "status_code")
+                            for b in bucket.get(field, {}).get("buckets", [])}),
+                        "hits": bucket["doc_count"],
+                        "updated": started}
+                    for field in ("first_seen", "last_seen"):
+                        if bucket.get(field, {}).get("value_as_string"):
+                            entry[field] = bucket[field]["value_as_string"]
+                    actions.append((self._host_id(host), entry))
+                if actions and not self.es.save_bulk(self.hosts_index, actions):
+                    return None
+                total += len(actions)
+                if not page["buckets"] or not page.get("after_key"):
+                    break
+                composite["after"] = page["after_key"]
+            # The hosts updated by the collects since the start are kept
+            self.es.refresh(self.hosts_index)
+            self.wait_task(self.es.delete_by_query(
+                self.hosts_index, {"bool": {"must_not": [{"range": {"updated": {"gte": started}}}]}}))
+        except Exception as e:
+            self.ctx.log("Hosts inventory error: {}!".format(e))
+            return None
+        self.ctx.vlog("Hosts inventory rebuilt, {} hosts.".format(total))
+        return total
+
+    def hosts(self, host=None, session=None, size=100, sort="last_seen"):
+        """
+        Get the hosts inventory of the project
+        Parameters
+        ----------
+        host : String
+            Only the hosts that match this wildcard pattern
+        session : String
+            Only the hosts seen in this session
+        sort : String
+            Field sorted in descending order
+        Returns
+        -------
+        List
+            {"host", "first_seen", "last_seen", "sessions", "statuses", "hits"}
+        """
+        self.es.require("Hosts inventory")
+        filters = []
+        if host:
+            filters.append({"wildcard": {"host": host}})
+        if session:
+            filters.append({"term": {"sessions": session}})
+        response = None
+        try:
+            response = self.es.search(self.hosts_index, {
+                "size": size,
+                "sort": [{sort: "desc"}],
+                "query": {"bool": {"filter": filters}}})
+        except Exception as e:
+            self.ctx.log("Hosts error: {}!".format(e))
+        return [hit["_source"] for hit in response["hits"]["hits"]] if response else []
+
+    def _lookup_chunk(self, field, values, text_field=None):
+        """
+        Find which values of the chunk the project has, with one terms
+        aggregation restricted to the chunk. The values longer than the
+        keyword field limit are looked up in text_field.
+        Returns
+        -------
+        Dict
+            value -> {"count", "ids", "sessions"} of the found values
+        """
+        limit = self.es.keyword_limit
+        long_values = [v for v in values if text_field and limit and len(v) > limit]
+        if long_values:
+            values = [v for v in values if v not in long_values]
+        found = self._lookup_long(text_field, long_values) if long_values else {}
+        if not values:
+            return found
+        session_field = docvalue_field(self.field_catalog(), "session") or "session.keyword"
+        body = {
+            "size": 0,
+            "query": {"bool": {"filter": [{"terms": {field: values}}]}},
+            "aggs": {
+                "values": {
+                    "terms": {"field": field, "include": values, "size": len(values)},
+                    "aggs": {
+                        "ids": {"top_hits": {"size": LOOKUP_IDS, "_source": False}},
+                        "sessions": {"terms": {"field": session_field, "size": LOOKUP_SESSIONS}}
+                    }
+                }
+            }
+        }
+        response = self.query(term=body, raw=True)
+        if not response:
+            raise ValueError("The lookup query failed")
+        for bucket in response["aggregations"]["values"]["buckets"]:
+            found[str(bucket.get("key_as_string", bucket["key"]))] = {
+                "count": bucket["doc_count"],
+                "ids": [hit["_id"] for hit in bucket.get("ids", {}).get("hits", {}).get("hits", [])],
+                "sessions": [b["key"] for b in bucket.get("sessions", {}).get("buckets", [])]}
+        return found
+
+    def _lookup_long(self, field, values):
+        """
+        Find values that the keyword field does not index, with a phrase
+        search per value in one multi search. The first LOOKUP_LONG_HITS
+        matches are compared with the value, the count is at most that.
+        Returns
+        -------
+        Dict
+            value -> {"count", "ids", "sessions"} of the found values
+        """
+        bodies = [
+            {"size": LOOKUP_LONG_HITS, "_source": [field, "session"], "query": {"match_phrase": {field: value}}}
+            for value in values]
+        found = {}
+        for value, response in zip(values, self.es.msearch(self.domain, bodies)):
+            if response is None:
+                raise ValueError("The lookup query failed")
+            hits = []
+            for hit in response["hits"]["hits"]:
+                source = get_path(hit["_source"], field)
+                if source == value or isinstance(source, list) and value in source:
+                    hits.append(hit)
+            if hits:
+                found[value] = {
+                    "count": len(hits),
+                    "ids": [hit["_id"] for hit in hits[:LOOKUP_IDS]],
+                    "sessions": sorted({str(hit["_source"].get("session")) for hit in hits})[:LOOKUP_SESSIONS]}
+        return found
+
+    def response_metrics(self, session):
+        """
+        Read the host, status, length, words and lines of the ffuf results
+        of a session from the doc values, without the sources.
+        Parameters
+        ----------
+        session : String
+            Session name
+        Returns
+        -------
+        ResponseMetrics
+            Column arrays of the metrics
+        """
+        catalog = self.field_catalog()
+
+        def field(name):
+            return docvalue_field(catalog, name) or name
+
+        host_field = docvalue_field(catalog, "host") or "host.keyword"
+        status_field = field("result.status")
+        metric_fields = {metric: field("result.{}".format(metric)) for metric in METRICS}
+        query = {"bool": {"filter": [
+            {"term": {docvalue_field(catalog, "session") or "session.keyword": session}},
+            {"term": {docvalue_field(catalog, "type") or "type.keyword": "ffuf"}}]}}
+        metrics = ResponseMetrics()
+        pit_id = self.es.open_pit(self.domain)
+        try:
+            for hit in self.es.scan(pit_id, query=query, source=False,
+                                    docvalue_fields=[host_field, status_field] + list(metric_fields.values())):
+                fields = hit.get("fields", {})
+                metrics.append(
+                    hit["_id"],
+                    (fields.get(host_field) or [""])[0],
+                    (fields.get(status_field) or [0])[0],
+                    {m: (fields.get(f) or [0])[0] for m, f in metric_fields.items()})
+        finally:
+            self.es.close_pit(pit_id)
+        return metrics
+
+    def lookup(self, field, values, chunk_size=LOOKUP_CHUNK, workers=LOOKUP_WORKERS):
+        """
+        Check which values are in the project. The values are sent in
+        chunks, several chunks at the same time, and the results are
+        yielded in the order of the values as soon as their chunk is done.
+        Parameters
+        ----------
+        field : String
+            Field of the values, its keyword field is used
+        values : List
+            Values to look up
+        chunk_size : int
+            Values per request, at most LOOKUP_MAX_CHUNK
+        Yields
+        ------
+        Tuple
+            (value, match), match is None when the value is missing
+        """
+        keyword = docvalue_field(self.field_catalog(), field) or "{}.keyword".format(field)
+        # The keyword subfield of a text field skips the long values
+        text_field = field if keyword == "{}.keyword".format(field) else None
+        limit = self.es.keyword_limit
+        if text_field and limit and any(len(v) > limit for v in values):
+            self.ctx.log("The values longer than {} characters are compared with the first {} phrase matches.".format(
+                limit, LOOKUP_LONG_HITS))
+        chunk_size = min(chunk_size, LOOKUP_MAX_CHUNK)
+        chunks = [values[i:i + chunk_size] for i in range(0, len(values), chunk_size)]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            lookups = executor.map(lambda c: self._lookup_chunk(keyword, c, text_field), chunks)
+            for chunk, found in zip(chunks, lookups):
+                for value in chunk:
+                    yield value, found.get(value)
+
+    def get_documents(self, ids, fields=[]):
+        """
+        Get the full documents by id
+        """
+        docs = []
+        try:
+            docs = self.es.get_documents(
+                self.domain, ids, fields,
+                multi_index=bool(self.layout()["partition"]))
+        except Exception as e:
+            self.ctx.log("Query connection failed: {}!".format(e))
+        return docs
+
+    def indexes(self):
+        """
+        Get all Indexes from ES.
+        """
+        s = None
+        try:
+            projects = set()
+            for index, info in self.es.get_all_indexes().items():
+                # Partitions are listed by their project read alias
+                aliases = [
+                    a for a in info.get("aliases", {})
+                    if not a.endswith(WRITE_SUFFIX) and index.startswith("{}-".format(a))]
+                # System, hidden and companion indexes are not projects
+                if index.startswith("."):
+                    continue
+                projects.add(aliases[0] if aliases else index)
+            s = sorted(projects)
+        except Exception:
+            self.ctx.log("Query connection failed!")
+        return s
+
+    def project_mapping(self):
+        """
+        Get the fields of the project from the ES mapping and refresh
+        the local field catalog.
+        Returns
+        -------
+        Dict
+            Field path -> {"type", "aggregatable", "docvalue"}
+        """
+        mapping = {}
+        try:
+            props = self.es.get_index_mapping(self.domain)
+            if props:
+                mapping = update_catalog(self.domain, props)
+        except Exception as e:
+            self.ctx.log("Mapping connection failed! {}".format(e))
+        return mapping
+
+    def field_catalog(self):
+        """
+        Get the cached field catalog, the mapping is only requested
+        to ES when the project was never cached.
+        """
+        return load_catalog(self.domain) or self.project_mapping()
 
     def is_connected(self):
         """
@@ -1,7 +1,7 @@
 import os
 
 
-def collect(path=None, prefix=None):
+def collect(path=None, prefix=None, suffix=None):
     """
     Collect files from directory.
     """
@@ -10,6 +10,11 @@ def collect(path=None, prefix=None):
     files = []
     for r, d, f in os.walk(path):
         for file in f:
-            if prefix and prefix in file:
-                files.append(os.path.join(r, file))
+            if not prefix and not suffix:
+                continue
+            if prefix and prefix not in file:
+                continue
+            if suffix and not file.endswith(suffix):
+                continue
+            files.append(os.path.join(r, file))
     return files
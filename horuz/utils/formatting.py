@@ -11,6 +11,27 @@ def recursive_items(dictionary):
             yield (key, value)
 
 
+def set_path(dictionary, path, value):
+    """
+    Set the value of a dotted path like result.status in a nested dict
+    """
+    keys = path.split(".")
+    for key in keys[:-1]:
+        dictionary = dictionary.setdefault(key, {})
+    dictionary[keys[-1]] = value
+
+
+def get_path(dictionary, path):
+    """
+    Get the value of a dotted path like result.status in a nested dict
+    """
+    for key in path.split("."):
+        if not isinstance(dictionary, dict):
+            return None
+        dictionary = dictionary.get(key)
+    return dictionary
+
+
 def beautify_query(query, fields=[], output="oj"):
     """
     Prepare the query for the user.
@@ -24,8 +45,10 @@ def beautify_query(query, fields=[], output="oj"):
     try:
         if query and query['hits']:
             for hit in query['hits']['hits']:
-                source = hit["_source"]
-                d = source
+                d = hit.get("_source", {})
+                # Fields read from the doc values
+                for field, values in hit.get("fields", {}).items():
+                    set_path(d, field, values[0] if len(values) == 1 else values)
                 d["_id"] = hit["_id"]
                 data.append(d)
     except Exception as e:
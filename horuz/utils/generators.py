@@ -1,10 +1,19 @@
+from collections import Counter
+import hashlib
 import random
+import re
 import time
 
 import click
 import dpath.util
 
 
+# Fields of the ffuf results kept as references of the near duplicates
+NEAR_DUP_FIELDS = ("url", "input", "status", "length", "words", "lines", "resultfile")
+# Bits of each simhash lane, enough for the token counts of a response
+SIMHASH_LANE = 24
+
+
 def get_random_name():
     """
     Name generator which will be using for the sessions.
@@ -408,3 +417,95 @@ def get_duplications(data, filter_dups, remove_filter_dups=None):
                     data.remove(d2)
             new_data.append(new_dict)
     return new_data
+
+
+def simhash(tokens, cache):
+    """
+    64 bits simhash of the tokens.
+    The bits of each token hash are spread in 64 lanes of one big integer, so
+    the bit counts of all the tokens are added with one addition per token
+    instead of 64. The spread hashes are kept in the cache shared by the
+    whole batch, the responses of a session repeat most of their tokens.
+    """
+    counts = Counter(tokens)
+    total = 0
+    for token, count in counts.items():
+        spread = cache.get(token)
+        if spread is None:
+            h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+            spread = cache[token] = sum(1 << (bit * SIMHASH_LANE) for bit in range(64) if h >> bit & 1)
+        total += count * spread
+    half = sum(counts.values())
+    mask = (1 << SIMHASH_LANE) - 1
+    return sum(1 << bit for bit in range(64) if (total >> (bit * SIMHASH_LANE) & mask) * 2 > half)
+
+
+def get_near_duplications(data, distance=3, body="html"):
+    """
+    Group the ffuf results whose responses are almost the same, like pages
+    that only differ by an echoed path or a timestamp. Only one
+    representative of each group is kept, with the references of the others.
+    data : List
+        ffuf results
+    distance : int
+        Maximum number of different simhash bits of two near duplicates
+    body : String
+        Field with the response body. Results without body are grouped by
+        status, words and lines.
+    """
+    groups = {}
+    cache = {}
+    for idx, result in enumerate(data):
+        text = result.get(body) or ""
+        if text:
+            key = (result.get("status"), "simhash")
+            fingerprint = simhash(re.findall(r"\w+", text.lower()), cache)
+        else:
+            key = (result.get("status"), result.get("words"), result.get("lines"))
+            fingerprint = 0
+        groups.setdefault(key, []).append((idx, fingerprint))
+
+    parent = list(range(len(data)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for members in groups.values():
+        # Identical fingerprints are grouped right away
+        distinct = {}
+        for idx, fingerprint in members:
+            if fingerprint in distinct:
+                parent[find(idx)] = find(distinct[fingerprint])
+            else:
+                distinct[fingerprint] = idx
+        # Candidates share one of the 4 bands of 16 bits, with a distance
+        # up to 3 two near duplicates always share at least one band
+        for band in range(4):
+            buckets = {}
+            for fingerprint in distinct:
+                buckets.setdefault(fingerprint >> (band * 16) & 0xFFFF, []).append(fingerprint)
+            for bucket in buckets.values():
+                for i, first in enumerate(bucket):
+                    for second in bucket[i + 1:]:
+                        if bin(first ^ second).count("1") <= distance:
+                            parent[find(distinct[second])] = find(distinct[first])
+
+    clusters = {}
+    for idx in range(len(data)):
+        clusters.setdefault(find(idx), []).append(idx)
+    new_data = []
+    with click.progressbar(sorted(clusters.values()), label="Grouping near duplicates...") as all_clusters:
+        for cluster in all_clusters:
+            representative = dict(data[cluster[0]])
+            if len(cluster) > 1:
+                representative["near_dups"] = {
+                    "count": len(cluster) - 1,
+                    "members": [
+                        {k: data[i].get(k) for k in NEAR_DUP_FIELDS if k in data[i]}
+                        for i in cluster[1:]]
+                }
+            new_data.append(representative)
+    return new_data
@@ -0,0 +1,95 @@
+import datetime
+import re
+
+
+# strftime format of the index suffix of each partition period
+PERIOD_FORMATS = {
+    "day": "%Y.%m.%d",
+    "week": "%G.w%V",
+    "month": "%Y.%m",
+}
+WRITE_SUFFIX = "-write"
+DURATION_UNITS = {
+    "m": "minutes",
+    "h": "hours",
+    "d": "days",
+    "w": "weeks",
+}
+
+
+def write_alias(project):
+    """
+    Alias of the partition that receives the new documents
+    """
+    return "{}{}".format(project, WRITE_SUFFIX)
+
+
+def partition_name(project, period, when=None):
+    """
+    Name of the partition index of the project that holds the given date.
+    Parameters
+    ----------
+    project : String
+        Project name, it is also the read alias
+    period : String
+        day, week or month
+    when : datetime
+        Now by default
+    """
+    when = when or datetime.datetime.now()
+    return "{}-{}".format(project, when.strftime(PERIOD_FORMATS[period]))
+
+
+def document_time(value):
+    """
+    Date of the time field of a document, None if it is not an ISO 8601 date
+    """
+    try:
+        return datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def partition_start(project, period, index):
+    """
+    Get the first day of a partition index, None if the index is not
+    a partition of the project.
+    """
+    prefix = "{}-".format(project)
+    if not index.startswith(prefix):
+        return None
+    suffix = index[len(prefix):]
+    try:
+        if period == "week":
+            # %G/%V can only be parsed with a weekday
+            return datetime.datetime.strptime("{}-1".format(suffix), "%G.w%V-%u")
+        return datetime.datetime.strptime(suffix, PERIOD_FORMATS[period])
+    except ValueError:
+        return None
+
+
+def partition_end(project, period, index):
+    """
+    Get the first day after a partition index.
+    """
+    start = partition_start(project, period, index)
+    if start is None:
+        return None
+    if period == "day":
+        return start + datetime.timedelta(days=1)
+    if period == "week":
+        return start + datetime.timedelta(weeks=1)
+    return (start.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+
+def parse_duration(duration):
+    """
+    Parse durations like 30m, 24h, 7d or 4w.
+    Returns
+    -------
+    timedelta
+    """
+    match = re.match(r"^(\d+)([mhdw])$", duration.strip())
+    if not match:
+        raise ValueError("Invalid duration {}. Use a number followed by m, h, d or w.".format(duration))
+    return datetime.timedelta(**{DURATION_UNITS[match.group(2)]: int(match.group(1))})
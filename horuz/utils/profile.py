@@ -0,0 +1,132 @@
+import time
+from contextlib import contextmanager
+
+from horuz.utils.style import new_table
+
+
+class Timings:
+    """
+    Wall time of the client side steps of a command, in seconds
+    """
+
+    def __init__(self):
+        self.steps = {}
+        self.response_bytes = 0
+
+    @contextmanager
+    def measure(self, step):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps[step] = self.steps.get(step, 0) + time.perf_counter() - start
+
+    def get(self, step):
+        return self.steps.get(step, 0)
+
+
+class TimedDeserializer:
+    """
+    Wraps the deserializer of the ES client to measure the decoding of the
+    responses apart from the network time
+    """
+
+    def __init__(self, deserializer, timings):
+        self.deserializer = deserializer
+        self.timings = timings
+
+    def loads(self, s, mimetype=None):
+        self.timings.response_bytes += len(s)
+        with self.timings.measure("decode"):
+            return self.deserializer.loads(s, mimetype)
+
+
+def instrument(hes, timings):
+    """
+    Measure the response decoding of the ES client of the project.
+    Backends without HTTP responses are not instrumented.
+    """
+    client = getattr(hes.es, "es", None)
+    transport = getattr(client, "transport", None)
+    if transport is None:
+        return False
+    transport.deserializer = TimedDeserializer(transport.deserializer, timings)
+    return True
+
+
+def _ms(nanos):
+    return "{:.2f}".format(nanos / 1e6)
+
+
+def _slowest_phase(breakdown):
+    phases = {k: v for k, v in breakdown.items() if not k.endswith("_count")}
+    if not phases:
+        return ""
+    phase = max(phases, key=phases.get)
+    return "{} ({} ms)".format(phase, _ms(phases[phase]))
+
+
+def profile_table(profile):
+    """
+    One row per shard with the query, rewrite and collector times of the
+    ES profile API and the slowest phase of the query
+    """
+    table = new_table()
+    for column in ("Shard", "Query", "Query ms", "Rewrite ms", "Collect ms", "Slowest phase"):
+        table.add_column(column, style="cyan")
+    for shard in profile.get("shards", []):
+        for search in shard.get("searches", []):
+            queries = search.get("query", [])
+            query_nanos = sum(q.get("time_in_nanos", 0) for q in queries)
+            collect_nanos = sum(c.get("time_in_nanos", 0) for c in search.get("collector", []))
+            breakdown = {}
+            for query in queries:
+                for phase, nanos in query.get("breakdown", {}).items():
+                    breakdown[phase] = breakdown.get(phase, 0) + nanos
+            table.add_row(
+                shard.get("id", ""),
+                ", ".join(sorted({q.get("type", "") for q in queries})),
+                _ms(query_nanos),
+                _ms(search.get("rewrite_time", 0)),
+                _ms(collect_nanos),
+                _slowest_phase(breakdown))
+    return table
+
+
+def print_profile(console, response, timings):
+    """
+    Print the server and client timings of a search
+    Parameters
+    ----------
+    console : Console
+        Where the report is printed, stderr to keep the results clean
+    response : Dict
+        Search response, with the profile when the backend supports it
+    timings : Timings
+        Client steps: request, decode, format and render
+    """
+    response = response or {}
+    took = response.get("took", 0) / 1000
+    request = timings.get("request")
+    decode = timings.get("decode")
+    shards = response.get("_shards", {})
+    total = response.get("hits", {}).get("total", {})
+    console.print("[bold]Server[/bold] took {:.0f} ms, shards {} total, {} successful, {} skipped, {} failed, hits {}{}".format(
+        took * 1000,
+        shards.get("total", "-"), shards.get("successful", "-"), shards.get("skipped", "-"), shards.get("failed", "-"),
+        total.get("value", "-"), "+" if total.get("relation") == "gte" else ""))
+    if response.get("profile"):
+        console.print(profile_table(response["profile"]))
+    client = new_table()
+    for column in ("Step", "ms"):
+        client.add_column(column, style="cyan")
+    client.add_row("server (took)", "{:.0f}".format(took * 1000))
+    if "decode" in timings.steps:
+        client.add_row("network", "{:.0f}".format(max(request - took - decode, 0) * 1000))
+        client.add_row("decode ({} KB)".format(timings.response_bytes // 1024), "{:.0f}".format(decode * 1000))
+    else:
+        client.add_row("request overhead", "{:.0f}".format(max(request - took, 0) * 1000))
+    for step in ("format", "render"):
+        if step in timings.steps:
+            client.add_row(step, "{:.0f}".format(timings.get(step) * 1000))
+    console.print(client)
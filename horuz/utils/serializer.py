@@ -0,0 +1,127 @@
+import datetime
+import decimal
+import json
+import uuid
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    """
+    Types without a JSON representation, dates are ISO 8601 like in the
+    ElasticSearch client serializer
+    """
+    if isinstance(value, (datetime.date, datetime.datetime, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError("Unable to serialize {!r} (type: {})".format(value, type(value)))
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumpb(data, sort_keys=False):
+        """
+        Encode to UTF-8 JSON bytes. orjson encodes the dates natively.
+        """
+        options = _OPTIONS
+        if sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(data, default=_default, option=options)
+
+    def loads(data):
+        return orjson.loads(data)
+else:
+    def dumpb(data, sort_keys=False):
+        """
+        Encode to UTF-8 JSON bytes with the standard library
+        """
+        return json.dumps(
+            data, default=_default, ensure_ascii=False, sort_keys=sort_keys,
+            separators=(",", ":")).encode("utf-8", "surrogatepass")
+
+    def loads(data):
+        return json.loads(data)
+
+
+def dumps(data, sort_keys=False):
+    """
+    Encode to a compact JSON string with the fastest codec installed. The
+    pretty printed output of the commands keeps using json.dumps.
+    Parameters
+    ----------
+    data : Object
+        Data to encode, dates are ISO 8601 strings
+    sort_keys : boolean
+        Sort the keys of the objects
+    """
+    return dumpb(data, sort_keys).decode("utf-8")
+
+
+def bulk_body(index, actions):
+    """
+    Build the NDJSON body of a bulk request. Every line is encoded once to
+    bytes and the body is joined in a single copy.
+    Parameters
+    ----------
+    index : String
+        Index name
+    actions : List
+        List of (id, record) tuples
+    Returns
+    -------
+    bytes
+        The body, ending with a newline
+    """
+    lines = []
+    for _id, record in actions:
+        lines.append(dumpb({"index": {"_index": index, "_id": _id}}))
+        lines.append(dumpb(record))
+    lines.append(b"")
+    return b"\n".join(lines)
+
+
+def bulk_upsert_body(index, updates, retry_on_conflict=3):
+    """
+    Build the NDJSON body of a bulk request of scripted upserts.
+    Parameters
+    ----------
+    index : String
+        Index name
+    updates : List
+        List of (id, script) tuples, the script runs on new documents too
+    Returns
+    -------
+    bytes
+        The body, ending with a newline
+    """
+    lines = []
+    for _id, script in updates:
+        lines.append(dumpb({"update": {"_index": index, "_id": _id, "retry_on_conflict": retry_on_conflict}}))
+        lines.append(dumpb({"scripted_upsert": True, "script": script, "upsert": {}}))
+    lines.append(b"")
+    return b"\n".join(lines)
+
+
+class ClientSerializer:
+    """
+    Serializer of the ElasticSearch client requests and responses
+    """
+    mimetype = "application/json"
+
+    def dumps(self, data):
+        # Bodies that are already encoded are sent as they are
+        if isinstance(data, (str, bytes)):
+            return data
+        return dumps(data)
+
+    def loads(self, s):
+        return loads(s)
@@ -0,0 +1,666 @@
+import datetime
+import fnmatch
+import itertools
+import json
+import os
+import re
+import sqlite3
+import statistics
+import threading
+import time
+
+from horuz.utils.storage import StorageAPI
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (name TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS docs (
+    rowid INTEGER PRIMARY KEY,
+    project TEXT NOT NULL,
+    id TEXT NOT NULL,
+    time TEXT,
+    doc TEXT NOT NULL,
+    UNIQUE (project, id)
+);
+CREATE INDEX IF NOT EXISTS docs_project_time ON docs (project, time);
+CREATE TABLE IF NOT EXISTS fields (
+    project TEXT NOT NULL,
+    path TEXT NOT NULL,
+    type TEXT NOT NULL,
+    PRIMARY KEY (project, path)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5 (text);
+"""
+ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}([T ][\d:.]+([+-]\d{2}:?\d{2}|Z)?)?$")
+FIELD = re.compile(r"([\w.@-]+):")
+WORD = re.compile(r"(?:\\.|[^\s()\"])+")
+TOKEN = re.compile(r"\w+")
+INTERVALS = {
+    "minute": "%Y-%m-%dT%H:%M:00",
+    "hour": "%Y-%m-%dT%H:00:00",
+    "day": "%Y-%m-%d",
+    "month": "%Y-%m-01",
+    "year": "%Y-01-01",
+}
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _leaves(value, prefix=""):
+    """
+    Yield the (path, value) leaves of a document
+    """
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _leaves(item, "{}{}.".format(prefix, key))
+    elif isinstance(value, list):
+        for item in value:
+            yield from _leaves(item, prefix)
+    elif value is not None:
+        yield prefix[:-1], value
+
+
+def _field_type(value):
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "long"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, str) and ISO_DATE.match(value):
+        return "date"
+    return "text"
+
+
+def _values(value):
+    """
+    Values of a json_extract result, arrays are returned as JSON text
+    """
+    if isinstance(value, str) and value[:1] == "[":
+        try:
+            return [v for v in json.loads(value) if v is not None]
+        except ValueError:
+            pass
+    return [value]
+
+
+def _tokens(value):
+    return TOKEN.findall(str(value).lower())
+
+
+def hz_match(value, term):
+    """
+    A term matches a keyword value or the words of a text value
+    """
+    if value is None:
+        return 0
+    term_tokens = _tokens(term)
+    for v in _values(value):
+        if str(v).lower() == str(term).lower():
+            return 1
+        tokens = _tokens(v)
+        n = len(term_tokens)
+        if n and any(tokens[i:i + n] == term_tokens for i in range(len(tokens) - n + 1)):
+            return 1
+    return 0
+
+
+def hz_wildcard(value, pattern):
+    """
+    A wildcard matches a whole keyword value or one of the words of a text value
+    """
+    if value is None:
+        return 0
+    pattern = pattern.lower()
+    for v in _values(value):
+        v = str(v).lower()
+        if fnmatch.fnmatchcase(v, pattern) or any(fnmatch.fnmatchcase(t, pattern) for t in _tokens(v)):
+            return 1
+    return 0
+
+
+def _compare(value, other):
+    try:
+        return (float(value) > float(other)) - (float(value) < float(other))
+    except (TypeError, ValueError):
+        value, other = str(value), str(other)
+        return (value > other) - (value < other)
+
+
+def hz_range(value, low, high, include_low, include_high):
+    if value is None:
+        return 0
+    for v in _values(value):
+        if low is not None and _compare(v, low) < (0 if include_low else 1):
+            continue
+        if high is not None and _compare(v, high) > (0 if include_high else -1):
+            continue
+        return 1
+    return 0
+
+
+def _text(doc):
+    return " ".join(str(v) for _, v in _leaves(doc))
+
+
+def hz_text(doc):
+    return _text(json.loads(doc))
+
+
+def _column(field):
+    """
+    SQL expression of a document field. The .keyword subfields of
+    ElasticSearch are the same field here.
+    """
+    if field == "_id":
+        return "d.id"
+    if field == "time":
+        return "d.time"
+    if field.endswith(".keyword"):
+        field = field[:-len(".keyword")]
+    if not re.match(r"^[\w.@-]+$", field):
+        raise ValueError("Unsupported field {}".format(field))
+    return "json_extract(d.doc, '$.\"{}\"')".format(field.replace(".", "\".\""))
+
+
+def _fts_phrase(text):
+    return '"{}"'.format(text.replace('"', '""'))
+
+
+class LuceneParser:
+    """
+    Parse the subset of the Lucene query syntax used with Horuz:
+    field:term, field:"phrase", wildcards, ranges, comparisons,
+    AND/OR/NOT, +/- and groups. Terms without field search all the text.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.pos = 0
+        self.field = None
+
+    def parse(self):
+        node = self.parse_or()
+        self.skip()
+        if self.pos < len(self.text):
+            raise ValueError("Unexpected '{}' in the query".format(self.text[self.pos:]))
+        return node
+
+    def skip(self):
+        while self.pos < len(self.text) and self.text[self.pos].isspace():
+            self.pos += 1
+
+    def accept(self, *operators):
+        self.skip()
+        for op in operators:
+            end = self.pos + len(op)
+            if self.text.startswith(op, self.pos):
+                if op.isalpha() and end < len(self.text) and not (self.text[end].isspace() or self.text[end] == "("):
+                    continue
+                self.pos = end
+                return True
+        return False
+
+    def at_end(self):
+        self.skip()
+        return self.pos >= len(self.text) or self.text[self.pos] == ")"
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while not self.at_end():
+            # The default operator of query_string is OR
+            self.accept("OR", "||")
+            nodes.append(self.parse_and())
+        return ("or", nodes) if len(nodes) > 1 else nodes[0]
+
+    def parse_and(self):
+        nodes = [self.parse_not()]
+        while self.accept("AND", "&&"):
+            nodes.append(self.parse_not())
+        return ("and", nodes) if len(nodes) > 1 else nodes[0]
+
+    def parse_not(self):
+        if self.accept("NOT", "!", "-"):
+            return ("not", self.parse_not())
+        self.accept("+")
+        return self.parse_primary()
+
+    def parse_primary(self):
+        self.skip()
+        if self.accept("("):
+            node = self.parse_or()
+            if not self.accept(")"):
+                raise ValueError("Missing ) in the query")
+            return node
+        match = FIELD.match(self.text, self.pos)
+        if match:
+            self.pos = match.end()
+            if self.accept("("):
+                # field:(a OR b) applies the field to the group
+                previous, self.field = self.field, match.group(1)
+                node = self.parse_or()
+                self.field = previous
+                if not self.accept(")"):
+                    raise ValueError("Missing ) in the query")
+                return node
+            return ("field", match.group(1), self.parse_value())
+        return ("field", self.field, self.parse_value())
+
+    def parse_value(self):
+        text = self.text
+        if self.pos >= len(text):
+            raise ValueError("Missing value in the query")
+        char = text[self.pos]
+        if char == '"':
+            end = self.pos + 1
+            while end < len(text) and text[end] != '"':
+                end += 2 if text[end] == "\\" else 1
+            value = text[self.pos + 1:end].replace('\\"', '"')
+            self.pos = end + 1
+            return ("phrase", value)
+        if char in "[{":
+            end = next((i for i in range(self.pos, len(text)) if text[i] in "]}"), -1)
+            if end == -1:
+                raise ValueError("Missing ] in the range")
+            parts = re.split(r"\s+TO\s+", text[self.pos + 1:end].strip())
+            if len(parts) != 2:
+                raise ValueError("Invalid range {}".format(text[self.pos:end + 1]))
+            low, high = [None if p == "*" else p.strip('"') for p in parts]
+            node = ("range", low, high, char == "[", text[end] == "]")
+            self.pos = end + 1
+            return node
+        for op in (">=", "<=", ">", "<"):
+            if text.startswith(op, self.pos):
+                self.pos += len(op)
+                value = self.parse_value()[1]
+                if op[0] == ">":
+                    return ("range", value, None, op == ">=", False)
+                return ("range", None, value, False, op == "<=")
+        match = WORD.match(text, self.pos)
+        if not match:
+            raise ValueError("Unexpected '{}' in the query".format(text[self.pos:]))
+        self.pos = match.end()
+        value = re.sub(r"\\(.)", r"\1", match.group(0))
+        if value == "*":
+            return ("all",)
+        if "*" in value or "?" in value:
+            return ("wildcard", value)
+        return ("term", value)
+
+
+def compile_lucene(node, params):
+    """
+    Translate a parsed Lucene query to a SQL condition over docs d
+    """
+    kind = node[0]
+    if kind in ("and", "or"):
+        return "({})".format(" {} ".format(kind.upper()).join(compile_lucene(n, params) for n in node[1]))
+    if kind == "not":
+        return "(NOT {})".format(compile_lucene(node[1], params))
+    field, value = node[1], node[2]
+    if not field:
+        # Full text search over all the fields
+        if value[0] == "all":
+            return "1"
+        if value[0] in ("term", "phrase"):
+            params.append(_fts_phrase(value[1]))
+            return "d.rowid IN (SELECT rowid FROM docs_fts WHERE docs_fts MATCH ?)"
+        if value[0] == "wildcard":
+            pattern = value[1]
+            if pattern.endswith("*") and not any(c in pattern[:-1] for c in "*?"):
+                params.append("{}*".format(_fts_phrase(pattern[:-1])))
+                return "d.rowid IN (SELECT rowid FROM docs_fts WHERE docs_fts MATCH ?)"
+            params.append(pattern)
+            return "hz_wildcard(hz_text(d.doc), ?)"
+        raise ValueError("Ranges need a field")
+    column = _column(field)
+    if value[0] == "all":
+        return "{} IS NOT NULL".format(column)
+    if value[0] in ("term", "phrase"):
+        params.append(value[1])
+        return "hz_match({}, ?)".format(column)
+    if value[0] == "wildcard":
+        params.append(value[1])
+        return "hz_wildcard({}, ?)".format(column)
+    params.extend(value[1:])
+    return "hz_range({}, ?, ?, ?, ?)".format(column)
+
+
+def compile_dsl(query, params):
+    """
+    Translate the subset of the ElasticSearch query DSL used by Horuz
+    """
+    if not query:
+        return "1"
+    (kind, spec), = query.items()
+    if kind == "match_all":
+        return "1"
+    if kind == "query_string":
+        return compile_lucene(LuceneParser(spec["query"]).parse(), params)
+    if kind == "ids":
+        params.extend(spec["values"])
+        return "d.id IN ({})".format(",".join("?" * len(spec["values"])))
+    if kind == "terms":
+        (field, values), = spec.items()
+        params.extend(values)
+        return "{} IN ({})".format(_column(field), ",".join("?" * len(values)))
+    if kind == "term":
+        (field, value), = spec.items()
+        params.append(value["value"] if isinstance(value, dict) else value)
+        return "{} = ?".format(_column(field))
+    if kind == "exists":
+        return "{} IS NOT NULL".format(_column(spec["field"]))
+    if kind == "range":
+        (field, bounds), = spec.items()
+        low = bounds.get("gte", bounds.get("gt"))
+        high = bounds.get("lte", bounds.get("lt"))
+        params.extend([low, high, "gte" in bounds, "lte" in bounds])
+        return "hz_range({}, ?, ?, ?, ?)".format(_column(field))
+    if kind == "bool":
+        conditions = []
+        for clause in ("must", "filter"):
+            for q in _as_list(spec.get(clause)):
+                conditions.append(compile_dsl(q, params))
+        should = [compile_dsl(q, params) for q in _as_list(spec.get("should"))]
+        if should:
+            conditions.append("({})".format(" OR ".join(should)))
+        for q in _as_list(spec.get("must_not")):
+            conditions.append("NOT {}".format(compile_dsl(q, params)))
+        return "({})".format(" AND ".join(conditions) or "1")
+    raise ValueError("Query {} is not supported by the sqlite backend".format(kind))
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _get_path(doc, path):
+    for key in path.split("."):
+        if not isinstance(doc, dict) or key not in doc:
+            return None
+        doc = doc[key]
+    return doc
+
+
+def _filter_source(doc, includes=None, excludes=None):
+    """
+    Apply the _source includes or excludes to a document
+    """
+    if includes:
+        filtered = {}
+        for field in includes:
+            if field.endswith(".keyword"):
+                field = field[:-len(".keyword")]
+            value = _get_path(doc, field)
+            if value is None:
+                continue
+            keys = field.split(".")
+            target = filtered
+            for key in keys[:-1]:
+                target = target.setdefault(key, {})
+            target[keys[-1]] = value
+        return filtered
+    for field in excludes or []:
+        keys = field.split(".")
+        target = _get_path(doc, ".".join(keys[:-1])) if len(keys) > 1 else doc
+        if isinstance(target, dict):
+            target.pop(keys[-1], None)
+    return doc
+
+
+class SQLiteAPI(StorageAPI):
+    """
+    Embedded storage in a local SQLite database, for laptops or offline use.
+    Supports collect, search, sessions, stats, delete and describe.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path, ctx):
+        """
+        Parameters
+        ----------
+        path : string
+            Database file
+        ctx : Environment Class
+            cli env class
+        """
+        self.ctx = ctx
+        self.path = os.path.expanduser(path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.db.create_function("hz_match", 2, hz_match, deterministic=True)
+        self.db.create_function("hz_wildcard", 2, hz_wildcard, deterministic=True)
+        self.db.create_function("hz_range", 5, hz_range, deterministic=True)
+        self.db.create_function("hz_text", 1, hz_text, deterministic=True)
+        self.lock = threading.Lock()
+        self.tasks = {}
+
+    def create_index(self, name, mappings=None):
+        with self.lock, self.db:
+            self.db.execute("INSERT OR IGNORE INTO projects (name) VALUES (?)", (name,))
+        return True
+
+    def delete_index(self, index):
+        projects = index.split(",")
+        marks = ",".join("?" * len(projects))
+        with self.lock, self.db:
+            self.db.execute(
+                "DELETE FROM docs_fts WHERE rowid IN (SELECT rowid FROM docs WHERE project IN ({}))".format(marks),
+                projects)
+            for table, column in (("docs", "project"), ("fields", "project"), ("projects", "name")):
+                self.db.execute("DELETE FROM {} WHERE {} IN ({})".format(table, column, marks), projects)
+        return True
+
+    def save_in_index(self, index, record):
+        _id = record.get("_id") or os.urandom(10).hex()
+        if self.save_bulk(index, [(_id, record)]):
+            return {"_id": _id, "result": "created"}
+        return False
+
+    def save_bulk(self, index, actions, created=None):
+        rows = []
+        fields = {}
+        for _id, record in actions:
+            doc = json.dumps(record, default=_json_default)
+            # Values as they are stored, dates as strings
+            stored = json.loads(doc)
+            for path, value in _leaves(stored):
+                fields.setdefault(path, _field_type(value))
+            rows.append((index, _id, stored.get("time"), doc, _text(stored)))
+        with self.lock, self.db:
+            self.db.execute("INSERT OR IGNORE INTO projects (name) VALUES (?)", (index,))
+            for project, _id, doc_time, doc, text in rows:
+                old = self.db.execute(
+                    "SELECT rowid FROM docs WHERE project = ? AND id = ?", (project, _id)).fetchone()
+                if old:
+                    self.db.execute("DELETE FROM docs_fts WHERE rowid = ?", old)
+                    self.db.execute("DELETE FROM docs WHERE rowid = ?", old)
+                elif created is not None:
+                    created.append(_id)
+                rowid = self.db.execute(
+                    "INSERT INTO docs (project, id, time, doc) VALUES (?, ?, ?, ?)",
+                    (project, _id, doc_time, doc)).lastrowid
+                self.db.execute("INSERT INTO docs_fts (rowid, text) VALUES (?, ?)", (rowid, text))
+            self.db.executemany(
+                "INSERT OR IGNORE INTO fields (project, path, type) VALUES (?, ?, ?)",
+                [(index, path, field_type) for path, field_type in fields.items()])
+        return True
+
+    def get_all_indexes(self):
+        return {row[0]: {"aliases": {}} for row in self.db.execute("SELECT name FROM projects")}
+
+    def get_index_mapping(self, index):
+        """
+        Mapping in the ElasticSearch format, text fields have a keyword
+        subfield like the ElasticSearch dynamic mapping.
+        """
+        properties = {}
+        rows = self.db.execute("SELECT path, type FROM fields WHERE project = ? ORDER BY path", (index,))
+        for path, field_type in rows:
+            keys = path.split(".")
+            target = properties
+            for key in keys[:-1]:
+                target = target.setdefault(key, {"properties": {}}).setdefault("properties", {})
+            spec = {"type": field_type}
+            if field_type == "text":
+                spec["fields"] = {"keyword": {"type": "keyword", "ignore_above": 256}}
+            target[keys[-1]] = spec
+        if not properties and index not in self.get_all_indexes():
+            return None
+        return {index: {"mappings": {"properties": properties}}}
+
+    def _select(self, index, condition, params, columns="d.id, d.doc", order=None, size=None):
+        sql = "SELECT {} FROM docs d WHERE d.project = ? AND {}".format(columns, condition)
+        params = [index] + params
+        if order:
+            field, _, direction = order.partition(":")
+            sql += " ORDER BY {} {}".format(_column(field), "ASC" if direction == "asc" else "DESC")
+        if size is not None:
+            sql += " LIMIT ?"
+            params.append(size)
+        return self.db.execute(sql, params)
+
+    def _hits(self, index, rows, includes=None, excludes=None):
+        return [
+            {"_index": index, "_id": _id, "_source": _filter_source(json.loads(doc), includes, excludes)}
+            for _id, doc in rows]
+
+    def query(self, index, term, size=100, order="time:desc", raw=False, fields=[],
+              excludes=[], docvalue_fields=[], profile=False):
+        started = time.time()
+        try:
+            params = []
+            if raw:
+                body = json.loads(term) if isinstance(term, str) else term
+                condition = compile_dsl(body.get("query"), params)
+                size = body.get("size", 10)
+                includes = body.get("_source") if isinstance(body.get("_source"), list) else None
+            else:
+                if not term:
+                    return None
+                condition = compile_lucene(LuceneParser(term).parse(), params)
+                includes = None
+                if fields is False:
+                    includes = ["_id"]
+                elif fields or docvalue_fields:
+                    includes = list(fields or []) + list(docvalue_fields or [])
+            total = self._select(index, condition, list(params), "COUNT(*)").fetchone()[0]
+            rows = self._select(index, condition, list(params), order=None if raw else order, size=size)
+            response = {
+                "took": int((time.time() - started) * 1000),
+                "hits": {
+                    "total": {"value": total, "relation": "eq"},
+                    "hits": self._hits(index, rows, includes, None if includes else excludes)
+                }
+            }
+            if raw and body.get("aggs"):
+                response["aggregations"] = {
+                    name: self._aggregate(index, condition, params, agg)
+                    for name, agg in body["aggs"].items()}
+            return response
+        except (ValueError, sqlite3.Error) as e:
+            self.ctx.vlog("Query Error {}".format(e))
+
+    def _aggregate(self, index, condition, params, agg):
+        (kind, spec), = ((k, v) for k, v in agg.items() if k != "aggs")
+        column = _column(spec["field"])
+        values = "SELECT {} AS v FROM docs d WHERE d.project = ? AND {}".format(column, condition)
+        params = [index] + list(params)
+        if kind == "terms":
+            rows = self.db.execute(
+                "SELECT v, COUNT(*) FROM ({}) WHERE v IS NOT NULL GROUP BY v ORDER BY 2 DESC, 1 LIMIT ?".format(values),
+                params + [spec.get("size", 10)]).fetchall()
+            total = self.db.execute(
+                "SELECT COUNT(v) FROM ({})".format(values), params).fetchone()[0]
+            return {
+                "sum_other_doc_count": total - sum(c for _, c in rows),
+                "buckets": [{"key": k, "doc_count": c} for k, c in rows]}
+        if kind == "cardinality":
+            return {"value": self.db.execute(
+                "SELECT COUNT(DISTINCT v) FROM ({})".format(values), params).fetchone()[0]}
+        rows = [v for v, in self.db.execute("{} AND {} IS NOT NULL".format(values, column), params)]
+        if kind == "date_histogram":
+            interval = spec.get("calendar_interval", "day")
+            counts = {}
+            for v in rows:
+                when = datetime.datetime.fromisoformat(str(v).replace("Z", "+00:00"))
+                if interval == "week":
+                    key = (when - datetime.timedelta(days=when.weekday())).strftime("%Y-%m-%d")
+                else:
+                    key = when.strftime(INTERVALS[interval])
+                counts[key] = counts.get(key, 0) + 1
+            return {"buckets": [{"key_as_string": k, "doc_count": c} for k, c in sorted(counts.items())]}
+        if kind == "percentiles":
+            numbers = sorted(float(v) for v in rows)
+            percents = spec.get("percents", [1, 5, 25, 50, 75, 95, 99])
+            if len(numbers) < 2:
+                return {"values": {str(float(p)): (numbers[0] if numbers else None) for p in percents}}
+            quantiles = statistics.quantiles(numbers, n=100, method="inclusive")
+            return {"values": {
+                str(float(p)): (numbers[0] if p <= 0 else numbers[-1] if p >= 100 else quantiles[int(p) - 1])
+                for p in percents}}
+        raise ValueError("Aggregation {} is not supported by the sqlite backend".format(kind))
+
+    def count(self, index, term):
+        try:
+            params = []
+            condition = compile_lucene(LuceneParser(term).parse(), params)
+            return self._select(index, condition, params, "COUNT(*)").fetchone()[0]
+        except (ValueError, sqlite3.Error) as e:
+            self.ctx.vlog("Count Error {}".format(e))
+
+    def get_documents(self, index, ids, fields=[], multi_index=False):
+        docs = []
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows = self._select(index, "d.id IN ({})".format(",".join("?" * len(chunk))), list(chunk))
+            docs.extend(self._hits(index, rows, fields or None))
+        return docs
+
+    def delete_by_query(self, index, query, slices="auto", requests_per_second=None):
+        """
+        Deletes run right away, the task is only kept to report the result
+        """
+        params = []
+        condition = compile_dsl(query, params)
+        rows = "SELECT d.rowid FROM docs d WHERE d.project = ? AND {}".format(condition)
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM docs_fts WHERE rowid IN ({})".format(rows), [index] + params)
+            deleted = self.db.execute(
+                "DELETE FROM docs WHERE rowid IN ({})".format(rows), [index] + params).rowcount
+        task_id = "sqlite:{}".format(next(_task_ids))
+        status = {"total": deleted, "deleted": deleted}
+        self.tasks[task_id] = {
+            "completed": True,
+            "task": {"status": status, "action": "indices:data/write/delete/byquery"},
+            "response": dict(status, failures=[])}
+        return task_id
+
+    def get_task(self, task_id):
+        return self.tasks[task_id]
+
+    def cancel_task(self, task_id):
+        raise ValueError("Task {} already finished".format(task_id))
+
+    def list_tasks(self, actions="*byquery,*reindex"):
+        return {}
+
+    def connected(self):
+        try:
+            self.db.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+
+_task_ids = itertools.count(1)
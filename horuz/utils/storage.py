@@ -0,0 +1,133 @@
+class StorageAPI:
+    """
+    Storage interface used by HoruzES. ElasticSearchAPI is the default
+    backend, SQLiteAPI stores the projects in a local file.
+    Operations a backend does not support raise NotImplementedError.
+    """
+
+    name = "storage"
+    # Features that need more than the operations of this interface
+    features = frozenset()
+    # Longest value of the keyword subfields of the dynamic mapping, None
+    # when the values are indexed whatever their length
+    keyword_limit = None
+
+    def _unsupported(self, operation):
+        raise NotImplementedError("{} is not supported by the {} backend".format(operation, self.name))
+
+    def require(self, feature):
+        """
+        Raise NotImplementedError when the backend lacks the feature
+        """
+        if feature not in self.features:
+            self._unsupported(feature)
+
+    @property
+    def batch_size(self):
+        """
+        Records per bulk request
+        """
+        return 500
+
+    def create_index(self, name, mappings=None):
+        self._unsupported("Create project")
+
+    def put_mapping(self, index, properties):
+        """
+        Backends with dynamic fields ignore the explicit mappings
+        """
+        return True
+
+    def delete_index(self, index):
+        self._unsupported("Delete project")
+
+    def save_in_index(self, index, record):
+        self._unsupported("Save")
+
+    def save_bulk(self, index, actions, created=None):
+        self._unsupported("Bulk save")
+
+    def delete_document(self, index, doc_id):
+        self._unsupported("Delete document")
+
+    def search(self, index, body):
+        return self.query(index, body, raw=True)
+
+    def msearch(self, index, bodies):
+        self._unsupported("Multi search")
+
+    def create_percolator(self, index, properties, meta=None):
+        self._unsupported("Watches")
+
+    def percolate(self, index, documents, size=1000):
+        self._unsupported("Watches")
+
+    def upsert_bulk(self, index, updates):
+        self._unsupported("Scripted upserts")
+
+    def get_all_indexes(self):
+        self._unsupported("List projects")
+
+    def get_index_mapping(self, index):
+        self._unsupported("Mapping")
+
+    def query(self, index, term, size=100, order="time:desc", raw=False, fields=[],
+              excludes=[], docvalue_fields=[], profile=False):
+        self._unsupported("Query")
+
+    def count(self, index, term):
+        self._unsupported("Count")
+
+    def get_documents(self, index, ids, fields=[], multi_index=False):
+        self._unsupported("Get documents")
+
+    def delete_by_query(self, index, query, slices="auto", requests_per_second=None):
+        self._unsupported("Delete by query")
+
+    def update_by_query(self, index, query, script, slices="auto", requests_per_second=None):
+        self._unsupported("Update by query")
+
+    def reindex(self, source, dest, query, script=None, slices="auto", requests_per_second=None):
+        self._unsupported("Reindex")
+
+    def get_task(self, task_id):
+        self._unsupported("Tasks")
+
+    def cancel_task(self, task_id):
+        self._unsupported("Tasks")
+
+    def list_tasks(self, actions="*byquery,*reindex"):
+        self._unsupported("Tasks")
+
+    def get_alias_indexes(self, alias):
+        """
+        Backends without aliases have no partitioned projects
+        """
+        return []
+
+    def get_index_meta(self, index):
+        return {}
+
+    def create_partition(self, index, project, period, properties=None):
+        self._unsupported("Partitioned projects")
+
+    def move_alias(self, alias, index):
+        self._unsupported("Partitioned projects")
+
+    def open_pit(self, index, keep_alive=None):
+        self._unsupported("Point in time reads")
+
+    def close_pit(self, pit_id):
+        self._unsupported("Point in time reads")
+
+    def scan(self, pit_id, query=None, slice_id=None, slices=None, size=None,
+             source=True, docvalue_fields=None):
+        self._unsupported("Point in time reads")
+
+    def refresh(self, index):
+        """
+        Make the last changes searchable, they already are without a refresh interval
+        """
+
+    def connected(self):
+        return False
@@ -4,4 +4,13 @@ from rich.table import Table
 
 
 rconsole = Console()
+# Diagnostics that must not mix with the results, like --profile
+rconsole_err = Console(stderr=True)
 rtable = Table(box=box.ROUNDED)
+
+
+def new_table():
+    """
+    Used when a command prints more than one table
+    """
+    return Table(box=box.ROUNDED)
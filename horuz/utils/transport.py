@@ -0,0 +1,174 @@
+import random
+import threading
+import time
+
+from elasticsearch.exceptions import ConnectionError, ConnectionTimeout, TransportError
+
+from horuz.utils.serializer import bulk_body
+
+
+# HTTP status codes of an overloaded cluster, the request can be sent again
+RETRY_STATUS = (429, 502, 503, 504)
+
+
+class BulkTransport:
+    """
+    Send requests to ES retrying with exponential backoff when the cluster
+    is overloaded, adapting the bulk size to the observed latency and
+    limiting the upload throughput.
+    """
+
+    def __init__(self, es, ctx, batch_size=500, min_batch_size=10, max_batch_size=5000,
+                 max_retries=6, backoff=0.5, target_latency=2.0, max_docs_rate=None,
+                 max_bytes_rate=None):
+        """
+        Parameters
+        ----------
+        es : Elasticsearch
+            ElasticSearch client
+        ctx : Environment Class
+            cli env class
+        batch_size : int
+            Initial number of records per bulk request
+        min_batch_size, max_batch_size : int
+            Bounds of the adaptive batch size
+        max_retries : int
+            Attempts before giving up on a request
+        backoff : float
+            Seconds to wait before the first retry, doubled on each attempt
+        target_latency : float
+            Bulk latency in seconds the batch size is adapted to
+        max_docs_rate : float
+            Optional documents per second limit
+        max_bytes_rate : float
+            Optional bytes per second limit
+        """
+        self.es = es
+        self.ctx = ctx
+        self.batch_size = batch_size
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max(max_batch_size, batch_size)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.target_latency = target_latency
+        self.max_docs_rate = max_docs_rate
+        self.max_bytes_rate = max_bytes_rate
+        self._next_send = 0
+        # The batch size and the rate limit are shared by the threads of
+        # the parallel exports and imports
+        self._lock = threading.Lock()
+
+    def _is_retryable(self, error):
+        if isinstance(error, (ConnectionError, ConnectionTimeout)):
+            return True
+        return isinstance(error, TransportError) and error.status_code in RETRY_STATUS
+
+    def _wait(self, attempt):
+        """
+        Exponential backoff with jitter, so many collectors do not hit the
+        cluster again at the same time.
+        """
+        delay = self.backoff * (2 ** attempt)
+        time.sleep(delay + random.uniform(0, delay / 2))
+
+    def _throttle(self, docs, size):
+        """
+        Keep the upload under the docs/sec and bytes/sec limits.
+        """
+        interval = 0
+        if self.max_docs_rate:
+            interval = max(interval, docs / self.max_docs_rate)
+        if self.max_bytes_rate:
+            interval = max(interval, size / self.max_bytes_rate)
+        # Every request books its own slot, the waits happen outside the lock
+        with self._lock:
+            now = time.time()
+            wait = max(self._next_send - now, 0)
+            self._next_send = now + wait + interval
+        if wait:
+            time.sleep(wait)
+
+    def _adapt(self, latency, rejected):
+        """
+        Halve the batch size on rejections or slow responses and grow it
+        slowly while the cluster keeps up.
+        """
+        with self._lock:
+            if rejected or latency > self.target_latency:
+                self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+            elif latency < self.target_latency / 2:
+                self.batch_size = min(self.max_batch_size, int(self.batch_size * 1.25) + 1)
+            batch_size = self.batch_size
+        self.ctx.vlog("Bulk latency {:.2f}s, batch size {}".format(latency, batch_size))
+
+    def call(self, method, *args, **kwargs):
+        """
+        Call an ES client method retrying while the cluster is overloaded.
+        The last error is raised when all the attempts fail. Only idempotent
+        calls can be retried, a timed out request may have been applied.
+        """
+        attempt = 0
+        while True:
+            try:
+                return method(*args, **kwargs)
+            except TransportError as e:
+                if not self._is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                self.ctx.vlog("Retrying after error {}".format(e))
+            self._wait(attempt)
+            attempt += 1
+
+    def bulk(self, index, actions, created=None):
+        """
+        Index the actions, sending again only the rejected documents.
+        Parameters
+        ----------
+        index : String
+            Index Name
+        actions : List
+            List of (id, record) tuples
+        created : List
+            The ids of the new documents are added to it, the replaced
+            documents are not
+        Returns
+        -------
+        boolean
+            True only if every document was acknowledged
+        """
+        pending = list(actions)
+        attempt = 0
+        while pending:
+            body = bulk_body(index, pending)
+            self._throttle(len(pending), len(body))
+            started = time.time()
+            try:
+                response = self.es.bulk(body=body)
+            except TransportError as e:
+                if not self._is_retryable(e):
+                    raise
+                self.ctx.vlog("Bulk error {}".format(e))
+                self._adapt(time.time() - started, rejected=True)
+            else:
+                rejected = []
+                for action, item in zip(pending, response["items"]):
+                    result = item["index"]
+                    if "error" not in result:
+                        if created is not None and result.get("result") == "created":
+                            created.append(action[0])
+                        continue
+                    if result.get("status") in RETRY_STATUS:
+                        rejected.append(action)
+                    else:
+                        self.ctx.log("Document {} was not saved: {}".format(action[0], result["error"]))
+                        return False
+                self._adapt(time.time() - started, rejected=bool(rejected))
+                pending = rejected
+                if not pending:
+                    return True
+                self.ctx.vlog("{} documents rejected, retrying".format(len(pending)))
+            if attempt >= self.max_retries:
+                self.ctx.log("Giving up after {} retries".format(attempt))
+                return False
+            self._wait(attempt)
+            attempt += 1
+        return True
@@ -0,0 +1,116 @@
+import os
+import time
+
+from horuz.utils.files import collect
+
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+
+# Longest wait before collecting again a file that failed
+MAX_RETRY_DELAY = 300
+
+
+class DirectoryWatcher:
+    """
+    Yield the files of a directory as they are completed. Uses inotify when
+    inotify_simple is installed, otherwise the directory is polled and a file
+    is complete when its size and mtime did not change for one interval.
+    The files whose collect failed are given back with retry().
+    """
+
+    def __init__(self, path, suffix=".json", interval=2.0):
+        """
+        Parameters
+        ----------
+        path : String
+            Directory to watch, subdirectories included
+        suffix : String
+            Only the files with this suffix are yielded
+        interval : float
+            Seconds between polls
+        """
+        self.path = path
+        self.suffix = suffix
+        self.interval = interval
+        self._failures = {}
+        self._retries = {}
+
+    def __iter__(self):
+        if inotify_simple is not None:
+            # Watching before listing, the files created in between are not missed
+            inotify, watches = self._add_watches()
+            yield from sorted(collect(path=self.path, suffix=self.suffix))
+            yield from self._inotify(inotify, watches)
+        else:
+            # The files that were already there, they are the first poll
+            seen = {p: self._signature(p) for p in collect(path=self.path, suffix=self.suffix)}
+            yield from sorted(seen)
+            yield from self._poll(seen)
+
+    def retry(self, path):
+        """
+        Yield the file again later, waiting longer after each failure
+        """
+        failures = self._failures[path] = self._failures.get(path, 0) + 1
+        self._retries[path] = time.monotonic() + min(self.interval * 2 ** failures, MAX_RETRY_DELAY)
+
+    def _due_retries(self):
+        now = time.monotonic()
+        for path, when in sorted(self._retries.items()):
+            if when <= now:
+                del self._retries[path]
+                yield path
+
+    def _signature(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_size, stat.st_mtime)
+
+    def _poll(self, seen):
+        ready = dict(seen)
+        while True:
+            time.sleep(self.interval)
+            current = {p: self._signature(p) for p in collect(path=self.path, suffix=self.suffix)}
+            for path, signature in sorted(current.items()):
+                # Stable since the last poll and not yielded in this version
+                if signature and signature == seen.get(path) and ready.get(path) != signature:
+                    ready[path] = signature
+                    self._retries.pop(path, None)
+                    yield path
+            seen = current
+            yield from self._due_retries()
+
+    def _add_watches(self):
+        inotify = inotify_simple.INotify()
+        watches = {}
+        for directory, _, _ in os.walk(self.path):
+            watches[inotify.add_watch(directory, self._mask())] = directory
+        return inotify, watches
+
+    def _mask(self):
+        flags = inotify_simple.flags
+        return flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE
+
+    def _inotify(self, inotify, watches):
+        flags = inotify_simple.flags
+        while True:
+            for event in inotify.read(timeout=int(self.interval * 1000)):
+                directory = watches.get(event.wd)
+                if directory is None:
+                    continue
+                path = os.path.join(directory, event.name)
+                if event.mask & flags.ISDIR:
+                    if event.mask & (flags.CREATE | flags.MOVED_TO):
+                        watches[inotify.add_watch(path, self._mask())] = path
+                        yield from sorted(collect(path=path, suffix=self.suffix))
+                    continue
+                # Files are complete when the writer closes them or they are moved in
+                if event.mask & (flags.CLOSE_WRITE | flags.MOVED_TO) and path.endswith(self.suffix):
+                    self._retries.pop(path, None)
+                    yield path
+            yield from self._due_retries()
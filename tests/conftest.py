@@ -0,0 +1,30 @@
+import os
+import tempfile
+import uuid
+
+import pytest
+
+# The state files of horuz are kept in ~/.horuz, the tests never touch the real ones
+os.environ["HOME"] = tempfile.mkdtemp(prefix="horuz-tests-")
+
+from horuz.cli import Environment  # noqa: E402
+from horuz.utils.es import HoruzES  # noqa: E402
+
+
+@pytest.fixture
+def ctx(tmp_path):
+    """
+    Command environment using an embedded SQLite storage
+    """
+    env = Environment()
+    env.config = {
+        "elasticsearch_address": "sqlite://{}".format(tmp_path / "horuz.db"),
+        "elasticsearch": {},
+    }
+    return env
+
+
+@pytest.fixture
+def hes(ctx):
+    # The field catalogs are cached by project name, every test has its own
+    return HoruzES("example-{}.com".format(uuid.uuid4().hex[:8]), ctx)
@@ -0,0 +1,37 @@
+from horuz.utils import agent
+from horuz.utils.agent import HoruzAgent, client_options
+
+
+def test_project_is_reused_until_it_expires(ctx, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(agent.time, "monotonic", lambda: now[0])
+    horuz_agent = HoruzAgent(ctx)
+    hes = horuz_agent.project("example.com")
+    assert horuz_agent.project("example.com") is hes
+    now[0] += agent.PROJECT_TTL
+    # The write alias, the layout and the mapping are read again
+    assert horuz_agent.project("example.com") is not hes
+
+
+def test_project_uses_the_options_of_the_client(ctx):
+    horuz_agent = HoruzAgent(ctx)
+    options = dict(client_options(ctx), ingest={"batch_size": 50})
+    hes = horuz_agent.project("example.com", options)
+    assert hes.ctx.config["ingest"] == {"batch_size": 50}
+    assert horuz_agent.project("example.com", options) is hes
+    # The agent keeps its own options
+    assert "ingest" not in horuz_agent.project("example.com").ctx.config
+
+
+def test_finished_jobs_are_forgotten(ctx, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(agent.time, "time", lambda: now[0])
+    horuz_agent = HoruzAgent(ctx)
+    request = {"project": "example.com", "session": "s1", "files": ["a.json"]}
+    done = horuz_agent._new_job(request)
+    horuz_agent._finish(done, True)
+    running = horuz_agent._new_job(request)
+    now[0] += agent.JOB_TTL + 1
+    jobs = horuz_agent.dispatch({"op": "jobs"})["jobs"]
+    # Running jobs are kept whatever their age
+    assert [job["id"] for job in jobs] == [running["id"]]
@@ -0,0 +1,85 @@
+import math
+
+import pytest
+
+from horuz.utils.anomalies import ResponseMetrics, _surprise, _zscores, score, top_anomalies
+
+
+def metrics_of(responses):
+    """
+    ResponseMetrics of (host, status, length, words, lines) tuples, the ids are their positions
+    """
+    metrics = ResponseMetrics()
+    for position, (host, status, length, words, lines) in enumerate(responses):
+        metrics.append(str(position), host, status, {"length": length, "words": words, "lines": lines})
+    return metrics
+
+
+def test_columns_store_the_hosts_once():
+    metrics = metrics_of([("a", 200, 10, 1, 1), ("b", 404, 20, 2, 2), ("a", 200, 30, 3, 3)])
+    assert len(metrics) == 3
+    assert metrics.hosts == ["a", "b"]
+    assert list(metrics.host) == [0, 1, 0]
+    assert list(metrics.columns["length"]) == [10, 20, 30]
+
+
+def test_zscores():
+    assert _zscores([5, 5, 5]) == [0.0, 0.0, 0.0]
+    assert _zscores([1, 3]) == pytest.approx([1.0, 1.0])
+
+
+def test_surprise():
+    counts = {"common": 3, "rare": 1}
+    assert _surprise(counts, ["common", "rare"], 4) == pytest.approx([math.log2(4 / 3), 2.0])
+
+
+def test_identical_responses_are_not_anomalous():
+    metrics = metrics_of([("a", 404, 100, 10, 5)] * 5)
+    assert all(value == 0 and not reasons for value, _, reasons in score(metrics))
+
+
+def test_outlier_length_ranks_first():
+    responses = [("a", 404, 1000 + i, 50, 10) for i in range(50)] + [("a", 200, 9000, 700, 90)]
+    top = top_anomalies(metrics_of(responses), top=3)
+    assert [a["_id"] for a in top][0] == "50"
+    assert top[0]["length"] == 9000 and top[0]["status"] == 200
+    assert any(r.startswith("length z=") or r.startswith("words z=") for r in top[0]["reasons"])
+    assert any(r.startswith("length 9000-9099 1/51") for r in top[0]["reasons"])
+    assert top[0]["score"] > top[1]["score"]
+
+
+def test_unusual_status_at_a_usual_length():
+    responses = [("a", 404, 1000, 50, 10)] * 200 + [("a", 200, 1000, 50, 10)]
+    top = top_anomalies(metrics_of(responses), top=1)
+    assert top[0]["_id"] == "200"
+    assert top[0]["reasons"] == ["status 200 at this length 1/201"]
+
+
+def test_hosts_are_scored_separately():
+    # 5000 bytes is usual for b, but not for a
+    responses = [("a", 200, 100, 5, 1)] * 30 + [("b", 200, 5000, 5, 1)] * 30 + [("a", 200, 5000, 5, 1)]
+    top = top_anomalies(metrics_of(responses), top=1)
+    assert top[0]["_id"] == "60"
+    assert top[0]["host"] == "a"
+
+
+def test_hosts_with_one_response_are_skipped():
+    metrics = metrics_of([("a", 200, 100, 5, 1), ("b", 200, 100, 5, 1), ("b", 200, 100, 5, 1)])
+    assert sorted(position for _, position, _ in score(metrics)) == [1, 2]
+
+
+def test_bucket_width():
+    responses = [("a", 404, 1000, 50, 10)] * 100 + [("a", 404, 1040, 50, 10)]
+    # Same bucket of 100 bytes, different buckets of 10 bytes
+    assert top_anomalies(metrics_of(responses), top=1, bucket=100)[0]["reasons"] == ["length z=10.0"]
+    assert top_anomalies(metrics_of(responses), top=1, bucket=10)[0]["reasons"] == [
+        "length z=10.0", "length 1040-1049 1/101"]
+
+
+def test_doc_values_of_other_types():
+    metrics = metrics_of([("a", "200", 10.0, "1", 1), ("a", 404.0, "20.5", 2, 2), ("b", 200, "none", 3, 3)])
+    assert len(metrics) == 2
+    assert list(metrics.status) == [200, 404]
+    assert list(metrics.columns["length"]) == [10, 20]
+    assert list(metrics.columns["words"]) == [1, 2]
+    assert metrics.hosts == ["a"]
@@ -0,0 +1,31 @@
+from horuz.utils.catalog import catalog_from_mapping, infix_term
+from horuz.utils.es import BODY_INDEX_PROPERTIES, DEFAULT_EXCLUDES
+
+BODY = {"mappings": {"properties": {"html": {"type": "text", "fields": {"infix": {"type": "wildcard"}}}}}}
+PLAIN = {"mappings": {"properties": {"html": {"type": "text", "fields": {"keyword": {"type": "keyword"}}}}}}
+
+
+def test_infix_is_used_when_every_index_has_it():
+    catalog = catalog_from_mapping({"p-2021.01": BODY, "p-2021.02": BODY})
+    assert infix_term("html:*AKIA*", catalog) == "html.infix:*AKIA*"
+
+
+def test_infix_is_not_used_when_an_index_lacks_it():
+    catalog = catalog_from_mapping({"p-2021.01": PLAIN, "p-2021.02": BODY})
+    assert "html.infix" not in catalog
+    assert catalog["html.keyword"]["aggregatable"]
+    assert infix_term("html:*AKIA*", catalog) == "html:*AKIA*"
+
+
+def test_add_body_index_backfills_the_existing_documents(hes, monkeypatch):
+    calls = []
+    monkeypatch.setattr(hes.es, "put_mapping", lambda index, properties: calls.append((index, properties)) or True)
+    monkeypatch.setattr(
+        hes.es, "update_by_query",
+        lambda index, query, script, slices, rps: calls.append((index, query, script)) or "task:1")
+    assert hes.add_body_index() == "task:1"
+    # The read alias or index, never only the write index
+    assert calls[0] == (hes.domain, BODY_INDEX_PROPERTIES)
+    index, query, script = calls[1]
+    assert index == hes.domain and script is None
+    assert [c["exists"]["field"] for c in query["bool"]["should"]] == DEFAULT_EXCLUDES
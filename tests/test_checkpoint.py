@@ -0,0 +1,92 @@
+import json
+import os
+
+from horuz.utils.checkpoint import (
+    clear_checkpoint, find_checkpoint_session, is_ingested, load_checkpoint, mark_ingested, save_checkpoint)
+from horuz.utils.sqlite import SQLiteAPI
+
+
+def write_records(path, count):
+    path.write_text(json.dumps([{"host": "https://{}.example.com".format(i), "status": 200} for i in range(count)]))
+    return str(path)
+
+
+def test_checkpoint_roundtrip(tmp_path):
+    source = write_records(tmp_path / "data.json", 3)
+    assert load_checkpoint(source, "s1") == 0
+    save_checkpoint(source, "s1", 2)
+    assert load_checkpoint(source, "s1") == 2
+    # Other sessions of the same file have their own offset
+    assert load_checkpoint(source, "s2") == 0
+    clear_checkpoint(source, "s1")
+    assert load_checkpoint(source, "s1") == 0
+
+
+def test_checkpoint_of_a_changed_file_is_ignored(tmp_path):
+    source = write_records(tmp_path / "data.json", 3)
+    save_checkpoint(source, "s1", 2)
+    write_records(tmp_path / "data.json", 10)
+    assert load_checkpoint(source, "s1") == 0
+
+
+def test_find_checkpoint_session_returns_the_latest(tmp_path):
+    source = write_records(tmp_path / "data.json", 3)
+    assert find_checkpoint_session(source) is None
+    save_checkpoint(source, "old", 1)
+    save_checkpoint(source, "new", 1)
+    assert find_checkpoint_session(source) == "new"
+
+
+def test_ingested_files_of_the_watch_mode(tmp_path):
+    source = write_records(tmp_path / "data.json", 3)
+    assert is_ingested(source) is None
+    mark_ingested(source, "s1")
+    assert is_ingested(source) == "s1"
+    write_records(tmp_path / "data.json", 4)
+    os.utime(source, (0, 0))
+    assert is_ingested(source) is None
+
+
+def test_resume_skips_the_acknowledged_records(hes, tmp_path, monkeypatch):
+    monkeypatch.setattr(SQLiteAPI, "batch_size", 2)
+    source = write_records(tmp_path / "data.json", 5)
+    save_checkpoint(source, "s1", 4)
+    assert hes.save_json([source], "s1", resume=True)
+    assert hes.count("*") == 1
+    # The checkpoint is removed once the file is fully saved
+    assert load_checkpoint(source, "s1") == 0
+
+
+def test_failed_batch_keeps_the_checkpoint(hes, tmp_path, monkeypatch):
+    monkeypatch.setattr(SQLiteAPI, "batch_size", 2)
+    source = write_records(tmp_path / "data.json", 5)
+    save_bulk = hes.es.save_bulk
+    calls = []
+
+    def fail_second_batch(index, actions, created=None):
+        calls.append(len(actions))
+        return len(calls) != 2 and save_bulk(index, actions, created)
+
+    monkeypatch.setattr(hes.es, "save_bulk", fail_second_batch)
+    assert not hes.save_json([source], "s1")
+    assert load_checkpoint(source, "s1") == 2
+    monkeypatch.setattr(hes.es, "save_bulk", save_bulk)
+    assert hes.save_json([source], "s1", resume=True)
+    assert hes.count("*") == 5
+
+
+def test_ffuf_without_results_is_saved_like_the_results(hes, tmp_path, monkeypatch):
+    path = tmp_path / "ffuf.json"
+    path.write_text(json.dumps({
+        "commandline": "ffuf -u https://example.com/FUZZ", "time": "2021-01-01T00:00:00Z",
+        "config": {"url": "https://example.com/FUZZ"}, "results": []}))
+    saved = []
+    save_actions = hes.save_actions
+    monkeypatch.setattr(hes, "save_actions", lambda actions, enricher=None: saved.extend(actions) or save_actions(
+        actions, enricher))
+    assert hes.save_json([str(path)], "s1")
+    assert hes.save_json([str(path)], "s1")
+    # The run is found the second time and not saved again
+    assert len(saved) == 1
+    assert saved[0][1]["type"] == "ffuf" and saved[0][1]["result"] == []
+    assert hes.count("type:ffuf") == 1
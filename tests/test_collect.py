@@ -0,0 +1,21 @@
+import pytest
+from click.testing import CliRunner
+
+from horuz.cli import cli
+
+
+def collect(hes, ctx, args, stdin):
+    address = ctx.config["elasticsearch_address"]
+    result = CliRunner().invoke(cli, ["-H", address, "collect", "-p", hes.domain, "-s", "s1"] + args, input=stdin)
+    assert result.exit_code == 0, result.output
+    return hes.count("*")
+
+
+@pytest.mark.parametrize("args, stdin, saved", [
+    (["-f", "-"], '{"host": "https://a.example.com"}\n{"host": "https://b.example.com"}\n', 2),
+    (["--lines", "host"], "https://a.example.com\nhttps://b.example.com\n", 2),
+    # A pipe is only read when it is asked
+    ([], '{"host": "https://a.example.com"}\n', 0),
+])
+def test_stdin_is_only_read_when_asked(hes, ctx, args, stdin, saved):
+    assert collect(hes, ctx, args, stdin) == saved
@@ -0,0 +1,27 @@
+from horuz.utils.es import COMPANION_KINDS, companion_index, companion_mappings
+
+
+def test_companion_names_do_not_collide_with_projects():
+    assert companion_index("foo", "hosts") == ".horuz-hosts-foo"
+    # The hosts of foo and the project foo-hosts are different indexes
+    assert companion_index("foo", "hosts") != "foo-hosts"
+    assert companion_mappings("foo", "alerts", {})["_meta"] == {"horuz": {"companion": "alerts", "project": "foo"}}
+
+
+def test_projects_ending_like_a_companion_are_listed(hes, monkeypatch):
+    monkeypatch.setattr(hes.es, "get_all_indexes", lambda: {
+        "foo": {"aliases": {}},
+        "foo-hosts": {"aliases": {}},
+        "bar-alerts": {"aliases": {}},
+        ".horuz-hosts-foo": {"aliases": {}},
+        ".horuz-watches-foo": {"aliases": {}},
+        ".kibana_1": {"aliases": {".kibana": {}}},
+    })
+    assert hes.indexes() == ["bar-alerts", "foo", "foo-hosts"]
+
+
+def test_delete_removes_the_companion_indexes(hes, monkeypatch):
+    deleted = []
+    monkeypatch.setattr(hes.es, "delete_index", lambda index: deleted.append(index) or True)
+    assert hes.delete()
+    assert deleted == [hes.domain] + [companion_index(hes.domain, kind) for kind in COMPANION_KINDS]
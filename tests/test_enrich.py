@@ -0,0 +1,28 @@
+import json
+
+from horuz.utils.enrich import enrich_record, parse_url
+
+
+def test_parse_url():
+    assert parse_url("https://Example.com:8443/admin") == {
+        "scheme": "https", "host": "example.com", "port": 8443, "path": "/admin"}
+    assert parse_url("example.com") == {"scheme": None, "host": "example.com", "port": None, "path": "/"}
+
+
+def test_malformed_urls_are_skipped():
+    assert parse_url("http://[::1") == {}
+    fields = enrich_record({"url": "http://[::1", "status": 200})
+    assert fields == {"status_class": "2xx"}
+
+
+def test_concurrent_collects_use_their_own_pool(hes, tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps([{"url": "https://a.example.com/", "status": 200}]))
+    with hes.enrichment(1) as enricher:
+        # Another collect of the same project object, without enrichment
+        assert hes.save_json([str(path)], "plain")
+        assert hes.save_general_data(json.loads(path.read_text()), "enriched", enricher=enricher)
+    plain = hes.query("session:plain", full=True)["hits"]["hits"][0]["_source"]
+    enriched = hes.query("session:enriched", full=True)["hits"]["hits"][0]["_source"]
+    assert "enrich" not in plain
+    assert enriched["enrich"]["host"] == "a.example.com"
@@ -0,0 +1,102 @@
+import gzip
+import json
+
+from horuz.utils.es import merge_mappings
+from horuz.utils.partitions import write_alias
+
+
+def test_merge_mappings_keeps_every_field():
+    merged = {}
+    merge_mappings(merged, {"_meta": {"horuz": {}}, "properties": {
+        "host": {"type": "text", "fields": {"keyword": {"type": "keyword"}}},
+        "result": {"properties": {"status": {"type": "long"}}}}})
+    merge_mappings(merged, {"properties": {
+        "host": {"type": "text", "fields": {"infix": {"type": "wildcard"}}},
+        "result": {"properties": {"status": {"type": "keyword"}, "length": {"type": "long"}}},
+        "tags": {"type": "object"}}})
+    assert merged["properties"]["host"]["fields"] == {"keyword": {"type": "keyword"}, "infix": {"type": "wildcard"}}
+    assert merged["properties"]["result"]["properties"] == {"status": {"type": "long"}, "length": {"type": "long"}}
+    assert "tags" in merged["properties"]
+
+
+class FakeCluster:
+    """
+    Partitioned project with documents, enough to export and import it
+    """
+
+    def __init__(self, period="month", partitions=(), docs=(), mappings=None):
+        self.period = period
+        self.aliases = {"example.com": list(partitions)}
+        self.docs = list(docs)
+        self.mappings = mappings or {}
+        self.saved = {}
+        self.created = []
+        self.batch_size = 2
+
+    def get_alias_indexes(self, alias):
+        return sorted(self.aliases.get(alias, []))
+
+    def get_index_meta(self, index):
+        return {"horuz": {"project": "example.com", "partition": self.period}}
+
+    def get_index_mapping(self, index):
+        return self.mappings
+
+    def create_partition(self, index, project, period, properties=None):
+        self.created.append((index, properties))
+        self.aliases[project].append(index)
+        return True
+
+    def move_alias(self, alias, index):
+        self.aliases[alias] = [index]
+
+    def save_bulk(self, index, actions):
+        self.saved.setdefault(index, []).extend(actions)
+        return True
+
+    def count(self, index, term):
+        return len(self.docs)
+
+    def open_pit(self, index):
+        return "pit"
+
+    def close_pit(self, pit_id):
+        pass
+
+    def scan(self, pit_id, slice_id=None, slices=None):
+        return [doc for n, doc in enumerate(self.docs) if n % slices == slice_id]
+
+
+def test_export_has_the_mapping_of_every_partition(hes, tmp_path):
+    hes.domain = "example.com"
+    hes.es = FakeCluster(partitions=["example.com-2021.01", "example.com-2021.02"], docs=[
+        {"_id": "a", "_source": {"host": "a"}}, {"_id": "b", "_source": {"host": "b"}}], mappings={
+        "example.com-2021.01": {"mappings": {"_meta": {}, "properties": {"host": {"type": "keyword"}}}},
+        "example.com-2021.02": {"mappings": {"_meta": {}, "properties": {"tags": {"type": "object"}}}}})
+    assert hes.export_project(str(tmp_path), slices=2) == 2
+    exported = json.loads((tmp_path / "example.com.mapping.json").read_text())
+    assert exported["count"] == 2
+    assert exported["partition"] == "month"
+    assert exported["mappings"] == {"properties": {"host": {"type": "keyword"}, "tags": {"type": "object"}}}
+
+
+def test_import_routes_the_documents_to_the_partition_of_their_time(hes, tmp_path):
+    hes.domain = "example.com"
+    docs = [
+        {"_id": "jan", "_source": {"time": "2021-01-15T10:00:00.123456"}},
+        {"_id": "feb", "_source": {"time": "2021-02-01T00:00:00Z"}},
+        {"_id": "feb2", "_source": {"time": "2021-02-20T00:00:00"}},
+        {"_id": "none", "_source": {"host": "without time"}}]
+    with gzip.open(str(tmp_path / "example.com-000.ndjson.gz"), "wt") as f:
+        for doc in docs:
+            f.write(json.dumps(doc) + "\n")
+    properties = {"host": {"type": "keyword"}}
+    (tmp_path / "example.com.mapping.json").write_text(json.dumps({
+        "project": "example.com", "partition": "month", "mappings": {"properties": properties}}))
+    cluster = hes.es = FakeCluster(partitions=["example.com-2021.02"])
+    assert hes.import_project(str(tmp_path)) == 4
+    assert ("example.com-2021.01", properties) in cluster.created
+    assert [_id for _id, _ in cluster.saved["example.com-2021.01"]] == ["jan"]
+    assert [_id for _id, _ in cluster.saved["example.com-2021.02"]] == ["feb", "feb2"]
+    # The documents without time go to the current partition
+    assert [_id for _id, _ in cluster.saved[write_alias("example.com")]] == ["none"]
@@ -0,0 +1,78 @@
+import hashlib
+import random
+
+from horuz.utils.generators import get_near_duplications, simhash
+
+
+def reference_simhash(tokens):
+    """
+    Textbook simhash, one counter per bit
+    """
+    counters = [0] * 64
+    for token in tokens:
+        h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            counters[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if counters[bit] > 0)
+
+
+def distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+def page(words):
+    return "<html><body>{}</body></html>".format(" ".join(words))
+
+
+WORDS = ["word{}".format(i) for i in range(300)]
+
+
+def test_simhash_matches_the_reference():
+    rng = random.Random(1)
+    for _ in range(20):
+        tokens = [rng.choice(WORDS) for _ in range(rng.randint(1, 200))]
+        assert simhash(tokens, {}) == reference_simhash(tokens)
+
+
+def test_simhash_ignores_the_order_and_shares_the_cache():
+    cache = {}
+    tokens = WORDS[:50]
+    assert simhash(tokens, cache) == simhash(list(reversed(tokens)), cache)
+    assert len(cache) == 50
+
+
+def test_simhash_distance():
+    base = simhash(WORDS[:200], {})
+    assert distance(base, simhash(WORDS[:200] + ["changed"], {})) <= 3
+    assert distance(base, simhash(WORDS[100:300], {})) > 10
+
+
+def result(status, html="", words=0, lines=0, url=""):
+    return {"status": status, "html": html, "words": words, "lines": lines, "url": url}
+
+
+def test_near_duplicates_are_grouped():
+    data = [
+        result(404, page(WORDS[:200] + ["/admin"]), url="https://example.com/admin"),
+        result(404, page(WORDS[:200] + ["/backup"]), url="https://example.com/backup"),
+        result(200, page(WORDS[:200] + ["/backup"]), url="https://example.com/login"),
+        result(404, page(WORDS[100:300]), url="https://example.com/other"),
+    ]
+    grouped = get_near_duplications(data)
+    assert [r["url"] for r in grouped] == [
+        "https://example.com/admin", "https://example.com/login", "https://example.com/other"]
+    assert grouped[0]["near_dups"]["count"] == 1
+    assert grouped[0]["near_dups"]["members"][0]["url"] == "https://example.com/backup"
+    assert "near_dups" not in grouped[1]
+
+
+def test_results_without_body_are_grouped_by_size():
+    data = [
+        result(403, words=10, lines=2, url="a"),
+        result(403, words=10, lines=2, url="b"),
+        result(403, words=11, lines=2, url="c"),
+    ]
+    grouped = get_near_duplications(data)
+    assert [r["url"] for r in grouped] == ["a", "c"]
+    assert grouped[0]["near_dups"]["count"] == 1
+
@@ -0,0 +1,95 @@
+import pytest
+
+from horuz.utils.es import ElasticSearchAPI
+
+
+@pytest.fixture
+def inventory(hes, monkeypatch):
+    """
+    Storage calls of the hosts inventory, as if the backend had it
+    """
+    calls = {"upserts": [], "saved": [], "deleted": []}
+    monkeypatch.setattr(hes.es, "features", frozenset({"Hosts inventory"}))
+    monkeypatch.setattr(hes.es, "create_index", lambda index, mappings=None: True)
+    monkeypatch.setattr(hes.es, "upsert_bulk", lambda index, updates: calls["upserts"].extend(updates) or True)
+    return calls
+
+
+def test_only_the_created_documents_are_counted(hes, inventory):
+    actions = [
+        ("1", {"host": "https://a.example.com", "session": "s1", "status": 200}),
+        ("2", {"host": "https://a.example.com", "session": "s1", "status": 404}),
+        ("3", {"host": "https://b.example.com", "session": "s1"})]
+    # 2 and 3 were saved again, they replaced documents counted before
+    hes._update_hosts(actions, {"1"})
+    params = {update[1]["params"]["host"]: update[1]["params"] for update in inventory["upserts"]}
+    assert params["https://a.example.com"]["hits"] == 1
+    assert params["https://a.example.com"]["statuses"] == [200, 404]
+    assert params["https://b.example.com"]["hits"] == 0
+    assert params["https://b.example.com"]["sessions"] == ["s1"]
+
+
+def test_rebuild_counts_the_documents(hes, inventory, monkeypatch):
+    catalog = {
+        "host.keyword": {"type": "keyword"}, "session.keyword": {"type": "keyword"},
+        "host": {"type": "text", "docvalue": "host.keyword"}, "session": {"type": "text", "docvalue": "session.keyword"},
+        "status": {"type": "long", "docvalue": "status"}, "time": {"type": "date", "docvalue": "time"}}
+    monkeypatch.setattr(hes, "field_catalog", lambda: catalog)
+    pages = [
+        {"after_key": {"host": "https://a.example.com"}, "buckets": [{
+            "key": {"host": "https://a.example.com"}, "doc_count": 3,
+            "sessions": {"buckets": [{"key": "s2"}, {"key": "s1"}]},
+            "status": {"buckets": [{"key": 404}, {"key": 200}]},
+            "first_seen": {"value_as_string": "2021-01-01T00:00:00.000Z"},
+            "last_seen": {"value_as_string": "2021-02-01T00:00:00.000Z"}}]},
+        {"buckets": []}]
+    bodies = []
+
+    def query(term, raw):
+        bodies.append(term)
+        return {"aggregations": {"hosts": pages.pop(0)}}
+
+    monkeypatch.setattr(hes, "query", query)
+    monkeypatch.setattr(hes.es, "save_bulk", lambda index, actions: inventory["saved"].extend(actions) or True)
+    monkeypatch.setattr(hes.es, "delete_by_query", lambda index, query: inventory["deleted"].append(query))
+    assert hes.rebuild_hosts() == 1
+    aggs = bodies[0]["aggs"]["hosts"]["aggs"]
+    assert aggs["status"] == {"terms": {"field": "status", "size": 100}}
+    assert "result.status" not in aggs
+    _, entry = inventory["saved"][0]
+    assert entry["hits"] == 3
+    assert entry["sessions"] == ["s1", "s2"]
+    assert entry["statuses"] == [200, 404]
+    assert entry["first_seen"] == "2021-01-01T00:00:00.000Z"
+    # The hosts that were not counted again are removed
+    assert inventory["deleted"][0]["bool"]["must_not"][0]["range"]["updated"]["gte"] == entry["updated"]
+
+
+def test_rebuild_reads_and_cleans_refreshed_indices(hes, inventory, monkeypatch):
+    monkeypatch.setattr(hes, "field_catalog", lambda: {})
+    events = []
+    monkeypatch.setattr(hes.es, "refresh", lambda index: events.append(("refresh", index)))
+    monkeypatch.setattr(hes, "query", lambda term, raw: events.append(("query", None)) or {
+        "aggregations": {"hosts": {"buckets": []}}})
+    monkeypatch.setattr(hes.es, "delete_by_query", lambda index, query: events.append(("delete", index)))
+    assert hes.rebuild_hosts() == 0
+    # The collected documents are counted and the saved hosts are not removed
+    assert events == [
+        ("refresh", hes.domain), ("query", None), ("refresh", hes.hosts_index), ("delete", hes.hosts_index)]
+
+
+def test_elasticsearch_refresh(ctx):
+    api = ElasticSearchAPI("http://localhost:9200", ctx)
+    refreshed = []
+
+    class Indices:
+        def refresh(self, index):
+            refreshed.append(index)
+
+    api.es.indices = Indices()
+    api.refresh("project")
+    assert refreshed == ["project"]
+
+
+def test_rebuild_needs_the_inventory(hes):
+    assert hes.rebuild_hosts() is None
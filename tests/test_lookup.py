@@ -0,0 +1,47 @@
+import json
+
+from horuz.utils.es import LOOKUP_MAX_CHUNK, LOOKUP_SESSIONS, MAX_BUCKETS
+
+LONG = "https://example.com/" + "a" * 300
+
+
+def collect(hes, tmp_path, records):
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps(records))
+    assert hes.save_json([str(path)], "s1")
+
+
+def test_lookup_found_and_missing(hes, tmp_path):
+    collect(hes, tmp_path, [{"host": "https://a.example.com"}, {"host": "https://a.example.com"}, {"host": LONG}])
+    result = dict(hes.lookup("host", ["https://a.example.com", "https://b.example.com", LONG]))
+    assert result["https://a.example.com"]["count"] == 2
+    assert result["https://b.example.com"] is None
+    assert result[LONG]["count"] == 1
+
+
+def test_long_values_are_compared_with_phrase_matches(hes, tmp_path, monkeypatch):
+    collect(hes, tmp_path, [{"host": "https://a.example.com"}])
+    monkeypatch.setattr(hes.es, "keyword_limit", 30)
+    searches = []
+
+    def msearch(index, bodies):
+        searches.extend(body["query"]["match_phrase"]["host"] for body in bodies)
+        # The phrase also matches longer values, only the equal one is found
+        return [{"hits": {"hits": [
+            {"_id": "1", "_source": {"host": LONG + "/more", "session": "s1"}},
+            {"_id": "2", "_source": {"host": LONG, "session": "s2"}}]}}]
+
+    monkeypatch.setattr(hes.es, "msearch", msearch)
+    result = dict(hes.lookup("host", ["https://a.example.com", LONG]))
+    assert searches == [LONG]
+    assert result[LONG] == {"count": 1, "ids": ["2"], "sessions": ["s2"]}
+    assert result["https://a.example.com"]["count"] == 1
+
+
+def test_chunks_stay_under_max_buckets(hes, monkeypatch):
+    assert LOOKUP_MAX_CHUNK * (LOOKUP_SESSIONS + 1) <= MAX_BUCKETS
+    sizes = []
+    monkeypatch.setattr(hes, "_lookup_chunk", lambda field, values, text_field=None: sizes.append(len(values)) or {})
+    values = [str(i) for i in range(LOOKUP_MAX_CHUNK + 10)]
+    assert len(list(hes.lookup("host", values, chunk_size=10000, workers=1))) == len(values)
+    assert sizes == [LOOKUP_MAX_CHUNK, 10]
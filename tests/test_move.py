@@ -0,0 +1,86 @@
+import uuid
+
+import pytest
+
+from horuz.utils.es import HoruzES
+
+
+class FakeMove:
+    """
+    Storage calls of sessions mv, the tasks finish at once
+    """
+
+    def __init__(self, ids, copy_response=None):
+        self.ids = ids
+        self.copy_response = copy_response
+        self.copies = []
+        self.deletes = []
+        self.tasks = {}
+
+    def install(self, hes, monkeypatch):
+        for name in ("open_pit", "close_pit", "scan", "get_index_mapping", "create_index", "put_mapping",
+                     "reindex", "delete_by_query", "get_task"):
+            monkeypatch.setattr(hes.es, name, getattr(self, name))
+
+    def open_pit(self, index):
+        return "pit"
+
+    def close_pit(self, pit_id):
+        pass
+
+    def scan(self, pit_id, query=None, source=True):
+        return [{"_id": _id} for _id in self.ids]
+
+    def get_index_mapping(self, index):
+        return {}
+
+    def create_index(self, index, mappings=None):
+        return True
+
+    def put_mapping(self, index, properties):
+        return True
+
+    def _task(self, response):
+        task_id = uuid.uuid4().hex
+        self.tasks[task_id] = {"completed": True, "task": {}, "response": response}
+        return task_id
+
+    def reindex(self, source, dest, query, script=None, requests_per_second=None):
+        ids = query["bool"]["filter"][1]["ids"]["values"]
+        self.copies.append(ids)
+        return self._task(self.copy_response or {"total": len(ids), "created": len(ids), "updated": 0})
+
+    def delete_by_query(self, index, query, requests_per_second=None):
+        ids = query["bool"]["filter"][1]["ids"]["values"]
+        self.deletes.append(ids)
+        return self._task({"deleted": len(ids)})
+
+    def get_task(self, task_id):
+        return self.tasks[task_id]
+
+
+@pytest.fixture
+def dest(ctx):
+    return HoruzES("example-{}.org".format(uuid.uuid4().hex[:8]), ctx)
+
+
+def test_move_deletes_only_the_copied_snapshot(hes, dest, monkeypatch):
+    fake = FakeMove(["a", "b", "c"])
+    fake.install(hes, monkeypatch)
+    moved = list(hes.move_sessions(["s1"], dest, chunk_size=2))
+    assert moved == [(3, 2, 2), (3, 1, 1)]
+    assert fake.copies == [["a", "b"], ["c"]]
+    # A document collected during the move is not in the snapshot
+    assert fake.deletes == fake.copies
+
+
+@pytest.mark.parametrize("response", [
+    {"total": 2, "created": 1, "updated": 0},
+    {"total": 2, "created": 2, "updated": 0, "canceled": "by user request"},
+    {"total": 2, "created": 1, "updated": 0, "failures": [{"cause": "mapping"}]},
+])
+def test_move_keeps_the_documents_of_an_incomplete_copy(hes, dest, monkeypatch, response):
+    fake = FakeMove(["a", "b"], copy_response=response)
+    fake.install(hes, monkeypatch)
+    assert list(hes.move_sessions(["s1"], dest)) == []
+    assert fake.deletes == []
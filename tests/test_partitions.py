@@ -0,0 +1,102 @@
+import datetime
+
+import pytest
+
+from horuz.utils.partitions import (
+    parse_duration, partition_end, partition_name, partition_start, write_alias)
+
+
+@pytest.mark.parametrize("period, when, name", [
+    ("day", datetime.datetime(2021, 3, 9, 23, 59), "example.com-2021.03.09"),
+    ("month", datetime.datetime(2021, 12, 31), "example.com-2021.12"),
+    # ISO weeks, the first days of January can be in the last week of the year before
+    ("week", datetime.datetime(2021, 1, 3), "example.com-2020.w53"),
+    ("week", datetime.datetime(2021, 1, 4), "example.com-2021.w01"),
+])
+def test_partition_name(period, when, name):
+    assert partition_name("example.com", period, when) == name
+
+
+@pytest.mark.parametrize("period, index, start, end", [
+    ("day", "example.com-2021.02.28", datetime.datetime(2021, 2, 28), datetime.datetime(2021, 3, 1)),
+    ("week", "example.com-2020.w53", datetime.datetime(2020, 12, 28), datetime.datetime(2021, 1, 4)),
+    ("month", "example.com-2021.12", datetime.datetime(2021, 12, 1), datetime.datetime(2022, 1, 1)),
+    ("month", "example.com-2021.01", datetime.datetime(2021, 1, 1), datetime.datetime(2021, 2, 1)),
+])
+def test_partition_bounds(period, index, start, end):
+    assert partition_start("example.com", period, index) == start
+    assert partition_end("example.com", period, index) == end
+
+
+@pytest.mark.parametrize("index", ["other.com-2021.01", "example.com-write", "example.com-hosts"])
+def test_indexes_that_are_not_partitions(index):
+    assert partition_start("example.com", "month", index) is None
+    assert partition_end("example.com", "month", index) is None
+
+
+def test_partition_round_trip():
+    when = datetime.datetime(2021, 7, 15, 12)
+    for period in ("day", "week", "month"):
+        index = partition_name("example.com", period, when)
+        assert partition_start("example.com", period, index) <= when < partition_end("example.com", period, index)
+
+
+def test_parse_duration():
+    assert parse_duration("30m") == datetime.timedelta(minutes=30)
+    assert parse_duration(" 7d ") == datetime.timedelta(days=7)
+    assert parse_duration("4w") == datetime.timedelta(weeks=4)
+    with pytest.raises(ValueError):
+        parse_duration("7 days")
+
+
+class FakePartitions:
+    """
+    Aliases and partition indexes of a cluster
+    """
+
+    def __init__(self, aliases=None, period="day"):
+        self.aliases = aliases or {}
+        self.period = period
+        self.created = []
+        self.deleted = []
+
+    def get_alias_indexes(self, alias):
+        return sorted(self.aliases.get(alias, []))
+
+    def get_index_meta(self, index):
+        return {"horuz": {"project": "example.com", "partition": self.period}}
+
+    def create_partition(self, index, project, period, properties=None):
+        self.created.append(index)
+        self.aliases.setdefault(project, []).append(index)
+        return True
+
+    def move_alias(self, alias, index):
+        self.aliases[alias] = [index]
+
+    def delete_index(self, index):
+        self.deleted.extend(index.split(","))
+        return True
+
+
+def test_write_index_rolls_over_to_the_current_partition(hes, monkeypatch):
+    hes.domain = "example.com"
+    old = "example.com-2020.01.01"
+    hes.es = FakePartitions({"example.com": [old], write_alias("example.com"): [old]})
+    monkeypatch.setattr(hes, "body_indexed", lambda: False)
+    current = partition_name("example.com", "day")
+    assert hes.write_index == write_alias("example.com")
+    assert hes.es.created == [current]
+    assert hes.es.aliases[write_alias("example.com")] == [current]
+
+
+def test_search_and_prune_only_use_the_partitions_of_the_window(hes):
+    hes.domain = "example.com"
+    now = datetime.datetime.now()
+    old = partition_name("example.com", "day", now - datetime.timedelta(days=10))
+    recent = partition_name("example.com", "day", now - datetime.timedelta(days=1))
+    current = partition_name("example.com", "day", now)
+    hes.es = FakePartitions({"example.com": [old, recent, current]})
+    assert hes.search_index(datetime.timedelta(days=2)).split(",") == [recent, current]
+    assert hes.search_index() == "example.com"
+    assert hes.prune(datetime.timedelta(days=5)) == [old]
@@ -0,0 +1,46 @@
+import json
+
+from horuz.utils.formatting import beautify_query
+
+
+def collect(hes, tmp_path, records, session="s1"):
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps(records))
+    assert hes.save_json([str(path)], session)
+
+
+def test_json_output_keeps_the_source_format(hes, tmp_path, monkeypatch):
+    collect(hes, tmp_path, [{"host": "https://a.example.com", "ports": [443], "seen": "2021-01-01T10:00:00.123456"}])
+    calls = []
+    query = hes.es.query
+
+    def spy(*args, **kwargs):
+        calls.append(kwargs)
+        return query(*args, **kwargs)
+
+    monkeypatch.setattr(hes.es, "query", spy)
+    data = beautify_query(hes.query("host:*", fields=["ports", "seen"]), ["ports", "seen"])
+    assert calls[-1]["docvalue_fields"] == []
+    assert data[0]["ports"] == [443]
+    assert data[0]["seen"] == "2021-01-01T10:00:00.123456"
+
+
+def test_tables_read_the_doc_values(hes, tmp_path, monkeypatch):
+    collect(hes, tmp_path, [{"host": "https://a.example.com", "status": 200}])
+    monkeypatch.setattr(hes, "field_catalog", lambda: {"status": {"aggregatable": True, "docvalue": "status"}})
+    calls = []
+    query = hes.es.query
+
+    def spy(*args, **kwargs):
+        calls.append(kwargs)
+        return query(*args, **kwargs)
+
+    monkeypatch.setattr(hes.es, "query", spy)
+    hes.query("host:*", fields=["host", "status"], docvalues=True)
+    assert calls[-1]["docvalue_fields"] == ["status"]
+
+
+def test_json_output_keeps_the_indent():
+    query = {"hits": {"hits": [{"_id": "1", "_source": {"host": "https://á.example.com", "ports": [443]}}]}}
+    expected = [{"_id": "1", "host": "https://á.example.com", "ports": [443]}]
+    assert beautify_query(query, output="json") == json.dumps(expected, indent=4, sort_keys=True)
@@ -0,0 +1,131 @@
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from horuz.cli import cli
+from horuz.utils.sqlite import LuceneParser, compile_lucene
+
+
+RECORDS = [
+    {"host": "https://api.example.com", "status": 200, "title": "Login page", "length": 120,
+     "seen": "2021-01-01T10:00:00"},
+    {"host": "https://www.example.com", "status": 301, "title": "Moved", "length": 0,
+     "seen": "2021-01-01T12:00:00"},
+    {"host": "https://dev.example.com", "status": 403, "title": "Forbidden admin page", "length": 560,
+     "seen": "2021-01-02T08:00:00"},
+    {"host": "https://old.example.org", "status": 200, "title": "Index of /", "length": 1500,
+     "seen": "2021-01-03T08:00:00", "tags": ["backup"]},
+]
+
+
+@pytest.fixture
+def project(hes, tmp_path):
+    path = tmp_path / "records.json"
+    path.write_text(json.dumps(RECORDS))
+    assert hes.save_json([str(path)], "s1")
+    return hes
+
+
+def test_parse_tree():
+    assert LuceneParser('host:"a b" AND NOT status:[200 TO 299}').parse() == (
+        "and", [("field", "host", ("phrase", "a b")), ("not", ("field", "status", ("range", "200", "299", True, False)))])
+    assert LuceneParser("status:(200 OR 301) login").parse() == (
+        "or", [("or", [("field", "status", ("term", "200")), ("field", "status", ("term", "301"))]),
+               ("field", None, ("term", "login"))])
+    assert LuceneParser("length:>=100").parse() == ("field", "length", ("range", "100", None, True, False))
+
+
+@pytest.mark.parametrize("query", ["host:(a", "status:[1 TO", "host:", "a )"])
+def test_parse_errors(query):
+    with pytest.raises(ValueError):
+        LuceneParser(query).parse()
+
+
+def test_compile_lucene_uses_parameters():
+    params = []
+    condition = compile_lucene(LuceneParser("host:*api* AND status:>300").parse(), params)
+    assert condition == "(hz_wildcard(json_extract(d.doc, '$.\"host\"'), ?) AND hz_range(json_extract(d.doc, '$.\"status\"'), ?, ?, ?, ?))"
+    assert params == ["*api*", "300", None, False, False]
+    # The values never end in the SQL
+    params = []
+    condition = compile_lucene(LuceneParser("host:\"a'; DROP docs\"").parse(), params)
+    assert "DROP" not in condition and params == ["a'; DROP docs"]
+
+
+@pytest.mark.parametrize("query, count", [
+    ("*", 4),
+    ("status:200", 2),
+    ("status:[200 TO 301]", 3),
+    ("status:{200 TO 301]", 1),
+    ("length:>=560", 2),
+    ("host:*example.com", 3),
+    ("title:page", 2),
+    ('title:"admin page"', 1),
+    ("status:200 AND NOT host:*api*", 1),
+    ("status:(301 OR 403)", 2),
+    ("-status:200", 2),
+    ("forbidden", 1),
+    ("tags:backup", 1),
+    ("tags:*", 1),
+    ("session:s1 AND status:403", 1),
+])
+def test_search(project, query, count):
+    assert project.count(query) == count
+    response = project.query(query, size=10)
+    assert response["hits"]["total"]["value"] == count
+    assert len(response["hits"]["hits"]) == count
+
+
+def test_search_fields_and_order(project):
+    response = project.query("*", size=2, order="length:desc", fields=["host", "length"])
+    assert [hit["_source"] for hit in response["hits"]["hits"]] == [
+        {"host": "https://old.example.org", "length": 1500},
+        {"host": "https://dev.example.com", "length": 560}]
+
+
+def test_aggregations(project):
+    response = project.aggregate("*", {
+        "hosts": {"terms": {"field": "status", "size": 1}},
+        "unique": {"cardinality": {"field": "host.keyword"}},
+        "days": {"date_histogram": {"field": "seen", "calendar_interval": "day"}},
+        "lengths": {"percentiles": {"field": "length", "percents": [0, 50, 100]}}})
+    aggs = response["aggregations"]
+    assert aggs["hosts"] == {"sum_other_doc_count": 2, "buckets": [{"key": 200, "doc_count": 2}]}
+    assert aggs["unique"] == {"value": 4}
+    assert aggs["days"]["buckets"] == [
+        {"key_as_string": "2021-01-01", "doc_count": 2},
+        {"key_as_string": "2021-01-02", "doc_count": 1},
+        {"key_as_string": "2021-01-03", "doc_count": 1}]
+    assert aggs["lengths"]["values"] == {"0.0": 0.0, "50.0": 340.0, "100.0": 1500.0}
+
+
+def test_aggregations_of_a_query(project):
+    response = project.aggregate("status:200", {"hosts": {"terms": {"field": "host"}}})
+    assert sorted(b["key"] for b in response["aggregations"]["hosts"]["buckets"]) == [
+        "https://api.example.com", "https://old.example.org"]
+
+
+def test_companion_features_are_reported(project):
+    with pytest.raises(NotImplementedError):
+        project.hosts()
+    with pytest.raises(NotImplementedError):
+        project.watches()
+    with pytest.raises(NotImplementedError):
+        project.alerts()
+    # The collects do not fail without them
+    assert project.count("*") == 4
+
+
+@pytest.mark.parametrize("args", [
+    ["hosts", "-p"],
+    ["watch", "ls", "-p"],
+    ["watch", "alerts", "-p"],
+    ["tag", "-q", "*", "--set", "triage=done", "-p"],
+    ["sessions", "merge", "-s", "s1", "-i", "s2", "-p"],
+])
+def test_commands_report_unsupported_operations(project, ctx, args):
+    address = ctx.config["elasticsearch_address"]
+    result = CliRunner().invoke(cli, ["-H", address] + args + [project.domain])
+    assert result.exit_code == 0, result.output
+    assert "not supported by the sqlite backend" in result.output
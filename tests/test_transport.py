@@ -0,0 +1,137 @@
+import threading
+
+import pytest
+from elasticsearch.exceptions import ConnectionTimeout, TransportError
+
+from horuz.utils.es import ElasticSearchAPI
+from horuz.utils.transport import BulkTransport
+
+
+class FakeClient:
+    """
+    Answers the bulk requests with the given item statuses, one list per call
+    """
+
+    def __init__(self, statuses=()):
+        self.statuses = list(statuses)
+        self.bodies = []
+
+    def bulk(self, body):
+        self.bodies.append(body)
+        lines = body.decode("utf-8").strip().split("\n")
+        statuses = self.statuses.pop(0)
+        items = []
+        for status, line in zip(statuses, lines[::2]):
+            result = {"status": status}
+            if status < 300:
+                result["result"] = "created" if status == 201 else "updated"
+            else:
+                result["error"] = {"type": "error"}
+            items.append({"index": result})
+        return {"items": items}
+
+
+class QuietCtx:
+    def log(self, msg):
+        pass
+
+    def vlog(self, msg):
+        pass
+
+
+def transport(client, **kwargs):
+    return BulkTransport(client, QuietCtx(), backoff=0, **kwargs)
+
+
+def actions(count):
+    return [(str(i), {"n": i}) for i in range(count)]
+
+
+def test_bulk_resends_only_the_rejected_documents():
+    client = FakeClient([[201, 429, 201, 429], [201, 201]])
+    assert transport(client).bulk("idx", actions(4))
+    assert len(client.bodies) == 2
+    resent = client.bodies[1].decode("utf-8")
+    assert '"_id":"1"' in resent and '"_id":"3"' in resent
+    assert '"_id":"0"' not in resent
+
+
+def test_bulk_reports_only_the_created_documents():
+    client = FakeClient([[201, 200, 429], [201]])
+    created = []
+    assert transport(client).bulk("idx", actions(3), created)
+    # The replaced document was counted when it was created
+    assert created == ["0", "2"]
+
+
+def test_bulk_stops_on_a_document_error():
+    client = FakeClient([[201, 400]])
+    assert transport(client).bulk("idx", actions(2)) is False
+
+
+def test_bulk_gives_up_after_the_retries():
+    client = FakeClient([[429]] * 3)
+    assert transport(client, max_retries=2).bulk("idx", actions(1)) is False
+    assert len(client.bodies) == 3
+
+
+def test_call_retries_an_overloaded_cluster():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise TransportError(503, "unavailable")
+        return "ok"
+
+    assert transport(None).call(flaky) == "ok"
+    assert len(calls) == 3
+
+
+def test_call_raises_the_request_errors():
+    def bad_request():
+        raise TransportError(400, "bad request")
+
+    with pytest.raises(TransportError):
+        transport(None).call(bad_request)
+
+
+def test_adapt_halves_on_rejections_and_grows_when_fast():
+    bulk = transport(None, batch_size=100, min_batch_size=10, max_batch_size=120)
+    bulk._adapt(0.1, rejected=True)
+    assert bulk.batch_size == 50
+    bulk._adapt(10, rejected=False)
+    assert bulk.batch_size == 25
+    for _ in range(20):
+        bulk._adapt(0.1, rejected=False)
+    assert bulk.batch_size == 120
+    for _ in range(10):
+        bulk._adapt(0.1, rejected=True)
+    assert bulk.batch_size == 10
+
+
+def test_adapt_is_consistent_across_threads():
+    bulk = transport(None, batch_size=1000, min_batch_size=1, max_batch_size=1000)
+    threads = [threading.Thread(target=bulk._adapt, args=(10, True)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert bulk.batch_size == 1000 // 2 ** 8
+
+
+def test_save_in_index_retries_with_the_same_id(ctx):
+    api = ElasticSearchAPI("http://localhost:9200", ctx)
+    api.transport.backoff = 0
+    api.create_index = lambda index: True
+    sent = []
+
+    def index(index, id, body):
+        sent.append(id)
+        if len(sent) == 1:
+            raise ConnectionTimeout("TIMEOUT", "timed out", None)
+        return {"_id": id, "result": "created"}
+
+    api.es.index = index
+    assert api.save_in_index("idx", {"host": "https://example.com"})
+    assert len(sent) == 2 and sent[0] == sent[1]
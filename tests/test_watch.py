@@ -0,0 +1,79 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from horuz.utils import watch
+from horuz.utils.watch import DirectoryWatcher
+
+
+@pytest.fixture
+def polling(monkeypatch):
+    monkeypatch.setattr(watch, "inotify_simple", None)
+
+
+@pytest.fixture
+def pool():
+    executor = ThreadPoolExecutor(max_workers=1)
+    yield executor
+    executor.shutdown(wait=False)
+
+
+def write(path, content="[]"):
+    with open(path, "w") as f:
+        f.write(content)
+    return str(path)
+
+
+def next_file(pool, files):
+    # A missed file would block the generator forever
+    return pool.submit(next, files).result(timeout=5)
+
+
+def test_existing_files_first(tmp_path, polling, pool):
+    b = write(tmp_path / "b.json")
+    a = write(tmp_path / "a.json")
+    write(tmp_path / "c.txt")
+    files = iter(DirectoryWatcher(str(tmp_path), interval=0.01))
+    assert [next_file(pool, files), next_file(pool, files)] == [a, b]
+
+
+def test_file_created_after_the_listing(tmp_path, polling, pool):
+    a = write(tmp_path / "a.json")
+    files = iter(DirectoryWatcher(str(tmp_path), interval=0.01))
+    assert next_file(pool, files) == a
+    # Created while the first file is collected
+    b = write(tmp_path / "b.json")
+    assert next_file(pool, files) == b
+
+
+def test_changed_file_is_yielded_again(tmp_path, polling, pool):
+    a = write(tmp_path / "a.json")
+    files = iter(DirectoryWatcher(str(tmp_path), interval=0.01))
+    assert next_file(pool, files) == a
+    write(tmp_path / "a.json", "[{}]")
+    os.utime(a, (1, 1))
+    assert next_file(pool, files) == a
+
+
+def test_failed_file_is_retried(tmp_path, polling, pool):
+    a = write(tmp_path / "a.json")
+    watcher = DirectoryWatcher(str(tmp_path), interval=0.01)
+    files = iter(watcher)
+    assert next_file(pool, files) == a
+    watcher.retry(a)
+    assert next_file(pool, files) == a
+    assert watcher._failures[a] == 1
+
+
+def test_retry_delay_grows(tmp_path, monkeypatch):
+    monkeypatch.setattr(watch.time, "monotonic", lambda: 100.0)
+    watcher = DirectoryWatcher(str(tmp_path), interval=2)
+    watcher.retry("a.json")
+    assert watcher._retries["a.json"] == 104.0
+    watcher.retry("a.json")
+    assert watcher._retries["a.json"] == 108.0
+    for _ in range(10):
+        watcher.retry("a.json")
+    assert watcher._retries["a.json"] == 100.0 + watch.MAX_RETRY_DELAY
+    assert list(watcher._due_retries()) == []